@@ -0,0 +1,302 @@
+"""
+Бенчмарк шагов анализа на локальных заглушках ProApis и OpenAI
+
+Каждый шаг (stage) для каждого размера запускается в отдельном процессе во
+временной папке, поэтому пиковая память (ru_maxrss) относится к одному шагу,
+а кэши и архивы не переходят между замерами.
+
+Задержки p50/p99 (client_latency) измеряются в клиенте: вокруг
+ProApisClient.post и вызова chat completion, то есть вместе с ожиданием
+лимитера, повторами, паузами после 429 и очередью к семафору async режима.
+server_latency - время обработки в заглушках (заданная задержка), для
+сравнения.
+
+Запуск из корня репозитория:
+    python benchmarks/bench_pipeline.py --sizes 1000,10000 --latency-ms 50 --rate-limit-rate 0.02
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_servers import (  # noqa: E402
+    MockSettings, OpenAIHandler, ProApisHandler, Recorder, load_detail_templates,
+    start_server, synthetic_search_profile
+)
+
+STAGES = ['search', 'llm', 'companies', 'details', 'main']
+
+# Число поисковых запросов в run_all_parsers: размер делится между ними
+SEARCH_QUERIES = 4
+
+
+def synthetic_profiles(size: int):
+    """
+    DataFrame в формате filtered_profiles (строки поиска после prepare_data)
+    """
+    import pandas as pd
+
+    rows = []
+    for idx in range(size):
+        profile = synthetic_search_profile(f"bench-{idx}")
+        rows.append({**profile, 'skills': ', '.join(profile['skills']), 'query_type': 'founder'})
+    return pd.DataFrame(rows)
+
+
+def run_stage(stage: str, size: int, model: str) -> int:
+    """
+    Выполняет шаг в текущем процессе
+
+    Returns:
+        int: Число обработанных профилей
+    """
+    if stage == 'search':
+        from parsing_old_employee import run_all_parsers
+        from prepare_data import combine_csv_files
+        return len(combine_csv_files(run_all_parsers()))
+
+    if stage == 'main':
+        from main import DETAILS_FILE, FILTERED_FILE, build_pipeline
+        from prepare_data import load_dataframe
+        build_pipeline().run(force=True)
+        print(f"В деталях {len(load_dataframe(DETAILS_FILE, stage='details'))} профилей")
+        return len(load_dataframe(FILTERED_FILE, stage='filtered'))
+
+    from llm_file import process_company_names, process_profiles_with_llm
+    from more_requests import process_profiles
+
+    df = synthetic_profiles(size)
+    if stage == 'llm':
+        process_profiles_with_llm(df, model)
+    elif stage == 'companies':
+        process_company_names(df, model)
+    elif stage == 'details':
+        process_profiles(df)
+    else:
+        raise ValueError(f"Неизвестный шаг {stage}")
+    return len(df)
+
+
+def instrument_clients(recorder: Recorder) -> None:
+    """
+    Записывает время запросов к ProApis и OpenAI на стороне клиента
+
+    Оборачивает ProApisClient.post (лимитер, повторы и паузы после 429
+    входят во время), синхронный chat completion (с повторами клиента
+    OpenAI) и _complete_async (с ожиданием семафора и backoff при 429).
+    """
+    import llm_file
+    import proapis_client
+    import replay
+
+    original_post = proapis_client.ProApisClient.post
+
+    def post(self, endpoint, payload, bypass_cache=None):
+        started = time.perf_counter()
+        status = "200"
+        try:
+            return original_post(self, endpoint, payload, bypass_cache)
+        except Exception as e:
+            status = str(getattr(getattr(e, 'response', None), 'status_code', None) or type(e).__name__)
+            raise
+        finally:
+            recorder.add(endpoint, status, time.perf_counter() - started)
+
+    original_create = replay._RecordedCompletions.create
+
+    def create(self, **request):
+        started = time.perf_counter()
+        status = "200"
+        try:
+            return original_create(self, **request)
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            recorder.add('chat/completions', status, time.perf_counter() - started)
+
+    original_complete_async = llm_file._complete_async
+
+    async def complete_async(async_client, request, semaphore, default, max_retries):
+        started = time.perf_counter()
+        result = await original_complete_async(async_client, request, semaphore, default, max_retries)
+        status = "error" if result == default else "200"
+        recorder.add('chat/completions', status, time.perf_counter() - started)
+        return result
+
+    proapis_client.ProApisClient.post = post
+    replay._RecordedCompletions.create = create
+    llm_file._complete_async = complete_async
+
+
+def worker(args: argparse.Namespace) -> None:
+    """
+    Дочерний процесс: настраивает окружение на заглушки, выполняет шаг и
+    пишет результат в args.result_file
+    """
+    os.environ.update({
+        'PRO_API_BASE_URL': args.pro_url,
+        'OPENAI_BASE_URL': f"{args.openai_url}/v1",
+        'PRO_API_KEY': 'bench',
+        'OPENAI_API_KEY': 'bench',
+        'PRO_API_CACHE_BYPASS': '1',
+        'LLM_CACHE': '0'
+    })
+    if args.llm_mode:
+        os.environ['LLM_MODE'] = args.llm_mode
+    os.chdir(args.workdir)
+
+    import config
+    config.PRO_API_RPS = args.rps
+
+    recorder = Recorder()
+    instrument_clients(recorder)
+
+    started = time.perf_counter()
+    profiles = run_stage(args.stage, args.size, config.gpt_4o)
+    seconds = time.perf_counter() - started
+
+    # ru_maxrss в Linux - в килобайтах
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(args.result_file, 'w', encoding='utf-8') as f:
+        json.dump({
+            'profiles': profiles,
+            'seconds': round(seconds, 3),
+            'profiles_per_sec': round(profiles / seconds, 2) if seconds else None,
+            'peak_rss_mb': round(peak_rss_mb, 1),
+            'client_latency': recorder.summary()
+        }, f)
+
+
+def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Запускает заглушки и все пары (шаг, размер) в дочерних процессах
+
+    Returns:
+        Dict: Отчет с параметрами и результатами
+    """
+    settings = MockSettings(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after
+    )
+    pro_server, pro_url = start_server(ProApisHandler, settings, templates=load_detail_templates())
+    openai_server, openai_url = start_server(OpenAIHandler, settings)
+
+    results: List[Dict[str, Any]] = []
+    for size in args.sizes:
+        for stage in args.stages:
+            pro_server.profiles_per_query = -(-size // SEARCH_QUERIES)
+            pro_server.query_slots.clear()
+            pro_server.recorder.reset()
+            openai_server.recorder.reset()
+
+            with tempfile.TemporaryDirectory(prefix=f"bench-{stage}-") as workdir:
+                result_file = os.path.join(workdir, 'result.json')
+                command = [
+                    sys.executable, os.path.abspath(__file__), '--worker',
+                    '--stage', stage, '--size', str(size), '--workdir', workdir,
+                    '--result-file', result_file, '--pro-url', pro_url,
+                    '--openai-url', openai_url, '--rps', str(args.rps)
+                ]
+                if args.llm_mode:
+                    command += ['--llm-mode', args.llm_mode]
+                print(f"{stage} ({size} профилей)...")
+                process = subprocess.run(
+                    command,
+                    stdout=None if args.verbose else subprocess.DEVNULL,
+                    stderr=None if args.verbose else subprocess.PIPE,
+                    text=True
+                )
+
+                entry: Dict[str, Any] = {'stage': stage, 'size': size}
+                if process.returncode != 0 or not os.path.exists(result_file):
+                    entry['error'] = (process.stderr or "").strip().splitlines()[-1:] or [f"код {process.returncode}"]
+                    print(f"  ошибка: {entry['error'][0]}")
+                else:
+                    with open(result_file, 'r', encoding='utf-8') as f:
+                        entry.update(json.load(f))
+                    print(f"  {entry['profiles_per_sec']} профилей/с, {entry['seconds']} с, "
+                          f"пик RSS {entry['peak_rss_mb']} МБ")
+                    for endpoint, latency in entry['client_latency'].items():
+                        print(f"  {endpoint}: p50 {latency['p50_ms']} мс, p99 {latency['p99_ms']} мс, "
+                              f"{latency['requests']} запросов")
+            entry['server_latency'] = {**pro_server.recorder.summary(), **openai_server.recorder.summary()}
+            results.append(entry)
+
+    pro_server.shutdown()
+    openai_server.shutdown()
+    return {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {
+            'latency_ms': args.latency_ms,
+            'jitter_ms': args.jitter_ms,
+            'error_rate': args.error_rate,
+            'rate_limit_rate': args.rate_limit_rate,
+            'retry_after': args.retry_after,
+            'rps': args.rps,
+            'llm_mode': args.llm_mode
+        },
+        'results': results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк шагов анализа на заглушках API")
+    parser.add_argument('--sizes', default="1000,10000,100000",
+                        type=lambda value: [int(size) for size in value.split(',')])
+    parser.add_argument('--stages', default=",".join(STAGES),
+                        type=lambda value: value.split(','), help=f"Через запятую из {STAGES}")
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--jitter-ms', type=float, default=10.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Доля ответов 500")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Доля ответов 429")
+    parser.add_argument('--retry-after', type=float, default=1.0, help="Retry-After в ответах 429, с")
+    parser.add_argument('--rps', type=float, default=200.0, help="config.PRO_API_RPS в замерах")
+    # batch_api не замеряется: заглушка OpenAI не реализует /v1/files и /v1/batches
+    parser.add_argument('--llm-mode', choices=['online', 'async'],
+                        help="config.LLM_MODE в замерах (по умолчанию из окружения)")
+    parser.add_argument('--output', help="Файл отчета (по умолчанию benchmarks/results/pipeline-<время>.json)")
+    parser.add_argument('--verbose', action='store_true', help="Показывать вывод шагов")
+
+    # Параметры дочернего процесса
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--stage', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--result-file', help=argparse.SUPPRESS)
+    parser.add_argument('--pro-url', help=argparse.SUPPRESS)
+    parser.add_argument('--openai-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    unknown = set(args.stages) - set(STAGES)
+    if unknown:
+        parser.error(f"неизвестные шаги: {', '.join(sorted(unknown))}")
+
+    report = run_benchmarks(args)
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Отчет сохранен в {output}")
+
+
+if __name__ == "__main__":
+    main()
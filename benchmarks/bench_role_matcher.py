@@ -0,0 +1,67 @@
+"""
+Бенчмарк фильтра ролей: старая альтернатива str.contains против RoleMatcher
+
+Запуск из корня репозитория:
+    python benchmarks/bench_role_matcher.py --titles 1000000 --patterns 300
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from role_matcher import RoleMatcher  # noqa: E402
+
+WORDS = [
+    "senior", "lead", "head", "of", "engineering", "product", "manager", "founder",
+    "co-founder", "stealth", "startup", "data", "scientist", "director", "sales",
+    "marketing", "growth", "operations", "at", "revolut", "ex", "building", "ai",
+    "platform", "backend", "frontend", "designer", "analyst", "finance", "vp"
+]
+
+
+def make_titles(count: int, seed: int) -> pd.Series:
+    rng = random.Random(seed)
+    return pd.Series([" ".join(rng.choices(WORDS, k=rng.randint(3, 10))) for _ in range(count)])
+
+
+def make_patterns(count: int, seed: int) -> list:
+    rng = random.Random(seed + 1)
+    base = ["hr", "recruiter", "accountant", "legal", "lawyer", "talent acquisition"]
+    synthetic = [f"role{idx} {rng.choice(WORDS)}" for idx in range(max(0, count - len(base)))]
+    return base + synthetic
+
+
+def bench(name: str, func, titles: pd.Series) -> pd.Series:
+    start = time.perf_counter()
+    mask = func(titles)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.2f} с  {len(titles) / elapsed:12,.0f} строк/с  оставлено {int(mask.sum())}")
+    return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Бенчмарк фильтра ролей")
+    parser.add_argument('--titles', type=int, default=1_000_000)
+    parser.add_argument('--patterns', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    titles = make_titles(args.titles, args.seed)
+    patterns = make_patterns(args.patterns, args.seed)
+    print(f"{len(titles)} заголовков, {len(patterns)} паттернов")
+
+    def legacy(series: pd.Series) -> pd.Series:
+        return ~series.str.contains('|'.join(patterns), case=False, na=False)
+
+    matcher = RoleMatcher(exclude=patterns)
+    bench("str.contains (старый)", legacy, titles)
+    bench("RoleMatcher", matcher.mask, titles)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,403 @@
+"""
+Локальные заглушки ProApis и OpenAI для бенчмарков
+
+Заглушки отвечают в форматах реальных API (search/hosted/people,
+search/hosted/companies, profile-details, /v1/chat/completions), с
+настраиваемой задержкой, долей ошибок 5xx и ответов 429. Детали профилей
+строятся по реальным ответам из OLD/final_request_to_api.
+
+Запуск отдельно:
+    python benchmarks/mock_servers.py --latency-ms 50 --rate-limit-rate 0.05
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'OLD', 'final_request_to_api')
+
+FIRST_NAMES = ["Anna", "Ivan", "Maria", "Alex", "Olga", "Daniel", "Sofia", "Max", "Elena", "Nikita"]
+LAST_NAMES = ["Petrova", "Smith", "Ivanov", "Garcia", "Mueller", "Rossi", "Kim", "Novak", "Silva", "Brown"]
+ROLES = ["Founder", "Co-Founder & CEO", "CTO", "Product Manager", "Head of Growth",
+         "Senior Engineer", "Founding Engineer", "VP Operations", "Data Scientist", "HR Business Partner"]
+COMPANIES = ["Monzo", "N26", "Wise", "Klarna", "Stripe", "Bolt", "Miro", "Deel", "Qonto", "Pleo"]
+TOPICS = ["fintech", "AI agents", "payments", "crypto", "B2B SaaS", "climate", "devtools", "health"]
+SKILLS = ["Python", "Product Management", "Fundraising", "Leadership", "SQL", "Go",
+          "Machine Learning", "Payments", "Growth", "Strategy", "Kubernetes", "UX"]
+STEALTH_COMPANY_ID = 18583501
+
+
+def _rng(key: str) -> random.Random:
+    return random.Random(zlib.crc32(key.encode('utf-8')))
+
+
+def synthetic_title(profile_id: str) -> Tuple[str, str]:
+    """
+    Заголовок профиля и тип (stealth, vague, company) для profile_id
+    """
+    rng = _rng(profile_id)
+    role, company, topic = rng.choice(ROLES), rng.choice(COMPANIES), rng.choice(TOPICS)
+    number = zlib.crc32(profile_id.encode('utf-8')) % 997
+    kind = rng.choices(['stealth', 'vague', 'company'], weights=[2, 3, 5])[0]
+    if kind == 'stealth':
+        return f"{role} @ Stealth Startup | {topic} #{number} | ex-Revolut", kind
+    if kind == 'vague':
+        return f"Building something new in {topic} ({number}) | {role} | ex-Revolut, {company}", kind
+    return f"{role} @ {company} {topic} {number} | ex-Revolut", kind
+
+
+def synthetic_search_profile(profile_id: str) -> Dict[str, Any]:
+    """
+    Профиль в формате элемента data ответа search/hosted/people
+    """
+    rng = _rng(profile_id)
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "profile_id": profile_id,
+        "first_name": first_name,
+        "last_name": last_name,
+        "sub_title": synthetic_title(profile_id)[0],
+        "location_city": rng.choice(["london", "berlin", "lisbon", "warsaw"]),
+        "location_country": rng.choice(["gb", "de", "pt", "pl"]),
+        "li_url": f"https://www.linkedin.com/in/{profile_id}",
+        "skills": rng.sample(SKILLS, k=rng.randint(2, 6))
+    }
+
+
+def load_detail_templates(folder: str = TEMPLATES_DIR, limit: int = 20) -> List[Dict[str, Any]]:
+    """
+    Реальные ответы profile-details как шаблоны (пустой список, если папки нет)
+    """
+    if not os.path.isdir(folder):
+        return []
+    templates = []
+    for name in sorted(os.listdir(folder))[:limit]:
+        if name.endswith('.json'):
+            with open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                templates.append(json.load(f))
+    return templates
+
+
+def synthetic_details(profile_id: str, templates: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Ответ profile-details для profile_id в форме одного из реальных ответов
+
+    Текущая компания соответствует заголовку: для stealth заголовков -
+    "Stealth Startup" (у части - с ID известной stealth компании).
+    """
+    rng = _rng(profile_id)
+    profile = synthetic_search_profile(profile_id)
+    details = copy.deepcopy(rng.choice(templates)) if templates else {}
+    details.update({
+        "profile_id": profile_id,
+        "first_name": profile["first_name"],
+        "last_name": profile["last_name"],
+        "sub_title": profile["sub_title"]
+    })
+
+    kind = synthetic_title(profile_id)[1]
+    if kind == 'company':
+        company = {"id": 1000 + zlib.crc32(profile_id.encode('utf-8')) % 100000, "name": rng.choice(COMPANIES)}
+    else:
+        company = {"id": STEALTH_COMPANY_ID if rng.random() < 0.5 else None, "name": "Stealth Startup"}
+
+    groups = details.get("position_groups") or [{}]
+    group = copy.deepcopy(groups[0])
+    group["company"] = {**(group.get("company") or {}), **company}
+    positions = group.get("profile_positions") or [{}]
+    position = dict(positions[0])
+    position.update({
+        "title": rng.choice(ROLES),
+        "company": company["name"],
+        "date": {"start": {"month": rng.randint(1, 12), "day": None, "year": rng.randint(2021, 2025)}, "end": None},
+        "employment_type": "Full-time",
+        "location": profile["location_city"].title()
+    })
+    group["profile_positions"] = [position] + positions[1:]
+    details["position_groups"] = [group] + groups[1:]
+    return details
+
+
+class MockSettings:
+    """
+    Поведение заглушки: задержка, ошибки и 429
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 50.0,
+        jitter_ms: float = 10.0,
+        error_rate: float = 0.0,
+        rate_limit_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: int = 42
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+
+
+class Recorder:
+    """
+    Потокобезопасная запись времени обработки и статусов по эндпоинтам
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.latencies: Dict[str, List[float]] = {}
+            self.statuses: Dict[str, Dict[Any, int]] = {}
+
+    def add(self, endpoint: str, status: Any, seconds: float) -> None:
+        with self._lock:
+            self.latencies.setdefault(endpoint, []).append(seconds)
+            counts = self.statuses.setdefault(endpoint, {})
+            counts[status] = counts.get(status, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        p50/p99 времени ответа (мс) и число ответов по статусам для каждого эндпоинта
+        """
+        with self._lock:
+            result = {}
+            for endpoint, values in self.latencies.items():
+                ordered = sorted(values)
+                result[endpoint] = {
+                    "requests": len(ordered),
+                    "p50_ms": round(_percentile(ordered, 50) * 1000, 2),
+                    "p99_ms": round(_percentile(ordered, 99) * 1000, 2),
+                    "statuses": {str(status): count for status, count in sorted(self.statuses[endpoint].items())}
+                }
+            return result
+
+
+def _percentile(ordered: List[float], percent: float) -> float:
+    if not ordered:
+        return 0.0
+    position = min(len(ordered) - 1, max(0, int(round(percent / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[position]
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings: MockSettings
+    recorder: Recorder
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_json(self) -> Dict[str, Any]:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b'{}'
+        return json.loads(body or b'{}')
+
+    def _send(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, endpoint: str, build) -> None:
+        started = time.perf_counter()
+        payload = self._read_json()
+        settings = self.settings
+        with self.server.random_lock:
+            roll = settings.random.random()
+            delay = max(0.0, settings.latency_ms + settings.random.uniform(-settings.jitter_ms, settings.jitter_ms)) / 1000
+        time.sleep(delay)
+
+        if roll < settings.rate_limit_rate:
+            status = 429
+            self._send(429, {"error": "rate limited"}, {
+                "Retry-After": str(settings.retry_after),
+                "X-RateLimit-Remaining": "0"
+            })
+        elif roll < settings.rate_limit_rate + settings.error_rate:
+            status = 500
+            self._send(500, {"error": "internal error"})
+        else:
+            status = 200
+            self._send(200, build(payload))
+        self.recorder.add(endpoint, status, time.perf_counter() - started)
+
+
+class ProApisHandler(_MockHandler):
+    """
+    search/hosted/people, search/hosted/companies и profile-details
+
+    Каждый новый поисковый запрос получает свой набор из
+    server.profiles_per_query профилей, по 20 на страницу.
+    """
+
+    def do_POST(self):
+        path = self.path.rstrip('/')
+        if path.endswith('search/hosted/people'):
+            self._handle('search/hosted/people', self._search_people)
+        elif path.endswith('search/hosted/companies'):
+            self._handle('search/hosted/companies', self._search_companies)
+        elif path.endswith('profile-details'):
+            self._handle('profile-details', self._profile_details)
+        else:
+            self._send(404, {"error": f"unknown endpoint {self.path}"})
+
+    def _search_people(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        server = self.server
+        with server.random_lock:
+            slot = server.query_slots.setdefault(payload.get('query', ''), len(server.query_slots))
+        per_page = int(payload.get('per_page', 20))
+        page = int(payload.get('page', 1))
+        total = server.profiles_per_query
+        start = (page - 1) * per_page
+        ids = [f"bench-q{slot}-{idx}" for idx in range(start, min(start + per_page, total))]
+        return {
+            "pagination": {"page": page, "total_pages": -(-total // per_page), "per_page": per_page},
+            "data": [synthetic_search_profile(profile_id) for profile_id in ids]
+        }
+
+    def _search_companies(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "pagination": {"page": 1, "total_pages": 1, "per_page": 10},
+            "data": [{"name": "Stealth Startup", "profile_id": str(STEALTH_COMPANY_ID)}]
+        }
+
+    def _profile_details(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        return synthetic_details(str(payload.get('profile_id')), self.server.templates)
+
+
+class OpenAIHandler(_MockHandler):
+    """
+    /v1/chat/completions для промптов llm_file.py
+
+    Ответ определяется по системному промпту (stealth, компания или fused)
+    и простым признакам в заголовке, формат - как у json_object ответа.
+    """
+
+    def do_POST(self):
+        if self.path.rstrip('/').endswith('chat/completions'):
+            self._handle('chat/completions', self._completion)
+        else:
+            self._send(404, {"error": {"message": f"unknown endpoint {self.path}"}})
+
+    @staticmethod
+    def _labels(title: str) -> Dict[str, Any]:
+        lower = title.lower()
+        return {
+            "is_stealth": "stealth" in lower or "something new" in lower,
+            "is_founder": "founder" in lower,
+            "has_current_company": "@" in title and "stealth" not in lower
+        }
+
+    def _completion(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        messages = payload.get('messages', [])
+        system = next((message['content'] for message in messages if message['role'] == 'system'), "")
+        prompt = next((message['content'] for message in messages if message['role'] == 'user'), "")
+
+        if "current company names" in system:
+            title = _search(r"`Current Position`: (.*)", prompt)
+            labels = self._labels(title)
+            content = {**labels, "stealth_reason": "mock", "company_reason": "mock"}
+        elif "current company name" in system:
+            title = _search(r'Input title: "(.*)"', prompt)
+            content = {"has_current_company": self._labels(title)["has_current_company"], "reason": "mock"}
+        elif '"results"' in prompt:
+            # JSON массив профилей - между "3. Input Data" и "4. Output" (в инструкциях тоже бывают [])
+            start = prompt.index('[', prompt.index('**3. Input Data**'))
+            array = prompt[start:prompt.rindex(']', 0, prompt.index('**4. Output')) + 1]
+            content = {"results": [
+                {"profile_id": item["profile_id"], **{key: value for key, value in self._labels(item["current_position"]).items()
+                                                      if key != "has_current_company"}, "reason": "mock"}
+                for item in json.loads(array)
+            ]}
+        else:
+            labels = self._labels(_search(r"`Current Position`: (.*)", prompt))
+            content = {"is_stealth": labels["is_stealth"], "is_founder": labels["is_founder"], "reason": "mock"}
+
+        return {
+            "id": f"chatcmpl-mock-{zlib.crc32(prompt.encode('utf-8'))}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload.get('model', 'mock'),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps(content)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 20, "total_tokens": len(prompt) // 4 + 20}
+        }
+
+
+def _search(pattern: str, text: str) -> str:
+    match = re.search(pattern, text)
+    return match.group(1) if match else ""
+
+
+def start_server(handler: type, settings: MockSettings, port: int = 0, **state) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Запускает заглушку в фоновом потоке
+
+    Args:
+        handler: ProApisHandler или OpenAIHandler
+        settings: Поведение заглушки
+        port: Порт (0 - любой свободный)
+        state: Атрибуты сервера (profiles_per_query, templates, ...)
+
+    Returns:
+        Tuple: (сервер, базовый URL)
+    """
+    recorder = Recorder()
+    handler_class = type(handler.__name__, (handler,), {"settings": settings, "recorder": recorder})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler_class)
+    server.daemon_threads = True
+    server.recorder = recorder
+    server.random_lock = threading.Lock()
+    server.query_slots = {}
+    server.profiles_per_query = 100
+    server.templates = []
+    for name, value in state.items():
+        setattr(server, name, value)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушки ProApis и OpenAI")
+    parser.add_argument('--pro-port', type=int, default=8801)
+    parser.add_argument('--openai-port', type=int, default=8802)
+    parser.add_argument('--profiles-per-query', type=int, default=1000)
+    parser.add_argument('--latency-ms', type=float, default=50.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    settings = MockSettings(args.latency_ms, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate)
+    _, pro_url = start_server(ProApisHandler, settings, args.pro_port,
+                              profiles_per_query=args.profiles_per_query, templates=load_detail_templates())
+    _, openai_url = start_server(OpenAIHandler, settings, args.openai_port)
+    print(f"PRO_API_BASE_URL={pro_url}")
+    print(f"OPENAI_BASE_URL={openai_url}/v1")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,10 @@ dotenv.load_dotenv()
 PRO_API_KEY = os.getenv("PRO_API_KEY")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Адреса API (переопределяются, например, для локальных заглушек benchmarks/)
+PRO_API_BASE_URL = os.getenv("PRO_API_BASE_URL", "https://api.proapis.com/iscraper/v4")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+
 o3_mini = 'o3-mini-2025-01-31'
 gpt_4o = 'gpt-4o-2024-08-06'
 
@@ -39,4 +43,103 @@ STEALTH_KEYWORDS = [
 PAST_COMPANIE = 5356541
 
 # ID компаний (stealth)
-TARGET_COMPANIES = [18583501, 18016269]
\ No newline at end of file
+TARGET_COMPANIES = [18583501, 18016269]
+
+# Число параллельных запросов страниц поиска в _fetch_profiles (1 = последовательно)
+FETCH_CONCURRENCY = 4
+
+# Общий бюджет запросов в секунду к ProApis (на один ключ API)
+PRO_API_RPS = 2.0
+
+# Размер пула keep-alive соединений клиента ProApis
+PRO_API_POOL_SIZE = 16
+
+# Кэш ответов ProApis в одном файле SQLite (сжатые ответы): TTL в секундах
+# по эндпоинтам и лимит размера
+PRO_API_CACHE_PATH = ".proapis_cache.sqlite"
+PRO_API_CACHE_TTL = {
+    "search/hosted/people": 24 * 60 * 60,
+    "search/hosted/companies": 7 * 24 * 60 * 60,
+    "profile-details": 7 * 24 * 60 * 60
+}
+PRO_API_CACHE_MAX_BYTES = 2 * 1024 ** 3
+# PRO_API_CACHE_BYPASS=1 отключает чтение из кэша (свежие ответы все равно сохраняются)
+PRO_API_CACHE_BYPASS = os.getenv("PRO_API_CACHE_BYPASS", "0") == "1"
+
+# Число параллельных запросов деталей профилей в process_profiles
+DETAIL_CONCURRENCY = 8
+
+# Сколько профилей отправлять в одном запросе к LLM на шаге 2 (1 = по одному)
+LLM_BATCH_SIZE = 20
+
+# Режим LLM шагов 2 и 3: "online" (обычные запросы), "async" (параллельные
+# запросы через AsyncOpenAI) или "batch_api" (OpenAI Batch API)
+LLM_MODE = os.getenv("LLM_MODE", "online")
+# Максимум одновременных запросов к OpenAI в режиме async
+LLM_CONCURRENCY = 16
+# Папка с файлами заданий Batch API (нужна для продолжения после падения)
+OPENAI_BATCH_DIR = "batch_jobs"
+OPENAI_BATCH_POLL_INTERVAL = 60
+
+# Кэш результатов LLM в SQLite (LLM_CACHE=0 отключает)
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") == "1"
+LLM_CACHE_PATH = "llm_cache.sqlite"
+
+# Шаги 2-3: "two_call" (llm_classifier + company_name_classifier) или
+# "fused" (один запрос fused_classifier на профиль)
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "two_call")
+
+# Прямые признаки stealth: достаточно одного, чтобы правила решили is_stealth без LLM
+STEALTH_DIRECT_KEYWORDS = [
+        "stealth", "undisclosed", "pre-launch", "unannounced",
+        "confidential", "secret project"
+    ]
+# Решать очевидные строки правилами rules.py до LLM (RULES=0 отключает)
+RULES_ENABLED = os.getenv("RULES", "1") == "1"
+
+# Кластеризация похожих заголовков (MinHash/LSH) перед LLM шагами (CLUSTER_TITLES=1 включает)
+CLUSTER_TITLES = os.getenv("CLUSTER_TITLES", "0") == "1"
+CLUSTER_THRESHOLD = 0.8
+CLUSTER_NUM_PERM = 128
+
+# Локальная модель distill.py для шага 2: уверенные предсказания принимаются без LLM
+# (LOCAL_MODEL=distilled_model.npz включает)
+LOCAL_MODEL_PATH = os.getenv("LOCAL_MODEL")
+LOCAL_MODEL_CONFIDENCE = 0.9
+
+# Потоковое чтение входных CSV частями по N строк на шаге 1 (пусто - читать целиком)
+CSV_CHUNKSIZE = int(os.getenv("CSV_CHUNKSIZE", "0")) or None
+
+# Формат промежуточных файлов шагов main.py: parquet, arrow или csv
+STAGE_FORMAT = os.getenv("STAGE_FORMAT", "parquet")
+# Дополнительно сохранять CSV рядом с Parquet/Arrow (для ручного просмотра)
+STAGE_EXPORT_CSV = os.getenv("STAGE_EXPORT_CSV", "1") == "1"
+
+# Размер каждой очереди между шагами потокового режима (main.py --stream)
+STREAM_QUEUE_SIZE = 100
+
+# Шаг search в main.py повторяется не реже раза в SEARCH_REFRESH_DAYS дней
+# (0 - только при изменении запросов, --from search или --force)
+SEARCH_REFRESH_DAYS = float(os.getenv("SEARCH_REFRESH_DAYS", "7"))
+
+# Состояние прошлых запусков: хэши профилей и результаты шагов (run_state.py)
+RUN_STATE_PATH = "run_state.sqlite"
+# Инкрементальный режим: шаги LLM и деталей только для новых/измененных профилей (main.py --incremental)
+INCREMENTAL = os.getenv("INCREMENTAL", "0") == "1"
+
+# Хранилище профилей в SQLite: строки поиска, детали, метки LLM и результаты (profile_store.py)
+PROFILE_STORE_ENABLED = os.getenv("PROFILE_STORE", "1") == "1"
+PROFILE_STORE_PATH = "profiles.sqlite"
+
+# Сырые ответы API: archive (по умолчанию) - сжатые сегменты response_archive.py в ARCHIVE_DIR,
+# папки *_json и final_request_to_api не создаются; json - отдельные файлы как раньше
+RAW_RESPONSE_FORMAT = os.getenv("RAW_RESPONSE_FORMAT", "archive")
+ARCHIVE_DIR = "raw_archive"
+# gzip или zstd (нужен пакет zstandard)
+ARCHIVE_COMPRESSION = os.getenv("ARCHIVE_COMPRESSION", "gzip")
+ARCHIVE_SEGMENT_MAX_BYTES = 256 * 1024 * 1024
+
+# Воспроизведение без сети: страницы, детали и ответы LLM из сохраненных (main.py --replay)
+REPLAY = os.getenv("REPLAY", "0") == "1"
+# Записывать ответы chat completions в архив для воспроизведения
+LLM_RECORD = os.getenv("LLM_RECORD", "1") == "1"
@@ -0,0 +1,317 @@
+import argparse
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+LABELS = ['is_stealth', 'is_founder']
+
+_TOKEN = re.compile(r"\w+")
+
+
+def tokenize(sub_title: str, skills: str) -> List[str]:
+    """
+    Признаки профиля: слова и биграммы заголовка плюс навыки
+
+    Args:
+        sub_title: Заголовок профиля
+        skills: Навыки через запятую
+
+    Returns:
+        List[str]: Токены (навыки с префиксом "s:")
+    """
+    words = _TOKEN.findall(str(sub_title or "").lower())
+    tokens = words + [f"{first} {second}" for first, second in zip(words, words[1:])]
+    if skills and not (isinstance(skills, float) and skills != skills):
+        tokens += [f"s:{' '.join(skill.split()).lower()}" for skill in str(skills).split(",") if skill.strip()]
+    return tokens
+
+
+class DistilledClassifier:
+    """
+    TF-IDF + логистическая регрессия на NumPy, обученная на метках LLM
+
+    Предсказывает вероятности is_stealth и is_founder. Матрица признаков
+    строится пакетами, поэтому память не зависит от числа профилей.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, weights: np.ndarray, bias: np.ndarray):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    @staticmethod
+    def fit_vocabulary(docs: List[List[str]], min_df: int = 2, max_features: int = 50000) -> Tuple[Dict[str, int], np.ndarray]:
+        """
+        Строит словарь и IDF по документам
+
+        Args:
+            docs: Токены документов
+            min_df: Минимальное число документов с токеном
+            max_features: Максимальный размер словаря
+
+        Returns:
+            Tuple: (словарь токен -> столбец, вектор idf)
+        """
+        df_counts: Dict[str, int] = {}
+        for tokens in docs:
+            for token in set(tokens):
+                df_counts[token] = df_counts.get(token, 0) + 1
+
+        frequent = [(count, token) for token, count in df_counts.items() if count >= min_df]
+        frequent.sort(key=lambda item: (-item[0], item[1]))
+        frequent = frequent[:max_features]
+
+        vocabulary = {token: column for column, (_, token) in enumerate(frequent)}
+        counts = np.array([count for count, _ in frequent], dtype=np.float32)
+        idf = np.log((1 + len(docs)) / (1 + counts)) + 1
+        return vocabulary, idf.astype(np.float32)
+
+    def transform(self, docs: List[List[str]]) -> np.ndarray:
+        """
+        Превращает документы в L2-нормированную TF-IDF матрицу
+
+        Args:
+            docs: Токены документов
+
+        Returns:
+            np.ndarray формы (len(docs), размер словаря)
+        """
+        matrix = np.zeros((len(docs), len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(docs):
+            for token in tokens:
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    matrix[row, column] += 1
+        matrix *= self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return matrix / norms
+
+    def _iter_batches(self, docs: List[List[str]], batch_size: int) -> Iterable[Tuple[int, np.ndarray]]:
+        for start in range(0, len(docs), batch_size):
+            yield start, self.transform(docs[start:start + batch_size])
+
+    def predict_proba_tokens(self, docs: List[List[str]], batch_size: int = 256) -> np.ndarray:
+        """
+        Вероятности меток для токенизированных документов
+
+        Returns:
+            np.ndarray формы (len(docs), len(LABELS))
+        """
+        probabilities = np.zeros((len(docs), len(LABELS)), dtype=np.float32)
+        for start, batch in self._iter_batches(docs, batch_size):
+            probabilities[start:start + len(batch)] = _sigmoid(batch @ self.weights + self.bias)
+        return probabilities
+
+    def predict_proba(self, sub_titles: Iterable[str], skills: Iterable[str]) -> np.ndarray:
+        """
+        Вероятности is_stealth и is_founder для профилей
+
+        Args:
+            sub_titles: Заголовки
+            skills: Навыки
+
+        Returns:
+            np.ndarray формы (n, 2) в порядке LABELS
+        """
+        return self.predict_proba_tokens([tokenize(title, skill) for title, skill in zip(sub_titles, skills)])
+
+    @classmethod
+    def train(
+        cls,
+        docs: List[List[str]],
+        labels: np.ndarray,
+        epochs: int = 30,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        batch_size: int = 256,
+        seed: int = 42
+    ) -> "DistilledClassifier":
+        """
+        Обучает модель мини-батчевым градиентным спуском
+
+        Args:
+            docs: Токены документов
+            labels: Матрица меток формы (n, len(LABELS)) из 0 и 1
+            epochs: Число эпох
+            learning_rate: Шаг градиентного спуска
+            l2: Коэффициент L2-регуляризации
+            batch_size: Размер пакета
+            seed: Seed перемешивания
+
+        Returns:
+            DistilledClassifier
+        """
+        vocabulary, idf = cls.fit_vocabulary(docs)
+        positive_rate = labels.mean(axis=0).clip(1e-3, 1 - 1e-3)
+        model = cls(
+            vocabulary,
+            idf,
+            np.zeros((len(vocabulary), labels.shape[1]), dtype=np.float32),
+            np.log(positive_rate / (1 - positive_rate)).astype(np.float32)
+        )
+
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(len(docs))
+            for start in range(0, len(order), batch_size):
+                batch_rows = order[start:start + batch_size]
+                features = model.transform([docs[row] for row in batch_rows])
+                error = _sigmoid(features @ model.weights + model.bias) - labels[batch_rows]
+                model.weights -= learning_rate * (features.T @ error / len(batch_rows) + l2 * model.weights)
+                model.bias -= learning_rate * error.mean(axis=0)
+        return model
+
+    def save(self, path: str) -> None:
+        """
+        Сохраняет модель в .npz файл
+        """
+        tokens = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=object)
+        np.savez_compressed(path, tokens=tokens, idf=self.idf, weights=self.weights, bias=self.bias)
+
+    @classmethod
+    def load(cls, path: str) -> "DistilledClassifier":
+        """
+        Загружает модель из .npz файла
+        """
+        data = np.load(path, allow_pickle=True)
+        vocabulary = {str(token): column for column, token in enumerate(data['tokens'])}
+        return cls(vocabulary, data['idf'], data['weights'], data['bias'])
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(values, -30, 30)))
+
+
+def load_training_data(csv_files: List[str]) -> Tuple[List[List[str]], np.ndarray]:
+    """
+    Загружает метки LLM из CSV (например profiles_with_llm.csv)
+
+    Строки с ошибкой API, решения правил rules.py ("rule: ..."), предсказания
+    самой локальной модели и дубликаты profile_id отбрасываются.
+
+    Args:
+        csv_files: CSV со столбцами sub_title, skills, is_stealth, is_founder, stealth_reason
+
+    Returns:
+        Tuple: (токены документов, матрица меток)
+    """
+    df = pd.concat([pd.read_csv(path, dtype={'profile_id': str}) for path in csv_files], ignore_index=True)
+    df = df.drop_duplicates(subset='profile_id', keep='last')
+    if 'stealth_reason' in df.columns:
+        reason = df['stealth_reason'].fillna("").astype(str)
+        # Только ответы LLM: без ошибок, догадок локальной модели и решений правил rules.py
+        df = df[(reason != "API Error") & ~reason.str.startswith("local model") & ~reason.str.startswith("rule:")]
+
+    labels = np.column_stack([
+        df[label].astype(str).str.lower().isin(['true', '1']).to_numpy(dtype=np.float32)
+        for label in LABELS
+    ])
+    skills = df['skills'] if 'skills' in df.columns else pd.Series("", index=df.index)
+    docs = [tokenize(title, skill) for title, skill in zip(df['sub_title'], skills)]
+    return docs, labels
+
+
+def evaluate(model: DistilledClassifier, docs: List[List[str]], labels: np.ndarray, confidence: float) -> pd.DataFrame:
+    """
+    Точность и полнота на отложенных метках LLM
+
+    Считается как для всех строк (порог 0.5), так и только для уверенных
+    предсказаний, которые в режиме инференса не уходят в OpenAI.
+
+    Args:
+        model: Обученная модель
+        docs: Токены документов
+        labels: Метки LLM
+        confidence: Порог уверенности для инференса
+
+    Returns:
+        pd.DataFrame с метриками по меткам
+    """
+    probabilities = model.predict_proba_tokens(docs)
+    predicted = probabilities >= 0.5
+    confident = confident_mask(probabilities, confidence)
+    actual = labels.astype(bool)
+
+    rows = []
+    for column, label in enumerate(LABELS):
+        for scope, mask in (('all', np.ones(len(docs), dtype=bool)), ('confident', confident)):
+            tp = int((predicted[mask, column] & actual[mask, column]).sum())
+            fp = int((predicted[mask, column] & ~actual[mask, column]).sum())
+            fn = int((~predicted[mask, column] & actual[mask, column]).sum())
+            rows.append({
+                'label': label,
+                'scope': scope,
+                'rows': int(mask.sum()),
+                'precision': tp / (tp + fp) if tp + fp else float('nan'),
+                'recall': tp / (tp + fn) if tp + fn else float('nan'),
+                'accuracy': float((predicted[mask, column] == actual[mask, column]).mean()) if mask.any() else float('nan')
+            })
+    return pd.DataFrame(rows)
+
+
+def confident_mask(probabilities: np.ndarray, confidence: float) -> np.ndarray:
+    """
+    Строки, где модель уверена во всех метках сразу
+
+    Args:
+        probabilities: Результат predict_proba
+        confidence: Порог уверенности (например 0.9)
+
+    Returns:
+        np.ndarray из bool
+    """
+    return ((probabilities >= confidence) | (probabilities <= 1 - confidence)).all(axis=1)
+
+
+_model: Optional[DistilledClassifier] = None
+_model_path: Optional[str] = None
+
+def get_local_model(path: str) -> DistilledClassifier:
+    """
+    Загружает модель один раз за процесс
+    """
+    global _model, _model_path
+    if _model is None or _model_path != path:
+        _model, _model_path = DistilledClassifier.load(path), path
+    return _model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Обучение локального классификатора на метках LLM")
+    parser.add_argument('command', choices=['train'])
+    parser.add_argument('--input', nargs='+', default=['profiles_with_llm.csv'], help="CSV с метками LLM")
+    parser.add_argument('--model', default='distilled_model.npz', help="Куда сохранить модель")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Доля отложенных строк для оценки")
+    parser.add_argument('--confidence', type=float, default=0.9, help="Порог уверенности для отчета")
+    parser.add_argument('--epochs', type=int, default=30)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    docs, labels = load_training_data(args.input)
+    print(f"Загружено {len(docs)} размеченных профилей")
+
+    order = np.random.default_rng(args.seed).permutation(len(docs))
+    holdout_size = int(len(docs) * args.holdout)
+    test_rows, train_rows = order[:holdout_size], order[holdout_size:]
+
+    model = DistilledClassifier.train(
+        [docs[row] for row in train_rows], labels[train_rows], epochs=args.epochs, seed=args.seed
+    )
+
+    if holdout_size:
+        report = evaluate(model, [docs[row] for row in test_rows], labels[test_rows], args.confidence)
+        print(f"\nОценка на {holdout_size} отложенных профилях (порог уверенности {args.confidence}):")
+        print(report.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+
+    # Итоговая модель обучается на всех данных
+    model = DistilledClassifier.train(docs, labels, epochs=args.epochs, seed=args.seed)
+    model.save(args.model)
+    print(f"\nМодель сохранена в {args.model} (словарь {len(model.vocabulary)} токенов)")
+
+
+if __name__ == "__main__":
+    main()
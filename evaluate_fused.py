@@ -0,0 +1,114 @@
+import argparse
+import os
+
+import pandas as pd
+
+import config
+from llm_file import (
+    process_profiles_with_llm,
+    process_company_names,
+    process_profiles_fused
+)
+
+COMPARED_COLUMNS = ['is_stealth', 'is_founder', 'has_current_company']
+
+
+def load_sample(input_file: str, sample_file: str, size: int, seed: int) -> pd.DataFrame:
+    """
+    Загружает сохраненную выборку или создает ее из input_file
+
+    Выборка сохраняется один раз, чтобы повторные прогоны сравнивались
+    на одних и тех же профилях.
+
+    Args:
+        input_file: CSV с профилями (например filtered_df.csv)
+        sample_file: Путь к сохраненной выборке
+        size: Размер выборки
+        seed: Seed для случайного выбора
+
+    Returns:
+        pd.DataFrame: Выборка профилей
+    """
+    if os.path.exists(sample_file):
+        print(f"Используется сохраненная выборка {sample_file}")
+        return pd.read_csv(sample_file, dtype={'profile_id': str})
+
+    df = pd.read_csv(input_file, dtype={'profile_id': str})
+    sample = df.sample(n=min(size, len(df)), random_state=seed).reset_index(drop=True)
+    sample.to_csv(sample_file, index=False)
+    print(f"Создана выборка из {len(sample)} профилей: {sample_file}")
+    return sample
+
+
+def as_bool(values: pd.Series) -> pd.Series:
+    """
+    Метки из DataFrame или CSV как bool: "True"/"1" -> True, остальное и пропуски -> False
+    """
+    return values.astype(str).str.lower().isin(['true', '1'])
+
+
+def compare(two_call: pd.DataFrame, fused: pd.DataFrame) -> pd.DataFrame:
+    """
+    Считает согласие fused и двухзапросного режимов по каждому полю
+
+    Args:
+        two_call: Результаты process_profiles_with_llm + process_company_names
+        fused: Результаты process_profiles_fused
+
+    Returns:
+        pd.DataFrame: Для каждого поля - доля совпадений и матрица ошибок
+    """
+    rows = []
+    for column in COMPARED_COLUMNS:
+        expected = as_bool(two_call[column])
+        actual = as_bool(fused[column])
+        rows.append({
+            'field': column,
+            'agreement': (expected == actual).mean(),
+            'both_true': int((expected & actual).sum()),
+            'both_false': int((~expected & ~actual).sum()),
+            'only_two_call': int((expected & ~actual).sum()),
+            'only_fused': int((~expected & actual).sum())
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сравнение fused классификатора с двухзапросным режимом")
+    parser.add_argument('--input', default='filtered_df.csv', help="CSV с профилями для выборки")
+    parser.add_argument('--sample-file', default='fused_eval_sample.csv', help="Сохраненная выборка")
+    parser.add_argument('--size', type=int, default=200, help="Размер выборки")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--model', default=config.gpt_4o)
+    parser.add_argument('--output', default='fused_eval_disagreements.csv', help="CSV с расхождениями")
+    args = parser.parse_args()
+
+    sample = load_sample(args.input, args.sample_file, args.size, args.seed)
+
+    print("\nДвухзапросный режим...")
+    two_call = process_profiles_with_llm(sample.copy(), args.model)
+    two_call = process_company_names(two_call, args.model)
+
+    print("\nFused режим...")
+    fused = process_profiles_fused(sample.copy(), args.model)
+
+    report = compare(two_call, fused)
+    print("\nСогласие fused с двухзапросным режимом:")
+    print(report.to_string(index=False, float_format=lambda value: f"{value:.1%}"))
+
+    mismatch = pd.Series(False, index=sample.index)
+    for column in COMPARED_COLUMNS:
+        mismatch |= as_bool(two_call[column]) != as_bool(fused[column])
+
+    disagreements = sample.loc[mismatch, ['profile_id', 'sub_title']].copy()
+    for column in COMPARED_COLUMNS:
+        disagreements[f'{column}_two_call'] = two_call.loc[mismatch, column]
+        disagreements[f'{column}_fused'] = fused.loc[mismatch, column]
+    disagreements['stealth_reason_fused'] = fused.loc[mismatch, 'stealth_reason']
+    disagreements['company_reason_fused'] = fused.loc[mismatch, 'current_company_reason']
+    disagreements.to_csv(args.output, index=False)
+    print(f"\n{len(disagreements)} профилей с расхождениями сохранены в {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+def prompt_hash(*templates: str) -> str:
+    """
+    Хэш шаблонов промпта: при любом изменении текста меняется ключ кэша
+
+    Args:
+        templates: Тексты системного промпта и шаблонов
+
+    Returns:
+        str: Короткий sha256
+    """
+    digest = hashlib.sha256()
+    for template in templates:
+        digest.update(template.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def normalize_input(value: Any) -> str:
+    """
+    Нормализует входное значение для ключа кэша (регистр и пробелы)
+    """
+    if value is None or (isinstance(value, float) and value != value):
+        return ""
+    return " ".join(str(value).split()).lower()
+
+
+class LLMCache:
+    """
+    Кэш результатов LLM классификаторов в SQLite
+
+    Ключ - (модель, хэш шаблона промпта, нормализованные входные данные).
+    Хэш шаблона входит в ключ, поэтому после правки промпта старые записи
+    просто перестают находиться. Счетчики hits/misses считаются за время
+    жизни объекта.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+        """
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                model TEXT NOT NULL,
+                prompt_hash TEXT NOT NULL,
+                input_key TEXT NOT NULL,
+                result TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (model, prompt_hash, input_key)
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_input_key(inputs: Iterable[Any]) -> str:
+        """
+        Строит ключ из нормализованных входных значений
+        """
+        return json.dumps([normalize_input(value) for value in inputs], ensure_ascii=False)
+
+    def get_many(self, model: str, prompt_version: str, input_keys: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Возвращает сохраненные результаты для набора ключей
+
+        Args:
+            model: Модель OpenAI
+            prompt_version: Хэш шаблона промпта
+            input_keys: Ключи из make_input_key
+
+        Returns:
+            Dict: input_key -> результат (только найденные)
+        """
+        found = {}
+        unique_keys = list(dict.fromkeys(input_keys))
+        with self._lock:
+            # SQLite ограничивает число параметров в запросе, поэтому читаем частями
+            for start in range(0, len(unique_keys), 500):
+                chunk = unique_keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT input_key, result FROM llm_cache "
+                    f"WHERE model = ? AND prompt_hash = ? AND input_key IN ({placeholders})",
+                    [model, prompt_version, *chunk]
+                ).fetchall()
+                found.update((key, json.loads(result)) for key, result in rows)
+            self.hits += len(found)
+            self.misses += len(unique_keys) - len(found)
+        return found
+
+    def get(self, model: str, prompt_version: str, input_key: str) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает сохраненный результат или None
+        """
+        return self.get_many(model, prompt_version, [input_key]).get(input_key)
+
+    def put_many(self, model: str, prompt_version: str, items: Iterable[Tuple[str, Dict[str, Any]]]) -> None:
+        """
+        Сохраняет результаты одной транзакцией
+
+        Args:
+            model: Модель OpenAI
+            prompt_version: Хэш шаблона промпта
+            items: Пары (input_key, результат)
+        """
+        now = time.time()
+        rows = [
+            (model, prompt_version, key, json.dumps(result, ensure_ascii=False), now)
+            for key, result in items
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO llm_cache (model, prompt_hash, input_key, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+    def put(self, model: str, prompt_version: str, input_key: str, result: Dict[str, Any]) -> None:
+        """
+        Сохраняет один результат
+        """
+        self.put_many(model, prompt_version, [(input_key, result)])
+
+    def stats(self) -> str:
+        """
+        Строка со счетчиками попаданий и промахов
+        """
+        total = self.hits + self.misses
+        ratio = self.hits / total if total else 0.0
+        return f"{self.hits} попаданий, {self.misses} промахов ({ratio:.0%} из кэша)"
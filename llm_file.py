@@ -1,25 +1,27 @@
-from openai import OpenAI
-from typing import Dict, Any
+from openai import OpenAI, AsyncOpenAI, RateLimitError
+from typing import Dict, Any, Callable, List, Optional, Tuple
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 import json
+import random
 import config
 import pandas as pd
 from tqdm import tqdm
+from openai_batch import build_batch_request, run_batch
+from llm_cache import LLMCache, prompt_hash
+from prepare_data import normalize_title, normalize_skills
+from distill import get_local_model, confident_mask
+from rules import get_rule_engine, stealth_results, company_results, fused_results, rule_report
+from replay import RecordingClient, ReplayError, load_batch_items, record_batch_items
 
-client = OpenAI(api_key=config.OPENAI_API_KEY)
+# Ответы chat completions записываются для режима воспроизведения (replay.py)
+client = RecordingClient(OpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL))
 
-def llm_classifier(sub_title: str, skills: str, model: str) -> Dict[str, Any]:
-    """
-    Классифицирует профиль на основе заголовка и навыков
-    
-    Args:
-        sub_title: Заголовок профиля
-        skills: Навыки
-        model: Модель OpenAI для использования
-        
-    Returns:
-        Dict с результатами классификации
-    """
-    prompt = f"""
+STEALTH_SYSTEM_PROMPT = "Analyze LinkedIn profiles to identify stealth startups and founder roles."
+
+# Общие инструкции для одиночного и пакетного классификатора
+STEALTH_INSTRUCTIONS = """
                 Analyze the LinkedIn profile data to detect stealth startups and founder roles. 
 
                 **1. Stealth Startup Indicators**
@@ -51,7 +53,9 @@ def llm_classifier(sub_title: str, skills: str, model: str) -> Dict[str, Any]:
                     - "Ex-founder," "Former founder"
                     - "Advisor to startups," "Startup consultant," etc. (an advisory or third-party role, not an active founding member)
 
-                **3. Input Data**:
+"""
+
+STEALTH_PROMPT_TEMPLATE = STEALTH_INSTRUCTIONS + """                **3. Input Data**:
                 - `Current Position`: {sub_title}
                 - `Skills`: {skills}
 
@@ -65,45 +69,32 @@ def llm_classifier(sub_title: str, skills: str, model: str) -> Dict[str, Any]:
                 }}
                 ```
             """
-    
-    try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "Analyze LinkedIn profiles to identify stealth startups and founder roles."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-            max_tokens=100,
-            response_format={"type": "json_object"}  
-        )
-        
-        result = json.loads(response.choices[0].message.content)
-        return result
-        
-    except Exception as e:
-        print(f"Ошибка при запросе к OpenAI: {e}")
-        return {
-            "is_stealth": False,
-            "is_founder": False,
-            "reason": "API Error"
-        }
 
-def company_name_classifier(sub_title: str, model: str) -> Dict[str, Any]:
-    """
-    Определяет, содержит ли заголовок профиля текущее название компании
-    
-    Args:
-        sub_title: Заголовок профиля
-        model: Модель OpenAI для использования
-        
-    Returns:
-        Dict с результатами классификации
-    """
-    prompt = f"""
-                Analyze the LinkedIn profile title and determine if it contains a CURRENT company name (True/False).
+STEALTH_BATCH_PROMPT_TEMPLATE = STEALTH_INSTRUCTIONS + """                **3. Input Data**:
+                A JSON array of profiles. Each item has `profile_id`, `current_position` and `skills`:
+                {profiles_json}
+
+                **4. Output**:
+                Classify EVERY profile independently and return one result per input profile
+                with the same `profile_id`, in the following structure:
+                ```json
+                {{
+                    "results": [
+                        {{
+                            "profile_id": "profile_id from input",
+                            "is_stealth": true or false,
+                            "is_founder": true or false,
+                            "reason": "short explanation, e.g. 'Stealth in title' or 'No company + vague project'"
+                        }}
+                    ]
+                }}
+                ```
+            """
 
-                Rules for identifying current company names:
+COMPANY_SYSTEM_PROMPT = "Analyze LinkedIn profiles to identify is there current company name or not."
+
+# Правила определения текущей компании, общие для отдельного и объединенного классификатора
+COMPANY_RULES = """                Rules for identifying current company names:
                 1. Company name should be a specific organization name, not an industry or activity description
                 2. Current company names often appear after "@", "at", "in", or similar prepositions
                 3. If all companies are prefixed with "ex-", "former", or similar, then there is no current company
@@ -129,7 +120,12 @@ def company_name_classifier(sub_title: str, model: str) -> Dict[str, Any]:
                 - "Product Manager @ N26 | Previously Revolut" (N26 is current)
                 - "CEO of TechCorp | ex-Google" (TechCorp is current)
 
-                Input title: "{sub_title}"
+"""
+
+COMPANY_PROMPT_TEMPLATE = """
+                Analyze the LinkedIn profile title and determine if it contains a CURRENT company name (True/False).
+
+""" + COMPANY_RULES + """                Input title: "{sub_title}"
 
                 Return JSON format:
                 {{
@@ -137,75 +133,1008 @@ def company_name_classifier(sub_title: str, model: str) -> Dict[str, Any]:
                     "reason": "explanation of decision in 5-6 words"
                 }}
                 """
+
+FUSED_SYSTEM_PROMPT = "Analyze LinkedIn profiles to identify stealth startups, founder roles and current company names."
+
+# Объединенный промпт: stealth, founder и текущая компания за один запрос
+FUSED_PROMPT_TEMPLATE = STEALTH_INSTRUCTIONS + """                **3. Current Company Indicators**
+                Determine if the title contains a CURRENT company name (`has_current_company`).
+
+""" + COMPANY_RULES + """                **4. Input Data**:
+                - `Current Position`: {sub_title}
+                - `Skills`: {skills}
+
+                **5. Output**:
+                Return a concise JSON with the following structure:
+                ```json
+                {{
+                    "is_stealth": true or false,
+                    "is_founder": true or false,
+                    "has_current_company": true or false,
+                    "stealth_reason": "short explanation, e.g. 'Stealth in title' or 'No company + vague project'",
+                    "company_reason": "explanation of company decision in 5-6 words"
+                }}
+                ```
+            """
+
+LLM_MODES = ('online', 'async', 'batch_api')
+
+STEALTH_DEFAULT = {"is_stealth": False, "is_founder": False, "reason": "API Error"}
+COMPANY_DEFAULT = {"has_current_company": False, "reason": "API Error"}
+FUSED_DEFAULT = {
+    "is_stealth": False,
+    "is_founder": False,
+    "has_current_company": False,
+    "stealth_reason": "API Error",
+    "company_reason": "API Error"
+}
+
+# Версии промптов для ключа кэша: любая правка шаблона инвалидирует старые записи
+STEALTH_PROMPT_VERSION = prompt_hash(STEALTH_SYSTEM_PROMPT, STEALTH_PROMPT_TEMPLATE, STEALTH_BATCH_PROMPT_TEMPLATE)
+COMPANY_PROMPT_VERSION = prompt_hash(COMPANY_SYSTEM_PROMPT, COMPANY_PROMPT_TEMPLATE)
+FUSED_PROMPT_VERSION = prompt_hash(FUSED_SYSTEM_PROMPT, FUSED_PROMPT_TEMPLATE)
+
+_llm_cache = None
+
+def get_llm_cache() -> Optional[LLMCache]:
+    """
+    Возвращает общий кэш LLM результатов или None, если кэш выключен
+
+    Returns:
+        LLMCache или None
+    """
+    global _llm_cache
+    if not config.LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        _llm_cache = LLMCache(config.LLM_CACHE_PATH)
+    return _llm_cache
+
+def _is_valid_result(result: Dict[str, Any], default: Dict[str, Any]) -> bool:
+    """
+    Проверяет, что результат содержит все поля и не является заглушкой ошибки
+    """
+    return result != default and all(key in result for key in default)
+
+def stealth_request(sub_title: str, skills: str, model: str) -> Dict[str, Any]:
+    """
+    Собирает параметры chat completion для llm_classifier
+
+    Args:
+        sub_title: Заголовок профиля
+        skills: Навыки
+        model: Модель OpenAI для использования
+
+    Returns:
+        Dict с аргументами client.chat.completions.create
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": STEALTH_SYSTEM_PROMPT},
+            {"role": "user", "content": STEALTH_PROMPT_TEMPLATE.format(sub_title=sub_title, skills=skills)}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 100,
+        "response_format": {"type": "json_object"}
+    }
+
+def company_request(sub_title: str, model: str) -> Dict[str, Any]:
+    """
+    Собирает параметры chat completion для company_name_classifier
+
+    Args:
+        sub_title: Заголовок профиля
+        model: Модель OpenAI для использования
+
+    Returns:
+        Dict с аргументами client.chat.completions.create
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": COMPANY_SYSTEM_PROMPT},
+            {"role": "user", "content": COMPANY_PROMPT_TEMPLATE.format(sub_title=sub_title)}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 100,
+        "response_format": {"type": "json_object"}
+    }
+
+def fused_request(sub_title: str, skills: str, model: str) -> Dict[str, Any]:
+    """
+    Собирает параметры chat completion для fused_classifier
+
+    Args:
+        sub_title: Заголовок профиля
+        skills: Навыки
+        model: Модель OpenAI для использования
+
+    Returns:
+        Dict с аргументами client.chat.completions.create
+    """
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": FUSED_SYSTEM_PROMPT},
+            {"role": "user", "content": FUSED_PROMPT_TEMPLATE.format(sub_title=sub_title, skills=skills)}
+        ],
+        "temperature": 0.3,
+        "max_tokens": 150,
+        "response_format": {"type": "json_object"}
+    }
+
+def llm_classifier(sub_title: str, skills: str, model: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Классифицирует профиль на основе заголовка и навыков
     
+    Args:
+        sub_title: Заголовок профиля
+        skills: Навыки
+        model: Модель OpenAI для использования
+        use_cache: Читать и сохранять результат в кэше LLM
+        
+    Returns:
+        Dict с результатами классификации
+    """
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        input_key = LLMCache.make_input_key([sub_title, skills])
+        cached = cache.get(model, STEALTH_PROMPT_VERSION, input_key)
+        if cached is not None:
+            return cached
+
     try:
-        response = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "Analyze LinkedIn profiles to identify is there current company name or not."},
-                {"role": "user", "content": prompt}
+        response = client.chat.completions.create(**stealth_request(sub_title, skills, model))
+        
+        result = json.loads(response.choices[0].message.content)
+        if cache is not None and _is_valid_result(result, STEALTH_DEFAULT):
+            cache.put(model, STEALTH_PROMPT_VERSION, input_key, result)
+        return result
+        
+    except ReplayError:
+        raise
+
+    except Exception as e:
+        print(f"Ошибка при запросе к OpenAI: {e}")
+        return dict(STEALTH_DEFAULT)
+
+def _batch_item_id(profile: Dict[str, str]) -> str:
+    """
+    Стабильный id профиля в пакетном промпте: хэш нормализованных sub_title и skills
+
+    Не зависит от позиции профиля и состава пакета, поэтому записанные
+    ответы воспроизводятся и после смены фильтров или правил.
+    """
+    input_key = LLMCache.make_input_key([profile['sub_title'], profile['skills']])
+    return hashlib.sha256(input_key.encode('utf-8')).hexdigest()[:12]
+
+def llm_classifier_batch(profiles: List[Dict[str, str]], model: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Классифицирует несколько профилей одним запросом
+
+    Общие инструкции отправляются один раз, профили передаются JSON-массивом
+    со стабильными id (_batch_item_id). Ответы без id из запроса или без
+    нужных полей отбрасываются, поэтому вызывающий код должен повторить
+    запрос для недостающих профилей. Результаты записываются и в режиме
+    воспроизведения берутся по отдельным профилям (replay.load_batch_items);
+    если профиля нет в записи, ReplayError пробрасывается.
+
+    Args:
+        profiles: Список словарей с ключами profile_id, sub_title, skills
+        model: Модель OpenAI для использования
+
+    Returns:
+        Dict: profile_id -> результат классификации (только для полученных ответов)
+
+    Raises:
+        ReplayError: В режиме воспроизведения, если ответа для профилей нет
+    """
+    profile_ids: Dict[str, List[str]] = {}
+    inputs: Dict[str, Dict[str, str]] = {}
+    for profile in profiles:
+        item_id = _batch_item_id(profile)
+        profile_ids.setdefault(item_id, []).append(str(profile['profile_id']))
+        inputs.setdefault(item_id, profile)
+
+    items = load_batch_items(model, STEALTH_PROMPT_VERSION, list(inputs)) if config.REPLAY else {}
+    pending = [item_id for item_id in inputs if item_id not in items]
+
+    if pending:
+        profiles_json = json.dumps(
+            [
+                {
+                    "profile_id": item_id,
+                    "current_position": inputs[item_id]['sub_title'],
+                    "skills": inputs[item_id]['skills']
+                }
+                for item_id in pending
             ],
-            temperature=0.3,
-            max_tokens=100,
-            response_format={"type": "json_object"}  
+            ensure_ascii=False,
+            indent=1
         )
+        prompt = STEALTH_BATCH_PROMPT_TEMPLATE.format(profiles_json=profiles_json)
+
+        try:
+            response = client.chat.completions.create(
+                model=model,
+                messages=[
+                    {"role": "system", "content": STEALTH_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.3,
+                max_tokens=60 * len(pending) + 50,
+                response_format={"type": "json_object"}
+            )
+
+            answered = json.loads(response.choices[0].message.content).get('results', [])
+
+        except ReplayError as e:
+            raise ReplayError(f"нет записанного ответа для {len(pending)} профилей пакета ({e})") from e
+
+        except Exception as e:
+            print(f"Ошибка при запросе к OpenAI: {e}")
+            answered = []
+
+        expected = set(pending)
+        received = {}
+        for item in answered:
+            if not isinstance(item, dict):
+                continue
+            item_id = str(item.get('profile_id'))
+            if item_id in expected and all(key in item for key in ('is_stealth', 'is_founder', 'reason')):
+                received[item_id] = item
+        record_batch_items(model, STEALTH_PROMPT_VERSION, received)
+        items.update(received)
+
+    return {
+        profile_id: {**item, 'profile_id': profile_id}
+        for item_id, item in items.items()
+        for profile_id in profile_ids[item_id]
+    }
+
+def company_name_classifier(sub_title: str, model: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Определяет, содержит ли заголовок профиля текущее название компании
+    
+    Args:
+        sub_title: Заголовок профиля
+        model: Модель OpenAI для использования
+        use_cache: Читать и сохранять результат в кэше LLM
+        
+    Returns:
+        Dict с результатами классификации
+    """
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        input_key = LLMCache.make_input_key([sub_title])
+        cached = cache.get(model, COMPANY_PROMPT_VERSION, input_key)
+        if cached is not None:
+            return cached
+
+    try:
+        response = client.chat.completions.create(**company_request(sub_title, model))
         
         result = json.loads(response.choices[0].message.content)
+        if cache is not None and _is_valid_result(result, COMPANY_DEFAULT):
+            cache.put(model, COMPANY_PROMPT_VERSION, input_key, result)
         return result
         
+    except ReplayError:
+        raise
+
     except Exception as e:
         print(f"Ошибка при запросе к OpenAI: {e}")
-        return {
-            "has_current_company": False,
-            "reason": "API Error"
+        return dict(COMPANY_DEFAULT)
+
+def fused_classifier(sub_title: str, skills: str, model: str, use_cache: bool = True) -> Dict[str, Any]:
+    """
+    Определяет stealth, founder и наличие текущей компании одним запросом
+
+    Заменяет пару llm_classifier + company_name_classifier.
+    
+    Args:
+        sub_title: Заголовок профиля
+        skills: Навыки
+        model: Модель OpenAI для использования
+        use_cache: Читать и сохранять результат в кэше LLM
+        
+    Returns:
+        Dict с ключами is_stealth, is_founder, has_current_company,
+        stealth_reason, company_reason
+    """
+    cache = get_llm_cache() if use_cache else None
+    if cache is not None:
+        input_key = LLMCache.make_input_key([sub_title, skills])
+        cached = cache.get(model, FUSED_PROMPT_VERSION, input_key)
+        if cached is not None:
+            return cached
+
+    try:
+        response = client.chat.completions.create(**fused_request(sub_title, skills, model))
+
+        result = json.loads(response.choices[0].message.content)
+        if cache is not None and _is_valid_result(result, FUSED_DEFAULT):
+            cache.put(model, FUSED_PROMPT_VERSION, input_key, result)
+        return result
+
+    except ReplayError:
+        raise
+
+    except Exception as e:
+        print(f"Ошибка при запросе к OpenAI: {e}")
+        return dict(FUSED_DEFAULT)
+
+def _classify_in_batches(
+    profiles: List[Dict[str, str]],
+    model: str,
+    batch_size: int,
+    max_attempts: int = 3
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Классифицирует профили пакетами, повторно отправляя профили без ответа
+
+    Профили, на которые модель так и не ответила за max_attempts попыток,
+    классифицируются по одному через llm_classifier. В режиме
+    воспроизведения промах записи (ReplayError) не повторяется, а
+    пробрасывается.
+    """
+    results = {}
+    pending = list(profiles)
+
+    with tqdm(total=len(profiles), desc="Анализ профилей (пакетами)") as progress:
+        for attempt in range(max_attempts):
+            if not pending:
+                break
+            missing = []
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                batch_results = llm_classifier_batch(batch, model)
+                results.update(batch_results)
+                progress.update(len(batch_results))
+                missing.extend(p for p in batch if str(p['profile_id']) not in batch_results)
+            if missing:
+                print(f"Нет ответа для {len(missing)} профилей, повтор {attempt + 1}/{max_attempts}")
+            pending = missing
+
+        for profile in pending:
+            results[str(profile['profile_id'])] = llm_classifier(
+                profile['sub_title'], profile['skills'], model, use_cache=False
+            )
+            progress.update(1)
+
+    return results
+
+async def _complete_async(
+    async_client: AsyncOpenAI,
+    request: Dict[str, Any],
+    semaphore: asyncio.Semaphore,
+    default: Dict[str, Any],
+    max_retries: int
+) -> Dict[str, Any]:
+    """
+    Выполняет один chat completion с ограничением числа запросов в полете
+
+    При 429 ждет с экспоненциальной задержкой и джиттером, при прочих
+    ошибках возвращает default, как синхронные классификаторы.
+    """
+    async with semaphore:
+        for attempt in range(max_retries + 1):
+            try:
+                response = await async_client.chat.completions.create(**request)
+                return json.loads(response.choices[0].message.content)
+            except RateLimitError:
+                if attempt == max_retries:
+                    break
+                await asyncio.sleep(min(60, 2 ** attempt) + random.random())
+            except ReplayError:
+                raise
+            except Exception as e:
+                print(f"Ошибка при запросе к OpenAI: {e}")
+                return dict(default)
+
+    print("Ошибка при запросе к OpenAI: превышен лимит запросов (429)")
+    return dict(default)
+
+async def _classify_async_all(
+    profiles: List[Dict[str, str]],
+    build_request: Callable[[Dict[str, str]], Dict[str, Any]],
+    default: Dict[str, Any],
+    concurrency: int,
+    max_retries: int
+) -> Dict[str, Dict[str, Any]]:
+    # Клиент создается внутри цикла событий, чтобы его соединения не
+    # переживали asyncio.run
+    async with AsyncOpenAI(api_key=config.OPENAI_API_KEY, base_url=config.OPENAI_BASE_URL, max_retries=0) as raw_client:
+        async_client = RecordingClient(raw_client, is_async=True)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(profile):
+            result = await _complete_async(async_client, build_request(profile), semaphore, default, max_retries)
+            return profile['profile_id'], result
+
+        results = {}
+        tasks = [asyncio.ensure_future(run(profile)) for profile in profiles]
+        for task in tqdm(asyncio.as_completed(tasks), total=len(tasks), desc="Анализ профилей (async)"):
+            profile_id, result = await task
+            results[profile_id] = result
+        return results
+
+def classify_async(
+    profiles: List[Dict[str, str]],
+    build_request: Callable[[Dict[str, str]], Dict[str, Any]],
+    default: Dict[str, Any],
+    concurrency: Optional[int] = None,
+    max_retries: int = 6
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Классифицирует профили параллельно через AsyncOpenAI
+
+    Args:
+        profiles: Входные данные с ключом profile_id
+        build_request: Функция profile -> аргументы chat completion
+        default: Результат для профилей, по которым запрос не удался
+        concurrency: Максимум запросов в полете (по умолчанию config.LLM_CONCURRENCY)
+        max_retries: Число повторов при 429
+
+    Returns:
+        Dict: profile_id -> результат классификации
+
+    Функцию можно вызывать и внутри работающего цикла событий.
+    """
+    if concurrency is None:
+        concurrency = config.LLM_CONCURRENCY
+    coroutine = _classify_async_all(profiles, build_request, default, concurrency, max_retries)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coroutine)
+
+    # Вызов из работающего цикла событий (Jupyter, async код): asyncio.run
+    # там недоступен, поэтому свой цикл запускается в отдельном потоке
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, coroutine).result()
+
+def _assign_results(
+    df: pd.DataFrame,
+    keys: pd.Series,
+    results: Dict[str, Dict[str, Any]],
+    fields: Dict[str, str],
+    default: Dict[str, Any]
+) -> None:
+    """
+    Записывает результаты классификации в DataFrame по ключам строк
+
+    Группы без результата (нет custom_id в выходе Batch API, промах
+    replay) получают заглушку ошибки default, а не ложный отрицательный
+    ответ: по причине "API Error" их отбрасывают distill, профильное
+    хранилище и инкрементальный режим.
+
+    Args:
+        df: DataFrame с профилями
+        keys: Ключ результата для каждой строки df (id группы из _group_profiles)
+        results: ключ -> результат классификации
+        fields: столбец DataFrame -> поле результата
+        default: Заглушка ошибки (STEALTH_DEFAULT, COMPANY_DEFAULT, FUSED_DEFAULT)
+    """
+    missing = set(keys.unique()) - set(results)
+    if missing:
+        print(f"Нет результата для {len(missing)} групп из {keys.nunique()}: записана ошибка API")
+    for column, field in fields.items():
+        df[column] = keys.map(lambda key: results.get(key, default).get(field, default[field]))
+
+def _classify_with_cache(
+    profiles: List[Dict[str, str]],
+    model: str,
+    prompt_version: str,
+    input_fields: List[str],
+    default: Dict[str, Any],
+    classify: Callable[[List[Dict[str, str]]], Dict[str, Dict[str, Any]]],
+    before_api: Optional[Callable[[List[Dict[str, str]]], Dict[str, Dict[str, Any]]]] = None
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Берет результаты из кэша LLM и отправляет в classify только промахи
+
+    Args:
+        profiles: Входные данные с ключом profile_id
+        model: Модель OpenAI
+        prompt_version: Хэш шаблона промпта
+        input_fields: Поля профиля, входящие в ключ кэша
+        default: Заглушка ошибки (такие результаты не кэшируются)
+        classify: Функция, классифицирующая список профилей
+        before_api: Решает часть промахов кэша до API (локальная модель);
+            ее результаты в кэш LLM не попадают
+
+    Returns:
+        Dict: profile_id -> результат классификации
+    """
+    cache = get_llm_cache()
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = profiles
+
+    if cache is not None:
+        keys = {
+            profile['profile_id']: LLMCache.make_input_key(profile[field] for field in input_fields)
+            for profile in profiles
         }
+        cached = cache.get_many(model, prompt_version, list(keys.values()))
+        results = {profile_id: cached[key] for profile_id, key in keys.items() if key in cached}
+        pending = [profile for profile in profiles if profile['profile_id'] not in results]
+        print(f"Кэш LLM: {len(results)} из {len(profiles)} профилей найдены, {len(pending)} промахов")
+
+    if pending and before_api is not None:
+        # Точный ответ LLM из кэша важнее догадки локальной модели, поэтому она - после кэша
+        results.update(before_api(pending))
+        pending = [profile for profile in pending if profile['profile_id'] not in results]
+
+    if pending:
+        fresh = classify(pending)
+        results.update(fresh)
+        if cache is not None:
+            cache.put_many(model, prompt_version, [
+                (keys[profile_id], result)
+                for profile_id, result in fresh.items()
+                if _is_valid_result(result, default)
+            ])
+
+    if cache is not None:
+        print(f"Кэш LLM: {cache.stats()}")
+    return results
+
+def _rule_decisions(profiles: List[Dict[str, str]], build_results: Callable, stage: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Решает очевидные заголовки правилами из rules.py и печатает отчет
+
+    Args:
+        profiles: Представители групп из _group_profiles
+        build_results: stealth_results, company_results или fused_results
+        stage: Название шага для отчета
+
+    Returns:
+        Dict: id группы -> результат для групп, решенных без LLM
+    """
+    groups = pd.DataFrame(profiles, columns=['profile_id', 'sub_title'])
+    rules = get_rule_engine().evaluate(groups['sub_title'])
+    results = build_results(rules, groups['profile_id'])
+    print(rule_report(rules, len(results), stage))
+    return results
+
+def _local_model_decisions(
+    profiles: List[Dict[str, str]],
+    model_path: str,
+    confidence: float,
+    verbose: bool = True
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Принимает уверенные предсказания локальной модели (distill.py)
+
+    Args:
+        profiles: Представители групп из _group_profiles
+        model_path: Путь к модели
+        confidence: Порог уверенности для обеих меток
+        verbose: Печатать отчет
 
-def process_profiles_with_llm(df: pd.DataFrame, model: str) -> pd.DataFrame:
+    Returns:
+        Dict: id группы -> результат для групп, решенных локально
+    """
+    if not profiles:
+        return {}
+
+    probabilities = get_local_model(model_path).predict_proba(
+        [profile['sub_title'] for profile in profiles],
+        [profile['skills'] for profile in profiles]
+    )
+    confident = confident_mask(probabilities, confidence)
+
+    results = {}
+    for profile, (stealth_p, founder_p), accepted in zip(profiles, probabilities, confident):
+        if accepted:
+            results[profile['profile_id']] = {
+                "is_stealth": bool(stealth_p >= 0.5),
+                "is_founder": bool(founder_p >= 0.5),
+                "reason": f"local model (p_stealth={stealth_p:.2f}, p_founder={founder_p:.2f})"
+            }
+
+    if verbose:
+        print(f"Локальная модель: решено {len(results)} из {len(profiles)} групп, "
+              f"{len(profiles) - len(results)} отправляются в LLM")
+    return results
+
+def _group_profiles(df: pd.DataFrame, with_skills: bool, stage: str) -> Tuple[List[Dict[str, str]], pd.Series]:
+    """
+    Группирует строки по нормализованному заголовку (и навыкам) для одного запроса на группу
+
+    Если в df есть столбец title_cluster, строки одного кластера образуют одну группу.
+
+    Args:
+        df: DataFrame с профилями
+        with_skills: Учитывать навыки в ключе группы
+        stage: Название шага для отчета
+
+    Returns:
+        Tuple: представители групп (profile_id = id группы, sub_title, skills
+        первой строки группы) и id группы для каждой строки df
+    """
+    skills = df['skills'] if 'skills' in df.columns else pd.Series("", index=df.index)
+    group_key = normalize_title(df['sub_title'])
+    if with_skills:
+        group_key = group_key + "\x1f" + normalize_skills(skills)
+    if 'title_cluster' in df.columns:
+        # Кластер близких заголовков (title_clusters.py) классифицируется по одному представителю
+        clustered = df['title_cluster'].notna()
+        group_key = group_key.where(~clustered, "cluster:" + df['title_cluster'].astype(str))
+
+    codes, _ = pd.factorize(group_key)
+    keys = pd.Series([f"g{code}" for code in codes], index=df.index, dtype=object)
+
+    first_rows = ~group_key.duplicated()
+    profiles = [
+        {
+            'profile_id': keys[idx],
+            'sub_title': df.at[idx, 'sub_title'],
+            'skills': '' if pd.isna(skills[idx]) else skills[idx]
+        }
+        for idx in df.index[first_rows.to_numpy()]
+    ]
+
+    if len(df):
+        print(f"Дедупликация ({stage}): {len(df)} строк -> {len(profiles)} уникальных "
+              f"(x{len(df) / max(1, len(profiles)):.1f})")
+    return profiles, keys
+
+def _classify_with_batch_api(
+    profiles: List[Dict[str, str]],
+    name: str,
+    build_request,
+    batch_client
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Классифицирует профили через OpenAI Batch API (см. openai_batch.run_batch)
+
+    Args:
+        profiles: Входные данные с ключом profile_id
+        name: Имя задания, оно же префикс custom_id
+        build_request: Функция profile -> аргументы chat completion
+        batch_client: Клиент OpenAI или совместимая заглушка
+
+    Returns:
+        Dict: profile_id -> результат классификации
+    """
+    if config.REPLAY:
+        # Batch API не воспроизводится: берем записанные ответы обычных запросов
+        results = {}
+        for profile in profiles:
+            try:
+                response = client.chat.completions.create(**build_request(profile))
+                results[profile['profile_id']] = json.loads(response.choices[0].message.content)
+            except ReplayError:
+                continue
+        print(f"Batch {name} (воспроизведение): найдено {len(results)} из {len(profiles)} записанных ответов")
+        return results
+
+    batch_requests = [
+        build_batch_request(f"{name}-{profile['profile_id']}", build_request(profile))
+        for profile in profiles
+    ]
+    raw_results = run_batch(
+        batch_requests,
+        name,
+        batch_client or client,
+        jobs_dir=config.OPENAI_BATCH_DIR,
+        poll_interval=config.OPENAI_BATCH_POLL_INTERVAL
+    )
+
+    results = {}
+    for profile in profiles:
+        result = raw_results.get(f"{name}-{profile['profile_id']}")
+        if result is not None:
+            results[profile['profile_id']] = result
+
+    missing = len(profiles) - len(results)
+    if missing:
+        print(f"Batch {name}: нет результата для {missing} профилей")
+    return results
+
+def classify_profile(
+    kind: str,
+    sub_title: str,
+    skills: str,
+    model: str,
+    use_rules: Optional[bool] = None,
+    local_model: Optional[str] = None,
+    confidence: Optional[float] = None
+) -> Dict[str, Any]:
+    """
+    Классифицирует один профиль тем же путем, что шаги 2/3: правила
+    rules.py, кэш LLM, локальная модель (только stealth), затем LLM
+
+    Для потокового режима, где профили приходят по одному: отчеты по
+    DataFrame, которые печатают process_*, здесь не нужны.
+
+    Args:
+        kind: stealth, company или fused
+        sub_title: Заголовок профиля
+        skills: Навыки
+        model: Модель OpenAI для использования
+        use_rules: Решать очевидные строки правилами (по умолчанию config.RULES_ENABLED)
+        local_model: Путь к модели distill.py (по умолчанию config.LOCAL_MODEL_PATH)
+        confidence: Порог уверенности локальной модели (по умолчанию config.LOCAL_MODEL_CONFIDENCE)
+
+    Returns:
+        Dict с результатом в формате llm_classifier, company_name_classifier
+        или fused_classifier
+    """
+    if use_rules is None:
+        use_rules = config.RULES_ENABLED
+    if local_model is None:
+        local_model = config.LOCAL_MODEL_PATH
+
+    build_results, prompt_version, inputs = {
+        'stealth': (stealth_results, STEALTH_PROMPT_VERSION, [sub_title, skills]),
+        'company': (company_results, COMPANY_PROMPT_VERSION, [sub_title]),
+        'fused': (fused_results, FUSED_PROMPT_VERSION, [sub_title, skills])
+    }[kind]
+
+    if use_rules:
+        decided = build_results(get_rule_engine().evaluate(pd.Series([sub_title])), pd.Series(['profile']))
+        if decided:
+            return decided['profile']
+
+    cache = get_llm_cache()
+    if cache is not None:
+        cached = cache.get(model, prompt_version, LLMCache.make_input_key(inputs))
+        if cached is not None:
+            return cached
+
+    if kind == 'stealth' and local_model:
+        local = _local_model_decisions(
+            [{'profile_id': 'profile', 'sub_title': sub_title, 'skills': skills}],
+            local_model,
+            config.LOCAL_MODEL_CONFIDENCE if confidence is None else confidence,
+            verbose=False
+        )
+        if local:
+            return local['profile']
+
+    if kind == 'stealth':
+        return llm_classifier(sub_title, skills, model)
+    if kind == 'company':
+        return company_name_classifier(sub_title, model)
+    return fused_classifier(sub_title, skills, model)
+
+def process_profiles_with_llm(
+    df: pd.DataFrame,
+    model: str,
+    batch_size: Optional[int] = None,
+    mode: Optional[str] = None,
+    batch_client=None,
+    use_rules: Optional[bool] = None,
+    local_model: Optional[str] = None,
+    confidence: Optional[float] = None
+) -> pd.DataFrame:
     """
     Обрабатывает профили с помощью LLM классификатора
+
+    Строки, которые однозначно решаются правилами rules.py (stealth и founder
+    одновременно), в LLM не отправляются. Если задана локальная модель
+    (distill.py), ее уверенные предсказания принимаются без LLM для строк,
+    которых нет в кэше LLM.
+
+    Режимы:
+        online - обычные запросы; при batch_size > 1 профили отправляются
+            пакетами по batch_size штук (llm_classifier_batch), иначе по одному
+        async - параллельные запросы через AsyncOpenAI, не больше
+            config.LLM_CONCURRENCY одновременно, с backoff при 429
+        batch_api - OpenAI Batch API: дешевле и с большей пропускной
+            способностью, но результат приходит в течение часов
     
     Args:
         df: DataFrame с профилями
         model: Модель OpenAI для использования
+        batch_size: Размер пакета в режиме online (по умолчанию config.LLM_BATCH_SIZE)
+        mode: Режим выполнения (по умолчанию config.LLM_MODE)
+        batch_client: Клиент для режима batch_api (по умолчанию общий client)
+        use_rules: Решать очевидные строки правилами (по умолчанию config.RULES_ENABLED)
+        local_model: Путь к модели distill.py (по умолчанию config.LOCAL_MODEL_PATH)
+        confidence: Порог уверенности локальной модели (по умолчанию config.LOCAL_MODEL_CONFIDENCE)
         
     Returns:
         pd.DataFrame: Обработанный DataFrame с результатами классификации
     """
-    df['is_stealth'] = False
-    df['is_founder'] = False
-    df['stealth_reason'] = ""
-    
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Анализ профилей"):
-        try:
-            result = llm_classifier(row['sub_title'], row.get('skills', ''), model)
-            df.at[idx, 'is_stealth'] = result['is_stealth']
-            df.at[idx, 'is_founder'] = result['is_founder']
-            df.at[idx, 'stealth_reason'] = result['reason']
-        except Exception as e:
-            print(f"Ошибка при обработке строки {idx}: {e}")
-            
+    if batch_size is None:
+        batch_size = config.LLM_BATCH_SIZE
+    if mode is None:
+        mode = config.LLM_MODE
+    if use_rules is None:
+        use_rules = config.RULES_ENABLED
+    if local_model is None:
+        local_model = config.LOCAL_MODEL_PATH
+
+    def classify(profiles):
+        if mode == 'batch_api':
+            return _classify_with_batch_api(
+                profiles,
+                'stealth',
+                lambda profile: stealth_request(profile['sub_title'], profile['skills'], model),
+                batch_client
+            )
+        if mode == 'async':
+            return classify_async(
+                profiles,
+                lambda profile: stealth_request(profile['sub_title'], profile['skills'], model),
+                STEALTH_DEFAULT
+            )
+        if batch_size > 1:
+            return _classify_in_batches(profiles, model, batch_size)
+        return {
+            profile['profile_id']: llm_classifier(profile['sub_title'], profile['skills'], model, use_cache=False)
+            for profile in tqdm(profiles, desc="Анализ профилей")
+        }
+
+    if mode not in LLM_MODES:
+        raise ValueError(f"Неизвестный режим LLM: {mode}")
+
+    groups, keys = _group_profiles(df, with_skills=True, stage='stealth/founder')
+    results = _rule_decisions(groups, stealth_results, 'stealth/founder') if use_rules else {}
+    local_decisions = None
+    if local_model:
+        local_decisions = lambda profiles: _local_model_decisions(
+            profiles,
+            local_model,
+            config.LOCAL_MODEL_CONFIDENCE if confidence is None else confidence
+        )
+    results.update(_classify_with_cache(
+        [profile for profile in groups if profile['profile_id'] not in results],
+        model,
+        STEALTH_PROMPT_VERSION,
+        ['sub_title', 'skills'],
+        STEALTH_DEFAULT,
+        classify,
+        before_api=local_decisions
+    ))
+
+    _assign_results(df, keys, results, {
+        'is_stealth': 'is_stealth',
+        'is_founder': 'is_founder',
+        'stealth_reason': 'reason'
+    }, STEALTH_DEFAULT)
     return df
 
-def process_company_names(df: pd.DataFrame, model: str) -> pd.DataFrame:
+def process_company_names(
+    df: pd.DataFrame,
+    model: str,
+    mode: Optional[str] = None,
+    batch_client=None,
+    use_rules: Optional[bool] = None
+) -> pd.DataFrame:
     """
     Определяет наличие текущей компании в заголовках профилей
+
+    Строки с явным "@ Company"/"at Company" и другие однозначные случаи
+    решаются правилами rules.py без LLM.
     
     Args:
         df: DataFrame с профилями
         model: Модель OpenAI для использования
+        mode: Режим выполнения online, async или batch_api (по умолчанию config.LLM_MODE)
+        batch_client: Клиент для режима batch_api (по умолчанию общий client)
+        use_rules: Решать очевидные строки правилами (по умолчанию config.RULES_ENABLED)
         
     Returns:
         pd.DataFrame: Обработанный DataFrame с результатами классификации
     """
-    df['has_current_company'] = False
-    df['current_company_reason'] = ""
+    if mode is None:
+        mode = config.LLM_MODE
+    if use_rules is None:
+        use_rules = config.RULES_ENABLED
+
+    def classify(profiles):
+        if mode == 'batch_api':
+            return _classify_with_batch_api(
+                profiles,
+                'company',
+                lambda profile: company_request(profile['sub_title'], model),
+                batch_client
+            )
+        if mode == 'async':
+            return classify_async(
+                profiles,
+                lambda profile: company_request(profile['sub_title'], model),
+                COMPANY_DEFAULT
+            )
+        return {
+            profile['profile_id']: company_name_classifier(profile['sub_title'], model, use_cache=False)
+            for profile in tqdm(profiles, desc="Анализ профилей")
+        }
+
+    if mode not in LLM_MODES:
+        raise ValueError(f"Неизвестный режим LLM: {mode}")
+
+    groups, keys = _group_profiles(df, with_skills=False, stage='current company')
+    results = _rule_decisions(groups, company_results, 'current company') if use_rules else {}
+    results.update(_classify_with_cache(
+        [profile for profile in groups if profile['profile_id'] not in results],
+        model,
+        COMPANY_PROMPT_VERSION,
+        ['sub_title'],
+        COMPANY_DEFAULT,
+        classify
+    ))
     
-    for idx, row in tqdm(df.iterrows(), total=len(df), desc="Анализ профилей"):
-        try:
-            result = company_name_classifier(row['sub_title'], model)
-            df.at[idx, 'has_current_company'] = result['has_current_company']
-            df.at[idx, 'current_company_reason'] = result['reason']
-        except Exception as e:
-            print(f"Ошибка при обработке строки {idx}: {e}")
-            
+    _assign_results(df, keys, results, {
+        'has_current_company': 'has_current_company',
+        'current_company_reason': 'reason'
+    }, COMPANY_DEFAULT)
+    return df
+
+def process_profiles_fused(
+    df: pd.DataFrame,
+    model: str,
+    mode: Optional[str] = None,
+    batch_client=None,
+    use_rules: Optional[bool] = None
+) -> pd.DataFrame:
+    """
+    Заполняет результаты шагов 2 и 3 одним запросом на профиль (fused_classifier)
+
+    Добавляет те же столбцы, что process_profiles_with_llm и
+    process_company_names вместе. Без LLM обходятся строки, где правила
+    решили все три признака.
+
+    Args:
+        df: DataFrame с профилями
+        model: Модель OpenAI для использования
+        mode: Режим выполнения online, async или batch_api (по умолчанию config.LLM_MODE)
+        batch_client: Клиент для режима batch_api (по умолчанию общий client)
+        use_rules: Решать очевидные строки правилами (по умолчанию config.RULES_ENABLED)
+
+    Returns:
+        pd.DataFrame: Обработанный DataFrame с результатами классификации
+    """
+    if mode is None:
+        mode = config.LLM_MODE
+    if use_rules is None:
+        use_rules = config.RULES_ENABLED
+
+    def classify(profiles):
+        if mode == 'batch_api':
+            return _classify_with_batch_api(
+                profiles,
+                'fused',
+                lambda profile: fused_request(profile['sub_title'], profile['skills'], model),
+                batch_client
+            )
+        if mode == 'async':
+            return classify_async(
+                profiles,
+                lambda profile: fused_request(profile['sub_title'], profile['skills'], model),
+                FUSED_DEFAULT
+            )
+        return {
+            profile['profile_id']: fused_classifier(profile['sub_title'], profile['skills'], model, use_cache=False)
+            for profile in tqdm(profiles, desc="Анализ профилей")
+        }
+
+    if mode not in LLM_MODES:
+        raise ValueError(f"Неизвестный режим LLM: {mode}")
+
+    groups, keys = _group_profiles(df, with_skills=True, stage='fused')
+    results = _rule_decisions(groups, fused_results, 'fused') if use_rules else {}
+    results.update(_classify_with_cache(
+        [profile for profile in groups if profile['profile_id'] not in results],
+        model,
+        FUSED_PROMPT_VERSION,
+        ['sub_title', 'skills'],
+        FUSED_DEFAULT,
+        classify
+    ))
+
+    _assign_results(df, keys, results, {
+        'is_stealth': 'is_stealth',
+        'is_founder': 'is_founder',
+        'stealth_reason': 'stealth_reason',
+        'has_current_company': 'has_current_company',
+        'current_company_reason': 'company_reason'
+    }, FUSED_DEFAULT)
     return df
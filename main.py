@@ -1,3 +1,5 @@
+import argparse
+import time
 import pandas as pd
 from typing import List
 import os
@@ -8,61 +10,308 @@ from prepare_data import (
     prepare_initial_data,
     DEFAULT_EXCLUDE_ROLES,
     DEFAULT_INPUT_FILES,
-    save_dataframe
+    save_dataframe,
+    load_dataframe,
+    apply_schema,
+    stage_path
 )
 from llm_file import (
     process_profiles_with_llm,
-    process_company_names
+    process_company_names,
+    process_profiles_fused,
+    STEALTH_PROMPT_VERSION,
+    COMPANY_PROMPT_VERSION,
+    FUSED_PROMPT_VERSION
 )
+from title_clusters import add_title_clusters
 from more_requests import (
     process_profiles,
-    filter_stealth_companies
+    extraction_version,
+    filter_stealth_companies,
+    get_stealth_company_ids
 )
+from pipeline import Pipeline, Stage, file_hash, params_hash
+from streaming import run_streaming
+from run_state import run_incremental
+from profile_store import get_profile_store
 
-def main():
+FILTERED_FILE = stage_path('filtered_df')
+LLM_FILE = stage_path('profiles_with_llm')
+COMPANIES_FILE = stage_path('profiles_with_companies')
+NO_COMPANY_FILE = stage_path('profiles_without_company')
+DETAILS_FILE = stage_path('profiles_with_details')
+STEALTH_FILE = stage_path('founders_in_stealth_companies')
+STEALTH_COMPANY_FILE = 'stealth_company_data.json'
+
+def _save_stage(df: pd.DataFrame, path: str, stage: str, schema: str):
     """
-    Основная функция, выполняющая весь процесс анализа
+    Сохраняет результат шага в хранилище профилей и файл шага
+
+    Файл остается выгрузкой: по нему манифест определяет изменения, а
+    следующий шаг читает вход из хранилища (_load_stage).
+    """
+    save_dataframe(df, path, stage=schema)
+    store = get_profile_store()
+    if store is not None:
+        store.save_stage(stage, df, model=config.gpt_4o)
+
+def _load_stage(path: str, stage: str, schema: str) -> pd.DataFrame:
+    """
+    Вход шага из хранилища профилей; из файла шага - если хранилище
+    выключено, шаг в нем не сохранялся или файл записан позже
+    """
+    store = get_profile_store()
+    if store is not None:
+        df = store.frame(stage, newer_than=_file_mtime(path))
+        if df is not None:
+            return apply_schema(df, schema)
+    return load_dataframe(path, stage=schema)
+
+def _file_mtime(path: str):
+    if not os.path.exists(path):
+        path = os.path.splitext(path)[0] + '.csv'
+    return os.path.getmtime(path) if os.path.exists(path) else None
+
+def _rule_params() -> dict:
+    return {
+        'rules': config.RULES_ENABLED,
+        'stealth_keywords': config.STEALTH_KEYWORDS,
+        'direct_keywords': config.STEALTH_DIRECT_KEYWORDS,
+        'founder_roles': config.FOUNDER_ROLES
+    }
+
+def _llm_params() -> dict:
+    """
+    Параметры шага llm: от них зависят результаты, поэтому они входят и в
+    манифест, и в хэш профиля инкрементального режима
+    """
+    return {
+        **_rule_params(),
+        'model': config.gpt_4o,
+        'pipeline_mode': config.PIPELINE_MODE,
+        'prompts': [STEALTH_PROMPT_VERSION, FUSED_PROMPT_VERSION],
+        'local_model': file_hash(config.LOCAL_MODEL_PATH) if config.LOCAL_MODEL_PATH else None,
+        'local_model_confidence': config.LOCAL_MODEL_CONFIDENCE
+    }
+
+def _company_params() -> dict:
+    return {
+        **_rule_params(),
+        'model': config.gpt_4o,
+        'pipeline_mode': config.PIPELINE_MODE,
+        'prompts': [COMPANY_PROMPT_VERSION]
+    }
+
+def _details_params() -> dict:
+    return {
+        'extraction': extraction_version()
+    }
+
+def run_search():
+    """
+    0. Получение данных через API LinkedIn
     """
-    # 0. Получение данных через API LinkedIn
-    print("0. Получение данных через API LinkedIn...")
     run_all_parsers()
     print("Первичные данные получены и сохранены в CSV файлы")
 
-    # 1. Подготовка данных
-    print("\n1. Подготовка исходных данных...")
+def run_prepare():
+    """
+    1. Подготовка данных (и кластеризация заголовков при config.CLUSTER_TITLES)
+    """
     filtered_df = prepare_initial_data(
         input_files=DEFAULT_INPUT_FILES,
         exclude_roles=DEFAULT_EXCLUDE_ROLES
     )
-    save_dataframe(filtered_df, 'filtered_df.csv')
-    print(f"Сохранено {len(filtered_df)} профилей в filtered_df.csv")
-
-    # 2. Анализ с помощью LLM
-    print("\n2. Анализ профилей с помощью LLM...")
-    df_with_llm = process_profiles_with_llm(filtered_df, config.gpt_4o)
-    save_dataframe(df_with_llm, 'profiles_with_llm.csv')
-    print(f"Результаты LLM анализа сохранены в profiles_with_llm.csv")
-
-    # 3. Классификация компаний
-    print("\n3. Классификация названий компаний...")
-    df_with_companies = process_company_names(df_with_llm, config.gpt_4o)
-    
-    # Фильтруем профили без текущей компании
-    df_no_company = df_with_companies[df_with_companies['has_current_company'] == False]
-    save_dataframe(df_no_company, 'profiles_without_company.csv')
+
+    if config.CLUSTER_TITLES:
+        # Кластеры близких заголовков: LLM классифицирует по одному представителю на кластер
+        print("Кластеризация похожих заголовков...")
+        filtered_df = add_title_clusters(filtered_df)
+
+    _save_stage(filtered_df, FILTERED_FILE, 'filtered', 'filtered')
+    print(f"Сохранено {len(filtered_df)} профилей в {FILTERED_FILE}")
+
+def run_llm():
+    """
+    2. Анализ профилей с помощью LLM (в режиме fused - сразу с текущей компанией)
+    """
+    filtered_df = _load_stage(FILTERED_FILE, 'filtered', 'filtered')
+
+    if config.PIPELINE_MODE == 'fused':
+        # Один запрос к LLM на профиль: stealth, founder и текущая компания
+        df_with_llm = run_incremental(
+            filtered_df, 'llm_fused', lambda df: process_profiles_fused(df, config.gpt_4o),
+            version=params_hash(_llm_params())
+        )
+    else:
+        df_with_llm = run_incremental(
+            filtered_df, 'llm', lambda df: process_profiles_with_llm(df, config.gpt_4o),
+            version=params_hash(_llm_params())
+        )
+
+    _save_stage(df_with_llm, LLM_FILE, 'llm', 'llm')
+    print(f"Результаты LLM анализа сохранены в {LLM_FILE}")
+
+def run_companies():
+    """
+    3. Классификация компаний и отбор профилей без текущей компании
+    """
+    df_with_llm = _load_stage(LLM_FILE, 'llm', 'llm')
+
+    if config.PIPELINE_MODE == 'fused':
+        print("Текущая компания уже определена на шаге 2 (fused)")
+        df_with_companies = df_with_llm
+    else:
+        df_with_companies = run_incremental(
+            df_with_llm, 'companies', lambda df: process_company_names(df, config.gpt_4o),
+            version=params_hash(_company_params())
+        )
+    _save_stage(df_with_companies, COMPANIES_FILE, 'companies', 'companies')
+
+    # Фильтруем профили без текущей компании (пропуски считаются компанией)
+    no_company = df_with_companies['has_current_company'].astype('boolean').eq(False).fillna(False)
+    df_no_company = df_with_companies[no_company]
+    _save_stage(df_no_company, NO_COMPANY_FILE, 'no_company', 'companies')
     print(f"Найдено {len(df_no_company)} профилей без текущей компании")
 
-    # 4. Запросы к API для получения деталей
-    print("\n4. Получение деталей профилей через API...")
-    df_with_details = process_profiles(df_no_company)
-    save_dataframe(df_with_details, 'profiles_with_details.csv')
+def run_details():
+    """
+    4. Запросы к API для получения деталей
+    """
+    df_no_company = _load_stage(NO_COMPANY_FILE, 'no_company', 'companies')
+    df_with_details = run_incremental(
+        df_no_company, 'details', process_profiles, version=params_hash(_details_params())
+    )
+    _save_stage(df_with_details, DETAILS_FILE, 'details', 'details')
     print(f"Получены детали для {len(df_with_details)} профилей")
 
-    # 5. Фильтрация stealth компаний
-    print("\n5. Поиск stealth компаний...")
-    df_stealth = filter_stealth_companies(df_with_details)
-    save_dataframe(df_stealth, 'founders_in_stealth_companies.csv')
-    print(f"Найдено {len(df_stealth)} профилей в stealth компаниях")
+    failures = df_with_details.attrs.get('failures', {})
+    if failures:
+        df_failures = pd.DataFrame(list(failures.items()), columns=['profile_id', 'error'])
+        save_dataframe(df_failures, 'failed_profile_details.csv')
+        print(f"Ошибки по {len(failures)} профилям сохранены в failed_profile_details.csv")
+
+def run_stealth():
+    """
+    5. Фильтрация stealth компаний
+    """
+    df_with_details = _load_stage(DETAILS_FILE, 'details', 'details')
+
+    stealth_company_ids = get_stealth_company_ids(STEALTH_COMPANY_FILE)
+    print(f"Известно {len(stealth_company_ids)} ID stealth компаний")
+
+    df_stealth = filter_stealth_companies(df_with_details, stealth_company_ids)
+    save_dataframe(df_stealth, STEALTH_FILE, stage='stealth')
+    store = get_profile_store()
+    if store is not None:
+        store.upsert_results(df_stealth, run_id=time.strftime('%Y-%m-%dT%H:%M:%S'))
+    print(f"Найдено {len(df_stealth)} профилей в stealth компаниях "
+          f"(по ID: {int((df_stealth['stealth_match'] == 'company_id').sum())})")
+
+def build_pipeline() -> Pipeline:
+    """
+    Описывает шаги анализа, их входы, выходы и параметры для манифеста
+    """
+    return Pipeline([
+        Stage(
+            'search', run_search,
+            inputs=[],
+            outputs=DEFAULT_INPUT_FILES,
+            params=lambda: {
+                'past_company': config.PAST_COMPANIE,
+                'key_roles': config.KEY_ROLES,
+                'founder_roles': config.FOUNDER_ROLES,
+                'stealth_keywords': config.STEALTH_KEYWORDS,
+                'target_companies': config.TARGET_COMPANIES,
+                # У поиска нет входных файлов: номер периода обновления делает шаг устаревшим
+                'refresh_period': (
+                    int(time.time() // (config.SEARCH_REFRESH_DAYS * 24 * 60 * 60))
+                    if config.SEARCH_REFRESH_DAYS > 0 else None
+                )
+            },
+            title="0. Получение данных через API LinkedIn"
+        ),
+        Stage(
+            'prepare', run_prepare,
+            inputs=DEFAULT_INPUT_FILES,
+            outputs=[FILTERED_FILE],
+            params=lambda: {
+                'exclude_roles': DEFAULT_EXCLUDE_ROLES,
+                'cluster_titles': config.CLUSTER_TITLES,
+                'cluster_threshold': config.CLUSTER_THRESHOLD,
+                'cluster_num_perm': config.CLUSTER_NUM_PERM
+            },
+            title="1. Подготовка исходных данных"
+        ),
+        Stage(
+            'llm', run_llm,
+            inputs=[FILTERED_FILE],
+            outputs=[LLM_FILE],
+            params=lambda: {**_llm_params(), 'incremental': config.INCREMENTAL},
+            title="2. Анализ профилей с помощью LLM"
+        ),
+        Stage(
+            'companies', run_companies,
+            inputs=[LLM_FILE],
+            outputs=[COMPANIES_FILE, NO_COMPANY_FILE],
+            params=lambda: {**_company_params(), 'incremental': config.INCREMENTAL},
+            title="3. Классификация названий компаний"
+        ),
+        Stage(
+            'details', run_details,
+            inputs=[NO_COMPANY_FILE],
+            outputs=[DETAILS_FILE],
+            params=lambda: {**_details_params(), 'incremental': config.INCREMENTAL},
+            title="4. Получение деталей профилей через API"
+        ),
+        Stage(
+            'stealth', run_stealth,
+            inputs=[DETAILS_FILE],
+            outputs=[STEALTH_FILE],
+            params=lambda: {
+                'target_companies': config.TARGET_COMPANIES,
+                'stealth_company_data': file_hash(STEALTH_COMPANY_FILE)
+            },
+            title="5. Поиск stealth компаний"
+        )
+    ])
+
+def main():
+    """
+    Основная функция, выполняющая весь процесс анализа
+
+    Шаги, входы и параметры которых не изменились с прошлого запуска
+    (см. pipeline_manifest.json), пропускаются.
+    """
+    pipeline = build_pipeline()
+
+    parser = argparse.ArgumentParser(description="Поиск основателей stealth стартапов")
+    stages = pipeline.names()
+    parser.add_argument('--from', dest='start', choices=stages, help="Перезапустить с этого шага")
+    parser.add_argument('--only', choices=stages, help="Выполнить только этот шаг")
+    parser.add_argument('--until', choices=stages, help="Остановиться после этого шага")
+    parser.add_argument('--force', action='store_true', help="Не пропускать шаги по манифесту")
+    parser.add_argument('--stream', action='store_true', help="Потоковый режим: все шаги одновременно через очереди")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Отправлять в LLM и ProApis только новые и изменившиеся профили")
+    parser.add_argument('--replay', action='store_true',
+                        help="Без сети: ответы ProApis и OpenAI берутся из сохраненных")
+    args = parser.parse_args()
+
+    if args.incremental:
+        config.INCREMENTAL = True
+    if args.replay:
+        config.REPLAY = True
+
+    if args.stream:
+        df_stealth = run_streaming()
+        print(f"Найдено {len(df_stealth)} профилей в stealth компаниях")
+        return
+
+    # Инкрементальный запуск всегда заново ищет профили: иначе манифест
+    # пропустит поиск, а за ним и все следующие шаги
+    always = ['search', 'prepare'] if config.INCREMENTAL else None
+    pipeline.run(start=args.start, only=args.only, until=args.until, force=args.force, always=always)
 
 if __name__ == "__main__":
     main()
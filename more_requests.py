@@ -1,11 +1,18 @@
-import requests
+import inspect
 import json
+import numpy as np
 import pandas as pd
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Set
 from tqdm import tqdm
-import time
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import config
+from proapis_client import get_client
+from parsing_old_employee import search_company
+from profile_store import get_profile_store
+from response_archive import get_archive
+from replay import load_details
+from llm_cache import prompt_hash
 
 def format_date(date_dict: Dict) -> Optional[str]:
     """
@@ -46,6 +53,7 @@ def extract_profile_info(json_data: Dict) -> Dict[str, Any]:
                 current_position = current_group['profile_positions'][0]
                 profile_info['current_position'] = {
                     'company': current_group['company']['name'],
+                    'company_id': current_group['company'].get('id'),
                     'title': current_position['title'],
                     'start_date': format_date(current_position['date']['start']),
                     'employment_type': current_position['employment_type'],
@@ -58,110 +66,236 @@ def extract_profile_info(json_data: Dict) -> Dict[str, Any]:
         print(f"Ошибка при обработке данных: {str(e)}")
         return None
 
-def get_profile_details(profile_id: str, api_key: str) -> Dict:
+def get_profile_details(profile_id: str, api_key: Optional[str] = None) -> Dict:
     """
     Получает детальную информацию о профиле через API
     
     Args:
         profile_id: ID профиля LinkedIn
-        api_key: Ключ API
+        api_key: Ключ API (по умолчанию config.PRO_API_KEY)
         
     Returns:
         Dict с ответом API
     """
-    url = "https://api.proapis.com/iscraper/v4/profile-details"
-    headers = {
-        "Content-Type": "application/json",
-        "X-Api-Key": api_key
+    if config.REPLAY:
+        return load_details(profile_id)
+    return get_client(api_key).profile_details(profile_id)
+
+def _fetch_and_save(profile_id: str, output_dir: str) -> Dict:
+    """
+    Получает детали профиля и сразу сохраняет ответ в архив (или в
+    output_dir/<profile_id>.json при config.RAW_RESPONSE_FORMAT = 'json')
+    """
+    json_data = get_profile_details(profile_id, config.PRO_API_KEY)
+    if config.REPLAY:
+        return json_data
+
+    archive = get_archive('details')
+    if archive is not None:
+        archive.put(str(profile_id), json_data)
+        return json_data
+
+    os.makedirs(output_dir, exist_ok=True)
+    json_file_path = f"{output_dir}/{profile_id}.json"
+    with open(json_file_path, 'w', encoding='utf-8') as f:
+        json.dump(json_data, f, indent=4, ensure_ascii=False)
+
+    return json_data
+
+def _raw_ref(profile_id: str, output_dir: str) -> str:
+    """
+    Где лежит ответ profile-details: "archive" или путь к JSON файлу
+    """
+    if get_archive('details') is not None:
+        return 'archive'
+    return f"{output_dir}/{profile_id}.json"
+
+def _build_profile_row(row: pd.Series, json_data: Dict) -> Dict[str, Any]:
+    """
+    Собирает строку результата из исходной строки и ответа API
+
+    Raises:
+        ValueError: Если из ответа не удалось извлечь данные
+    """
+    profile_info = extract_profile_info(json_data)
+    if not profile_info:
+        raise ValueError("не удалось извлечь данные из ответа API")
+
+    profile_data = {
+        'profile_id': row['profile_id'],
+        'first_name': row['first_name'],
+        'last_name': row['last_name'],
+        'linkedin_sub_title': row['sub_title'],
+        'li_url': row['li_url'],
+        'api_sub_title': profile_info['api_sub_title']
     }
-    payload = {"profile_id": profile_id}
     
-    response = requests.post(url, headers=headers, json=payload)
-    
-    if response.status_code == 200:
-        return response.json()
+    if profile_info['current_position']:
+        current = profile_info['current_position']
+        profile_data.update({
+            'current_company': current['company'],
+            'current_company_id': current['company_id'],
+            'current_title': current['title'],
+            'start_date': current['start_date'],
+            'employment_type': current['employment_type'],
+            'location': current['location']
+        })
     else:
-        raise Exception(f"API вернул код {response.status_code}")
+        profile_data.update({
+            'current_company': None,
+            'current_company_id': None,
+            'current_title': None,
+            'start_date': None,
+            'employment_type': None,
+            'location': None
+        })
+
+    return profile_data
 
-def process_profiles(df_input: pd.DataFrame, output_dir: str = 'final_request_to_api') -> pd.DataFrame:
+def extraction_version() -> str:
+    """
+    Хэш кода извлечения полей из ответа profile-details (extract_profile_info,
+    _build_profile_row): при его изменении шаг details в main.py выполняется заново
+    """
+    return prompt_hash(inspect.getsource(extract_profile_info), inspect.getsource(_build_profile_row))
+
+def process_profiles(
+    df_input: pd.DataFrame,
+    output_dir: str = 'final_request_to_api',
+    concurrency: Optional[int] = None
+) -> pd.DataFrame:
     """
     Обрабатывает профили через API и сохраняет результаты
+
+    Запросы выполняются пулом потоков; темп ограничивает общий клиент ProApis
+    (config.PRO_API_RPS). Каждый ответ сохраняется (архив или output_dir) по мере
+    получения, а строки результата идут в порядке df_input независимо от
+    порядка завершения запросов. Ошибки собираются по профилям в
+    result.attrs['failures'] ({profile_id: текст ошибки}).
     
     Args:
         df_input: DataFrame с профилями
-        output_dir: Директория для сохранения результатов
+        output_dir: Директория для JSON ответов (при config.RAW_RESPONSE_FORMAT = 'json')
+        concurrency: Число параллельных запросов (по умолчанию config.DETAIL_CONCURRENCY)
         
     Returns:
         pd.DataFrame: Обработанный DataFrame
     """
-    os.makedirs(output_dir, exist_ok=True)
-    new_data = []
+    if concurrency is None:
+        concurrency = config.DETAIL_CONCURRENCY
+
+    rows = [row for _, row in df_input.iterrows()]
+    results: Dict[int, Dict[str, Any]] = {}
+    failures: Dict[str, str] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(_fetch_and_save, row['profile_id'], output_dir): position
+            for position, row in enumerate(rows)
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc="Обработка профилей"):
+            position = futures[future]
+            row = rows[position]
+            try:
+                json_data = future.result()
+                results[position] = _build_profile_row(row, json_data)
+            except Exception as e:
+                failures[row['profile_id']] = str(e)
+
+    store = get_profile_store()
+    if store is not None:
+        store.upsert_details(
+            {**profile_row, 'raw_ref': _raw_ref(profile_row['profile_id'], output_dir)}
+            for profile_row in results.values()
+        )
+
+    if failures:
+        print(f"Не удалось обработать {len(failures)} профилей из {len(rows)}")
+
+    result = pd.DataFrame([results[position] for position in sorted(results)])
+    result.attrs['failures'] = failures
+    return result
+
+def load_stealth_company_ids(company_search_file: str = 'stealth_company_data.json') -> Set[str]:
+    """
+    Собирает ID известных stealth компаний
+
+    Берутся config.TARGET_COMPANIES и profile_id из результатов
+    search_company (ответ search/hosted/companies), если файл есть.
     
-    for _, row in tqdm(df_input.iterrows(), total=len(df_input), desc="Обработка профилей"):
-        try:
-            json_data = get_profile_details(row['profile_id'], config.PRO_API_KEY)
-            
-            # Сохраняем ответ API
-            json_file_path = f"{output_dir}/{row['profile_id']}.json"
-            with open(json_file_path, 'w', encoding='utf-8') as f:
-                json.dump(json_data, f, indent=4, ensure_ascii=False)
-            
-            profile_info = extract_profile_info(json_data)
-            
-            if profile_info:
-                profile_data = {
-                    'profile_id': row['profile_id'],
-                    'first_name': row['first_name'],
-                    'last_name': row['last_name'],
-                    'linkedin_sub_title': row['sub_title'],
-                    'li_url': row['li_url'],
-                    'api_sub_title': profile_info['api_sub_title']
-                }
-                
-                if profile_info['current_position']:
-                    current = profile_info['current_position']
-                    profile_data.update({
-                        'current_company': current['company'],
-                        'current_title': current['title'],
-                        'start_date': current['start_date'],
-                        'employment_type': current['employment_type'],
-                        'location': current['location']
-                    })
-                else:
-                    profile_data.update({
-                        'current_company': None,
-                        'current_title': None,
-                        'start_date': None,
-                        'employment_type': None,
-                        'location': None
-                    })
-                
-                new_data.append(profile_data)
-        
-        except Exception as e:
-            print(f"Ошибка при обработке профиля {row['profile_id']}: {str(e)}")
+    Args:
+        company_search_file: JSON, сохраненный parsing_old_employee.search_company
         
-        time.sleep(1)  # Задержка между запросами
-    
-    return pd.DataFrame(new_data)
+    Returns:
+        Set[str]: ID компаний
+    """
+    company_ids = {str(company_id) for company_id in config.TARGET_COMPANIES}
 
-def filter_stealth_companies(df: pd.DataFrame) -> pd.DataFrame:
+    if os.path.exists(company_search_file):
+        with open(company_search_file, 'r', encoding='utf-8') as f:
+            company_data = json.load(f)
+        company_ids.update(
+            str(company['profile_id'])
+            for company in company_data.get('data', [])
+            if company.get('profile_id')
+        )
+
+    return company_ids
+
+def _company_id_keys(company_ids: pd.Series) -> pd.Series:
+    """
+    Приводит ID компаний к строкам (после CSV целые ID могут стать float)
+    """
+    return company_ids.astype(str).str.replace(r"\.0$", "", regex=True)
+
+def get_stealth_company_ids(company_search_file: str = 'stealth_company_data.json') -> Set[str]:
+    """
+    ID stealth компаний для шага 5 и потокового режима
+
+    Если результатов search_company еще нет, компании сначала ищутся через
+    API (кроме режима воспроизведения).
+
+    Args:
+        company_search_file: JSON, сохраненный parsing_old_employee.search_company
+
+    Returns:
+        Set[str]: ID компаний
+    """
+    if not os.path.exists(company_search_file) and not config.REPLAY:
+        search_company()
+    return load_stealth_company_ids(company_search_file)
+
+def filter_stealth_companies(df: pd.DataFrame, stealth_company_ids: Optional[Set[str]] = None) -> pd.DataFrame:
     """
     Фильтрует DataFrame, оставляя только профили со stealth компаниями
+
+    Сначала профиль сопоставляется по current_company_id с известными
+    stealth компаниями, для остальных используется прежняя проверка
+    названия на "stealth". Сработавшее правило записывается в столбец
+    stealth_match ('company_id' или 'company_name').
     
     Args:
         df: DataFrame с профилями
+        stealth_company_ids: ID stealth компаний (по умолчанию load_stealth_company_ids())
         
     Returns:
         pd.DataFrame: Отфильтрованный DataFrame
     """
-    rows_to_add = []
-    
-    for idx, row in df.iterrows():
-        try:
-            if pd.notna(row['current_company']) and 'stealth' in str(row['current_company']).lower():
-                rows_to_add.append(row)
-        except Exception as e:
-            print(f"Ошибка при обработке строки {idx}: {e}")
-    
-    return pd.DataFrame(rows_to_add)
+    if stealth_company_ids is None:
+        stealth_company_ids = load_stealth_company_ids()
+
+    if 'current_company_id' in df.columns:
+        company_ids = df['current_company_id']
+        by_id = company_ids.notna() & _company_id_keys(company_ids).isin(stealth_company_ids)
+    else:
+        by_id = pd.Series(False, index=df.index)
+
+    if 'current_company' in df.columns:
+        by_name = df['current_company'].fillna("").astype(str).str.contains('stealth', case=False, regex=False)
+    else:
+        by_name = pd.Series(False, index=df.index)
+
+    matched = by_id | by_name
+    result = df[matched].copy()
+    result['stealth_match'] = np.where(by_id[matched], 'company_id', 'company_name')
+    return result
@@ -0,0 +1,396 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+CHAT_COMPLETIONS_URL = "/v1/chat/completions"
+FINAL_STATUSES = {"completed", "failed", "expired", "cancelled"}
+
+# Лимиты одного batch: число строк и размер входного файла
+MAX_BATCH_REQUESTS = 50_000
+MAX_BATCH_BYTES = 200 * 1024 * 1024
+
+
+def build_batch_request(custom_id: str, request: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Оборачивает аргументы chat completion в строку входного файла Batch API
+
+    Args:
+        custom_id: Идентификатор строки, по нему результаты сопоставляются с DataFrame
+        request: Аргументы client.chat.completions.create
+
+    Returns:
+        Dict для одной строки JSONL
+    """
+    return {
+        "custom_id": custom_id,
+        "method": "POST",
+        "url": CHAT_COMPLETIONS_URL,
+        "body": request
+    }
+
+
+def write_batch_file(batch_requests: List[Dict[str, Any]], path: str) -> None:
+    """
+    Записывает запросы в JSONL файл для Batch API
+
+    Args:
+        batch_requests: Строки из build_batch_request
+        path: Путь к файлу
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        for item in batch_requests:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+def parse_batch_output(output_text: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Разбирает выходной файл Batch API
+
+    Args:
+        output_text: Содержимое выходного JSONL файла
+
+    Returns:
+        Dict: custom_id -> распарсенный JSON из ответа модели
+    """
+    results = {}
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get('response') or {}
+        if response.get('status_code') != 200:
+            continue
+        try:
+            content = response['body']['choices'][0]['message']['content']
+            results[item['custom_id']] = json.loads(content)
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+    return results
+
+
+def parse_batch_errors(output_text: str) -> Dict[str, str]:
+    """
+    Собирает custom_id строк без успешного ответа (из файла ошибок или выходного файла)
+
+    Args:
+        output_text: Содержимое JSONL файла
+
+    Returns:
+        Dict: custom_id -> описание ошибки
+    """
+    errors = {}
+    for line in output_text.splitlines():
+        if not line.strip():
+            continue
+        item = json.loads(line)
+        response = item.get('response') or {}
+        if response.get('status_code') != 200:
+            error = item.get('error') or response.get('body') or response.get('status_code')
+            errors[item['custom_id']] = json.dumps(error, ensure_ascii=False) if not isinstance(error, str) else error
+    return errors
+
+
+def split_batch_requests(
+    batch_requests: List[Dict[str, Any]],
+    max_requests: Optional[int] = None,
+    max_bytes: Optional[int] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Делит запросы на части в пределах лимитов одного batch (число строк и размер файла)
+
+    Args:
+        batch_requests: Строки из build_batch_request
+        max_requests: Максимум строк в одном входном файле (по умолчанию MAX_BATCH_REQUESTS)
+        max_bytes: Максимальный размер входного файла в байтах (по умолчанию MAX_BATCH_BYTES)
+
+    Returns:
+        List: Части запросов в исходном порядке
+    """
+    max_requests = max_requests or MAX_BATCH_REQUESTS
+    max_bytes = max_bytes or MAX_BATCH_BYTES
+    chunks: List[List[Dict[str, Any]]] = []
+    chunk: List[Dict[str, Any]] = []
+    chunk_bytes = 0
+    for item in batch_requests:
+        item_bytes = len((json.dumps(item, ensure_ascii=False) + "\n").encode('utf-8'))
+        if chunk and (len(chunk) >= max_requests or chunk_bytes + item_bytes > max_bytes):
+            chunks.append(chunk)
+            chunk, chunk_bytes = [], 0
+        chunk.append(item)
+        chunk_bytes += item_bytes
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def _load_state(state_path: str) -> Dict[str, Any]:
+    if os.path.exists(state_path):
+        with open(state_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+
+def _save_state(state_path: str, state: Dict[str, Any]) -> None:
+    tmp_path = f"{state_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def _job_dir(batch_requests: List[Dict[str, Any]], name: str, jobs_dir: str, attempt: int = 0) -> str:
+    payload = "".join(json.dumps(item, ensure_ascii=False, sort_keys=True) + "\n" for item in batch_requests)
+    digest = hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+    # Повторы - отдельные задания, иначе они совпали бы с уже загруженным
+    suffix = f"_retry{attempt}" if attempt else ""
+    return os.path.join(jobs_dir, f"{name}_{digest}{suffix}")
+
+
+def _submit_job(batch_requests: List[Dict[str, Any]], name: str, client, job_dir: str) -> Dict[str, Any]:
+    """
+    Отправляет часть запросов, если для job_dir еще нет активного batch
+
+    Returns:
+        Dict: Состояние задания (state.json)
+    """
+    os.makedirs(job_dir, exist_ok=True)
+    state_path = os.path.join(job_dir, "state.json")
+    state = _load_state(state_path)
+    if state.get('batch_id'):
+        if state.get('status') != 'downloaded':
+            print(f"Batch {name}: продолжаем ожидание batch_id={state['batch_id']}")
+        return state
+
+    input_path = os.path.join(job_dir, "input.jsonl")
+    write_batch_file(batch_requests, input_path)
+    with open(input_path, 'rb') as f:
+        input_file = client.files.create(file=f, purpose="batch")
+    batch = client.batches.create(
+        input_file_id=input_file.id,
+        endpoint=CHAT_COMPLETIONS_URL,
+        completion_window="24h"
+    )
+    state = {"input_file_id": input_file.id, "batch_id": batch.id, "status": batch.status}
+    _save_state(state_path, state)
+    print(f"Batch {name}: отправлено {len(batch_requests)} запросов, batch_id={batch.id}")
+    return state
+
+
+def _collect_job(
+    name: str,
+    client,
+    job_dir: str,
+    poll_interval: float,
+    deadline: Optional[float]
+) -> str:
+    """
+    Ждет завершения batch и возвращает выходной файл вместе с файлом ошибок
+
+    Результаты завершенного batch (completed, а также частичные у expired и
+    cancelled) сохраняются в output.jsonl. Если batch не завершился
+    успешно, batch_id удаляется из состояния, чтобы задание можно было
+    отправить заново.
+
+    Returns:
+        str: Строки выходного файла и файла ошибок ("" если их нет)
+
+    Raises:
+        TimeoutError: Если batch не завершился к deadline
+    """
+    state_path = os.path.join(job_dir, "state.json")
+    output_path = os.path.join(job_dir, "output.jsonl")
+    state = _load_state(state_path)
+
+    if state.get('status') == 'downloaded' and os.path.exists(output_path):
+        print(f"Batch {name}: результаты уже загружены ({output_path})")
+        with open(output_path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    while True:
+        batch = client.batches.retrieve(state['batch_id'])
+        if batch.status != state.get('status'):
+            state['status'] = batch.status
+            _save_state(state_path, state)
+            print(f"Batch {name}: статус {batch.status}")
+        if batch.status in FINAL_STATUSES:
+            break
+        if deadline is not None and time.monotonic() > deadline:
+            raise TimeoutError(f"Batch {state['batch_id']} не завершился вовремя")
+        time.sleep(poll_interval)
+
+    # У expired и cancelled может быть частичный результат, у всех - файл ошибок
+    output_text = ""
+    for file_id in (getattr(batch, 'output_file_id', None), getattr(batch, 'error_file_id', None)):
+        if file_id:
+            text = client.files.content(file_id).text
+            output_text += text if text.endswith("\n") or not text else text + "\n"
+
+    if batch.status == "completed":
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(output_text)
+        state['status'] = 'downloaded'
+    else:
+        print(f"Batch {state['batch_id']} завершился со статусом {batch.status}, задание будет отправлено заново")
+        state = {"status": batch.status, "failed_batch_id": state['batch_id']}
+    _save_state(state_path, state)
+    return output_text
+
+
+def run_batch(
+    batch_requests: List[Dict[str, Any]],
+    name: str,
+    client,
+    jobs_dir: str = "batch_jobs",
+    poll_interval: float = 30.0,
+    timeout: Optional[float] = None,
+    max_retries: int = 2
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Выполняет запросы через OpenAI Batch API и возвращает результаты по custom_id
+
+    Запросы делятся на части в пределах лимитов одного batch
+    (MAX_BATCH_REQUESTS строк, MAX_BATCH_BYTES байт), каждая часть -
+    отдельное задание. Состояние задания хранится в
+    <jobs_dir>/<name>_<хэш>/state.json, где хэш считается от содержимого
+    входного файла. Если процесс упал во время ожидания, повторный вызов с
+    теми же запросами продолжит опрос тех же batch вместо отправки новых.
+
+    Строки без результата (ошибки в файле ошибок, failed или expired batch)
+    отправляются заново, до max_retries раз.
+
+    Args:
+        batch_requests: Строки из build_batch_request
+        name: Имя задания (например "stealth" или "company")
+        client: Клиент OpenAI (или совместимая заглушка, см. LocalBatchClient)
+        jobs_dir: Папка для файлов заданий
+        poll_interval: Интервал опроса статуса в секундах
+        timeout: Максимальное время ожидания в секундах (None - без ограничения)
+        max_retries: Сколько раз повторять строки без результата
+
+    Returns:
+        Dict: custom_id -> распарсенный JSON из ответа модели (строк, которые
+        так и не удалось выполнить, в нем нет)
+
+    Raises:
+        TimeoutError: Если batch не завершился за timeout секунд
+    """
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    results: Dict[str, Dict[str, Any]] = {}
+    errors: Dict[str, str] = {}
+    pending = batch_requests
+
+    for attempt in range(max_retries + 1):
+        chunks = split_batch_requests(pending)
+        if len(chunks) > 1:
+            print(f"Batch {name}: {len(pending)} запросов разделены на {len(chunks)} частей")
+        job_dirs = [_job_dir(chunk, name, jobs_dir, attempt) for chunk in chunks]
+        for chunk, job_dir in zip(chunks, job_dirs):
+            _submit_job(chunk, name, client, job_dir)
+
+        for job_dir in job_dirs:
+            output_text = _collect_job(name, client, job_dir, poll_interval, deadline)
+            results.update(parse_batch_output(output_text))
+            errors.update(parse_batch_errors(output_text))
+
+        pending = [item for item in pending if item['custom_id'] not in results]
+        if not pending:
+            break
+        if attempt < max_retries:
+            print(f"Batch {name}: {len(pending)} запросов без результата, повторная отправка "
+                  f"({attempt + 1}/{max_retries})")
+
+    if pending:
+        sample = [f"{item['custom_id']}: {errors.get(item['custom_id'], 'нет ответа')}" for item in pending[:3]]
+        print(f"Batch {name}: нет результата для {len(pending)} запросов, например {sample}")
+    return results
+
+
+class _Obj:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class LocalBatchClient:
+    """
+    Локальная заглушка клиента OpenAI для проверки Batch API режима без сети
+
+    Ответы берутся из JSONL файла со строками {"custom_id": ..., "content": {...}}.
+    Batch переходит в completed после pending_polls опросов. Для custom_id без
+    ответа в файле строка с ошибкой пишется в файл ошибок (error_file_id),
+    как это делает Batch API. Первые fail_batches заданий завершаются со
+    статусом failed без результатов.
+    """
+
+    def __init__(self, responses_path: str, pending_polls: int = 1, fail_batches: int = 0):
+        """
+        Args:
+            responses_path: JSONL файл с готовыми ответами
+            pending_polls: Сколько опросов batch остается в статусе in_progress
+            fail_batches: Сколько первых batch завершаются со статусом failed
+        """
+        self.responses = {}
+        with open(responses_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    item = json.loads(line)
+                    self.responses[item['custom_id']] = item['content']
+        self.pending_polls = pending_polls
+        self.fail_batches = fail_batches
+        self._files: Dict[str, str] = {}
+        self._batches: Dict[str, Dict[str, Any]] = {}
+        self.files = _Obj(create=self._create_file, content=self._file_content)
+        self.batches = _Obj(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    def _create_file(self, file, purpose: str):
+        file_id = f"file-{len(self._files) + 1}"
+        self._files[file_id] = file.read().decode('utf-8')
+        return _Obj(id=file_id, purpose=purpose)
+
+    def _file_content(self, file_id: str):
+        return _Obj(text=self._files[file_id])
+
+    def _add_file(self, lines: List[str]) -> Optional[str]:
+        if not lines:
+            return None
+        file_id = f"file-{len(self._files) + 1}"
+        self._files[file_id] = "\n".join(lines) + "\n"
+        return file_id
+
+    def _create_batch(self, input_file_id: str, endpoint: str, completion_window: str):
+        batch_id = f"batch-{len(self._batches) + 1}"
+        self._batches[batch_id] = {"input_file_id": input_file_id, "polls": 0}
+        return _Obj(id=batch_id, status="validating", output_file_id=None, error_file_id=None)
+
+    def _retrieve_batch(self, batch_id: str):
+        batch = self._batches[batch_id]
+        batch['polls'] += 1
+        if batch['polls'] <= self.pending_polls:
+            return _Obj(id=batch_id, status="in_progress", output_file_id=None, error_file_id=None)
+
+        if int(batch_id.split('-')[1]) <= self.fail_batches:
+            return _Obj(id=batch_id, status="failed", output_file_id=None, error_file_id=None)
+
+        if 'output_file_id' not in batch:
+            output_lines, error_lines = [], []
+            for line in self._files[batch['input_file_id']].splitlines():
+                custom_id = json.loads(line)['custom_id']
+                if custom_id in self.responses:
+                    content = json.dumps(self.responses[custom_id], ensure_ascii=False)
+                    response = {
+                        "status_code": 200,
+                        "body": {"choices": [{"message": {"role": "assistant", "content": content}}]}
+                    }
+                    output_lines.append(json.dumps({"custom_id": custom_id, "response": response}, ensure_ascii=False))
+                else:
+                    response = {"status_code": 404, "body": {"error": "no stub response"}}
+                    error_lines.append(json.dumps({"custom_id": custom_id, "response": response}, ensure_ascii=False))
+            batch['output_file_id'] = self._add_file(output_lines)
+            batch['error_file_id'] = self._add_file(error_lines)
+
+        return _Obj(
+            id=batch_id,
+            status="completed",
+            output_file_id=batch['output_file_id'],
+            error_file_id=batch['error_file_id']
+        )
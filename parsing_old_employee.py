@@ -1,39 +1,25 @@
 import config
-import requests
 import json
-import time
 import csv
 import os
+from concurrent.futures import ThreadPoolExecutor
+from proapis_client import get_client
+from profile_store import get_profile_store
+from response_archive import get_archive
+from replay import load_page
 
 def search_company():
-    url = "https://api.proapis.com/iscraper/v4/search/hosted/companies"
-    headers = {
-        "x-api-key": config.PRO_API_KEY,
-        "content-type": "application/json"
-    }
-    
-    payload = {
-        "page": 1,
-        "per_page": 10,
-        "query": "name:\"Stealth Startup\""
-    }
-    
-    response = requests.post(url, headers=headers, json=payload)
+    company_data = get_client().search_companies("name:\"Stealth Startup\"", page=1, per_page=10)
 
     with open('stealth_company_data.json', 'w', encoding='utf-8') as f:
-        json.dump(response.json(), f, ensure_ascii=False, indent=2)
+        json.dump(company_data, f, ensure_ascii=False, indent=2)
     
-    return response.json()
+    return company_data
 
-def parse_revolut_by_past_roles():
+def parse_revolut_by_past_roles(on_rows=None):
     """
     Парсит бывших сотрудников Revolut по их прошлым должностям в компании
     """
-    url = "https://api.proapis.com/iscraper/v4/search/hosted/people"
-    headers = {
-        "x-api-key": config.PRO_API_KEY,
-        "content-type": "application/json"
-    }
     
     
     roles_query_parts = []
@@ -49,21 +35,14 @@ def parse_revolut_by_past_roles():
     csv_filename = "revolut_past_key_roles.csv"
     json_folder = "past_roles_json"
     
-    if not os.path.exists(json_folder):
-        os.makedirs(json_folder)
     
 
-    _fetch_profiles(url, headers, query, csv_filename, "past_roles", json_folder)
+    _fetch_profiles(query, csv_filename, "past_roles", json_folder, on_rows=on_rows)
     
     return csv_filename
 
-def parse_revolut_founders():
+def parse_revolut_founders(on_rows=None):
 
-    url = "https://api.proapis.com/iscraper/v4/search/hosted/people"
-    headers = {
-        "x-api-key": config.PRO_API_KEY,
-        "content-type": "application/json"
-    }
     
 
     
@@ -82,21 +61,14 @@ def parse_revolut_founders():
     json_folder = "founders_json"
     
 
-    if not os.path.exists(json_folder):
-        os.makedirs(json_folder)
     
 
-    _fetch_profiles(url, headers, query, csv_filename, "founder", json_folder)
+    _fetch_profiles(query, csv_filename, "founder", json_folder, on_rows=on_rows)
     
     return csv_filename
 
-def parse_revolut_stealth_titles():
+def parse_revolut_stealth_titles(on_rows=None):
 
-    url = "https://api.proapis.com/iscraper/v4/search/hosted/people"
-    headers = {
-        "x-api-key": config.PRO_API_KEY,
-        "content-type": "application/json"
-    }
     
     
 
@@ -118,102 +90,207 @@ def parse_revolut_stealth_titles():
     json_folder = "stealth_json"
     
     
-    if not os.path.exists(json_folder):
-        os.makedirs(json_folder)
     
     
-    _fetch_profiles(url, headers, query, csv_filename, "stealth_title", json_folder)
+    _fetch_profiles(query, csv_filename, "stealth_title", json_folder, on_rows=on_rows)
     
     return csv_filename
 
-def _fetch_profiles(url, headers, query, csv_filename, query_type, json_folder):
-    
+CSV_FIELDNAMES = [
+    'profile_id', 'first_name', 'last_name', 'sub_title',
+    'location_city', 'location_country', 'li_url', 'skills',
+    'query_type'
+]
+
+def _request_page(query, page, json_folder):
+    """
+    Запрашивает одну страницу поиска и сохраняет ответ в архив под ключом
+    json_folder/page_N (или в файл json_folder/page_N.json при
+    config.RAW_RESPONSE_FORMAT = 'json')
+
+    Args:
+        query: Поисковый запрос
+        page: Номер страницы
+        json_folder: Папка для JSON-ответов
+
+    Returns:
+        Dict с ответом API
+    """
+    if config.REPLAY:
+        return load_page(json_folder, page)
+
+    api_response = get_client().search_people(query, page=page, per_page=20)
+
+    archive = get_archive('pages')
+    if archive is not None:
+        archive.put(f"{os.path.normpath(json_folder)}/page_{page}", api_response)
+        return api_response
+
+    os.makedirs(json_folder, exist_ok=True)
+    json_path = os.path.join(json_folder, f'page_{page}.json')
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(api_response, f, ensure_ascii=False, indent=2)
+
+    return api_response
+
+def _profile_rows(api_response, query_type):
+    """
+    Преобразует профили из ответа API в строки для CSV
+
+    Args:
+        api_response: Ответ API со страницей поиска
+        query_type: Тип запроса
+
+    Returns:
+        List[Dict] со строками для CSV
+    """
+    rows = []
+    for profile in api_response.get('data', []):
+        skills_str = ', '.join(profile.get('skills', [])) if profile.get('skills') else ''
+
+        rows.append({
+            'profile_id': profile.get('profile_id', ''),
+            'first_name': profile.get('first_name', ''),
+            'last_name': profile.get('last_name', ''),
+            'sub_title': profile.get('sub_title', ''),
+            'location_city': profile.get('location_city', ''),
+            'location_country': profile.get('location_country', ''),
+            'li_url': profile.get('li_url', ''),
+            'skills': skills_str,
+            'query_type': query_type
+        })
+    return rows
+
+def _fetch_profiles(query, csv_filename, query_type, json_folder, concurrency=None, on_rows=None):
+    """
+    Загружает все страницы поиска и записывает профили в CSV
+
+    Первая страница запрашивается отдельно, чтобы узнать pagination.total_pages.
+    Остальные страницы при concurrency > 1 загружаются параллельно пулом потоков,
+    но строки в CSV записываются в порядке страниц.
+
+    Args:
+        query: Поисковый запрос
+        csv_filename: Путь к выходному CSV файлу
+        query_type: Тип запроса (пишется в столбец query_type)
+        json_folder: Папка для JSON-ответов (при архиве - префикс ключей)
+        concurrency: Число параллельных запросов (по умолчанию config.FETCH_CONCURRENCY)
+        on_rows: Вызывается со строками каждой записанной страницы (потоковый режим)
+
+    Returns:
+        Dict[int, str]: Страницы, которые не удалось загрузить, и текст ошибки
+        (они перечисляются в конце вывода)
+    """
+    if concurrency is None:
+        concurrency = config.FETCH_CONCURRENCY
+
     with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            'profile_id', 'first_name', 'last_name', 'sub_title', 
-            'location_city', 'location_country', 'li_url', 'skills',
-            'query_type'
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+        writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDNAMES)
         writer.writeheader()
         
         profiles_fetched = 0
-        page = 1
-        has_more_pages = True
-        
-        while has_more_pages:
-            print(f"Загрузка страницы {page} для запроса {query_type}...")
-            
-            payload = {
-                "page": page,
-                "per_page": 20,
-                "query": query
-            }
-            
-            try:
-                response = requests.post(url, headers=headers, json=payload)
-                response.raise_for_status()
-                
-                api_response = response.json()
-                
-                json_path = os.path.join(json_folder, f'page_{page}.json')
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(api_response, f, ensure_ascii=False, indent=2)
-                
-                profiles = api_response.get('data', [])
-                
-                if not profiles:
-                    print(f"Нет данных на странице {page}. Завершаем запрос.")
-                    has_more_pages = False
-                    continue
-                
-                for profile in profiles:
-                    skills_str = ', '.join(profile.get('skills', [])) if profile.get('skills') else ''
-                    
-                    profile_data = {
-                        'profile_id': profile.get('profile_id', ''),
-                        'first_name': profile.get('first_name', ''),
-                        'last_name': profile.get('last_name', ''),
-                        'sub_title': profile.get('sub_title', ''),
-                        'location_city': profile.get('location_city', ''),
-                        'location_country': profile.get('location_country', ''),
-                        'li_url': profile.get('li_url', ''),
-                        'skills': skills_str,
-                        'query_type': query_type
-                    }
-                    
-                    writer.writerow(profile_data)
-                    profiles_fetched += 1
-                
-                print(f"Получено {len(profiles)} профилей со страницы {page}. Всего: {profiles_fetched}")
-                
-                pagination = api_response.get('pagination', {})
-                total_pages = pagination.get('total_pages', 0)
-                
-                if page >= total_pages:
-                    has_more_pages = False
-                else:
-                    page += 1
-                    time.sleep(1)
-            
-            except Exception as e:
-                print(f"Ошибка при выполнении запроса: {e}")
-                has_more_pages = False
+        failed_pages = {}
+
+        def write_page(page, api_response):
+            nonlocal profiles_fetched
+            rows = _profile_rows(api_response, query_type)
+            writer.writerows(rows)
+            profiles_fetched += len(rows)
+            store = get_profile_store()
+            if store is not None:
+                store.upsert_search_hits(rows, page)
+            if on_rows is not None:
+                on_rows(rows)
+            print(f"Получено {len(rows)} профилей со страницы {page}. Всего: {profiles_fetched}")
+            return rows
+
+        print(f"Загрузка страницы 1 для запроса {query_type}...")
+        try:
+            first_response = _request_page(query, 1, json_folder)
+        except Exception as e:
+            print(f"Ошибка при выполнении запроса: {e}")
+            first_response = None
+            failed_pages = {1: str(e)}
+
+        if first_response is not None and write_page(1, first_response):
+            total_pages = first_response.get('pagination', {}).get('total_pages', 0)
+            remaining_pages = range(2, total_pages + 1)
+
+            if concurrency > 1 and len(remaining_pages) > 0:
+                failed_pages = _fetch_pages_concurrently(
+                    query, json_folder, remaining_pages,
+                    concurrency, query_type, write_page
+                )
+            else:
+                for page in remaining_pages:
+                    print(f"Загрузка страницы {page} для запроса {query_type}...")
+                    try:
+                        api_response = _request_page(query, page, json_folder)
+                    except Exception as e:
+                        print(f"Ошибка при выполнении запроса: {e}")
+                        failed_pages = {p: str(e) for p in range(page, total_pages + 1)}
+                        break
+
+                    if not write_page(page, api_response):
+                        print(f"Нет данных на странице {page}. Завершаем запрос.")
+                        break
+        elif first_response is not None:
+            print("Нет данных на странице 1. Завершаем запрос.")
     
     print(f"Парсинг завершен. Получено {profiles_fetched} профилей.")
+    if failed_pages:
+        print(f"Не загружены страницы {sorted(failed_pages)} для запроса {query_type}: "
+              f"{len(failed_pages)} страниц (до {len(failed_pages) * 20} профилей) отсутствуют в CSV")
     print(f"Данные сохранены в файл: {csv_filename}")
-    print(f"JSON-файлы сохранены в папку: {json_folder}")
+    if get_archive('pages') is not None:
+        print(f"Ответы API сохранены в архив {os.path.join(config.ARCHIVE_DIR, 'pages')} "
+              f"(ключи {os.path.normpath(json_folder)}/page_N)")
+    else:
+        print(f"JSON-файлы сохранены в папку: {json_folder}")
+    return failed_pages
 
+def _fetch_pages_concurrently(query, json_folder, pages, concurrency, query_type, write_page):
+    """
+    Загружает страницы пулом потоков и передает их в write_page в порядке номеров
+
+    Ошибка на одной странице не останавливает остальные. Страница с ошибкой
+    (после повторов клиента) запрашивается еще раз сразу, до записи
+    следующих страниц, поэтому строки в CSV идут в порядке страниц;
+    следующие страницы тем временем загружаются пулом.
 
-def parse_revolut_specific_companies():
+    Returns:
+        Dict[int, str]: Страницы, которые не удалось загрузить, и текст ошибки
+    """
+    print(f"Загрузка страниц {pages.start}-{pages.stop - 1} для запроса {query_type} "
+          f"({concurrency} потоков)...")
+
+    failed_pages = {}
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            page: executor.submit(_request_page, query, page, json_folder)
+            for page in pages
+        }
+        # Ждем страницы по порядку, чтобы строки в CSV шли в порядке страниц
+        for page, future in futures.items():
+            try:
+                api_response = future.result()
+            except Exception as e:
+                print(f"Ошибка при загрузке страницы {page}: {e}. Повторная загрузка...")
+                try:
+                    api_response = _request_page(query, page, json_folder)
+                except Exception as e:
+                    print(f"Страница {page} не загружена: {e}")
+                    failed_pages[page] = str(e)
+                    continue
+            write_page(page, api_response)
+
+    return failed_pages
+
+
+def parse_revolut_specific_companies(on_rows=None):
     """
     Парсит бывших сотрудников Revolut, которые сейчас работают в конкретных компаниях
     """
-    url = "https://api.proapis.com/iscraper/v4/search/hosted/people"
-    headers = {
-        "x-api-key": config.PRO_API_KEY,
-        "content-type": "application/json"
-    }
     
 
     
@@ -225,29 +302,49 @@ def parse_revolut_specific_companies():
     csv_filename = "revolut_specific_companies.csv"
     json_folder = "specific_companies_json"
     
-    if not os.path.exists(json_folder):
-        os.makedirs(json_folder)
     
-    _fetch_profiles(url, headers, query, csv_filename, "specific_companies", json_folder)
+    _fetch_profiles(query, csv_filename, "specific_companies", json_folder, on_rows=on_rows)
     
     return csv_filename
 
-def run_all_parsers():
+PARSERS = [
+    ("по прошлым должностям", parse_revolut_by_past_roles),
+    ("по текущим должностям основателей", parse_revolut_founders),
+    ("по стелс-индикаторам в профилях", parse_revolut_stealth_titles),
+    ("по конкретным компаниям", parse_revolut_specific_companies),
+]
+
+def run_all_parsers(parallel=True):
     """
-    Запускает все три парсера последовательно
+    Запускает все парсеры
+
+    Парсеры независимы и пишут в разные CSV, поэтому по умолчанию работают
+    одновременно. Все запросы проходят через общий клиент ProApis с одним
+    лимитером, так что суммарная частота не превышает config.PRO_API_RPS.
+
+    Args:
+        parallel: Запускать парсеры параллельно (False - последовательно)
+
+    Returns:
+        List[str]: Имена созданных CSV файлов в порядке PARSERS
     """
-    print("Запуск парсера по прошлым должностям...")
-    parse_revolut_by_past_roles()
-    
-    print("\nЗапуск парсера по текущим должностям основателей...")
-    parse_revolut_founders()
-    
-    print("\nЗапуск парсера по стелс-индикаторам в профилях...")
-    parse_revolut_stealth_titles()
+    if not parallel:
+        csv_files = []
+        for name, parser in PARSERS:
+            print(f"\nЗапуск парсера {name}...")
+            csv_files.append(parser())
+        print("\nВсе парсеры завершили работу!")
+        return csv_files
 
-    print("\nЗапуск парсера по конкретным компаниям...")
-    parse_revolut_specific_companies()
+    print(f"Запуск {len(PARSERS)} парсеров параллельно (лимит {config.PRO_API_RPS} запросов/сек)...")
+    csv_files = []
+    with ThreadPoolExecutor(max_workers=len(PARSERS)) as executor:
+        futures = [(name, executor.submit(parser)) for name, parser in PARSERS]
+        for name, future in futures:
+            try:
+                csv_files.append(future.result())
+            except Exception as e:
+                print(f"Ошибка в парсере {name}: {e}")
     
     print("\nВсе парсеры завершили работу!")
-
-
+    return csv_files
@@ -0,0 +1,198 @@
+import hashlib
+import json
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+MANIFEST_FILE = 'pipeline_manifest.json'
+
+
+def file_hash(path: str) -> Optional[str]:
+    """
+    sha256 содержимого файла (None, если файла нет)
+
+    Если файла в типизированном формате нет, но есть CSV с тем же именем
+    (save_dataframe без pyarrow), хэшируется CSV.
+
+    Args:
+        path: Путь к файлу
+
+    Returns:
+        str или None
+    """
+    if not os.path.exists(path):
+        csv_path = os.path.splitext(path)[0] + '.csv'
+        if csv_path == path or not os.path.exists(csv_path):
+            return None
+        path = csv_path
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """
+    Хэш параметров шага (модель, роли, ключевые слова, ...)
+    """
+    text = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class Stage:
+    """
+    Шаг пайплайна с объявленными входными и выходными файлами
+
+    Шаг сам читает входы с диска и пишет выходы, поэтому любой шаг можно
+    запустить отдельно, если его входы уже есть.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], None],
+        inputs: List[str],
+        outputs: List[str],
+        params: Optional[Callable[[], Dict[str, Any]]] = None,
+        title: str = ""
+    ):
+        """
+        Args:
+            name: Имя шага для CLI (--from/--only/--until)
+            func: Функция без аргументов, выполняющая шаг
+            inputs: Входные файлы
+            outputs: Выходные файлы
+            params: Функция, возвращающая параметры шага для манифеста
+            title: Заголовок для вывода
+        """
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.outputs = outputs
+        self.params = params or (lambda: {})
+        self.title = title or name
+
+    def fingerprint(self) -> Dict[str, Any]:
+        """
+        Хэши входов и параметров шага в текущем состоянии
+        """
+        return {
+            'inputs': {path: file_hash(path) for path in self.inputs},
+            'params': params_hash(self.params())
+        }
+
+
+class Pipeline:
+    """
+    Последовательность шагов с манифестом для пропуска неизменившихся шагов
+
+    В манифесте для каждого шага хранятся хэши входов, параметров и
+    выходов последнего успешного запуска. Шаг пропускается, если входы и
+    параметры не изменились, а выходы на месте и совпадают с записанными.
+    Манифест сохраняется после каждого шага, поэтому падение на шаге 4
+    не заставляет повторять шаги 0-3.
+    """
+
+    def __init__(self, stages: List[Stage], manifest_file: str = MANIFEST_FILE):
+        """
+        Args:
+            stages: Шаги в порядке выполнения
+            manifest_file: Путь к JSON манифесту
+        """
+        self.stages = stages
+        self.manifest_file = manifest_file
+        self.manifest = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        if not os.path.exists(self.manifest_file):
+            return {}
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Манифест {self.manifest_file} не прочитан ({e}), все шаги будут выполнены")
+            return {}
+
+    def _save_manifest(self) -> None:
+        tmp_path = f"{self.manifest_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_file)
+
+    def names(self) -> List[str]:
+        return [stage.name for stage in self.stages]
+
+    def is_up_to_date(self, stage: Stage) -> bool:
+        """
+        Проверяет, можно ли пропустить шаг
+        """
+        record = self.manifest.get(stage.name)
+        if not record:
+            return False
+        fingerprint = stage.fingerprint()
+        if record.get('inputs') != fingerprint['inputs'] or record.get('params') != fingerprint['params']:
+            return False
+        return all(
+            file_hash(path) is not None and file_hash(path) == record.get('outputs', {}).get(path)
+            for path in stage.outputs
+        )
+
+    def _index(self, name: Optional[str], default: int) -> int:
+        if name is None:
+            return default
+        if name not in self.names():
+            raise ValueError(f"Неизвестный шаг {name}, доступны: {', '.join(self.names())}")
+        return self.names().index(name)
+
+    def run(
+        self,
+        start: Optional[str] = None,
+        only: Optional[str] = None,
+        until: Optional[str] = None,
+        force: bool = False,
+        always: Optional[List[str]] = None
+    ) -> None:
+        """
+        Выполняет шаги, пропуская неизменившиеся
+
+        Args:
+            start: Выполнить этот шаг и все следующие без проверки манифеста
+            only: Выполнить только этот шаг без проверки манифеста
+            until: Остановиться после этого шага
+            force: Выполнить все выбранные шаги без проверки манифеста
+            always: Шаги, которые выполняются без проверки манифеста, если входят в выбранные
+        """
+        if only is not None:
+            first = last = self._index(only, 0)
+            forced_from = first
+        else:
+            first = 0
+            last = self._index(until, len(self.stages) - 1)
+            forced_from = self._index(start, len(self.stages))
+        if force:
+            forced_from = first
+
+        for position in range(first, last + 1):
+            stage = self.stages[position]
+            if position < forced_from and stage.name not in (always or []) and self.is_up_to_date(stage):
+                print(f"\n{stage.title}: без изменений, пропуск")
+                continue
+
+            missing = [path for path in stage.inputs if file_hash(path) is None]
+            if missing:
+                raise FileNotFoundError(f"Шаг {stage.name}: нет входных файлов {', '.join(missing)}")
+
+            print(f"\n{stage.title}...")
+            fingerprint = stage.fingerprint()
+            started = time.time()
+            stage.func()
+
+            self.manifest[stage.name] = {
+                **fingerprint,
+                'outputs': {path: file_hash(path) for path in stage.outputs},
+                'finished_at': time.time(),
+                'duration': round(time.time() - started, 1)
+            }
+            self._save_manifest()
@@ -1,24 +1,112 @@
 import pandas as pd
-from typing import List, Dict, Any
+from typing import Iterator, List, Dict, Any, Optional
+import importlib.util
 import os
+import config
+from role_matcher import filter_titles
 
-def combine_csv_files(csv_files: List[str]) -> pd.DataFrame:
+# Схема CSV из parsing_old_employee: все столбцы текстовые, чтобы profile_id
+# и skills не переопределялись при каждом чтении
+INPUT_SCHEMA = {
+    'profile_id': str,
+    'first_name': str,
+    'last_name': str,
+    'sub_title': str,
+    'location_city': str,
+    'location_country': str,
+    'li_url': str,
+    'skills': str,
+    'query_type': str
+}
+
+HAS_PYARROW = importlib.util.find_spec('pyarrow') is not None
+CSV_ENGINE = 'pyarrow' if HAS_PYARROW else 'c'
+
+_PROFILE_SCHEMA = {column: 'string' for column in INPUT_SCHEMA}
+_LLM_SCHEMA = {
+    **_PROFILE_SCHEMA,
+    'title_cluster': 'string',
+    'is_stealth': 'boolean',
+    'is_founder': 'boolean',
+    'stealth_reason': 'string',
+    'has_current_company': 'boolean',
+    'current_company_reason': 'string'
+}
+_DETAILS_SCHEMA = {
+    'profile_id': 'string',
+    'first_name': 'string',
+    'last_name': 'string',
+    'linkedin_sub_title': 'string',
+    'li_url': 'string',
+    'api_sub_title': 'string',
+    'current_company': 'string',
+    'current_company_id': 'string',
+    'current_title': 'string',
+    'start_date': 'string',
+    'employment_type': 'string',
+    'location': 'string'
+}
+
+# Схемы промежуточных файлов main.py по шагам
+STAGE_SCHEMAS = {
+    'filtered': _PROFILE_SCHEMA,
+    'llm': _LLM_SCHEMA,
+    'companies': _LLM_SCHEMA,
+    'details': _DETAILS_SCHEMA,
+    'stealth': {**_DETAILS_SCHEMA, 'stealth_match': 'string'},
+    'failures': {'profile_id': 'string', 'error': 'string'}
+}
+
+def read_profiles_csv(file: str) -> pd.DataFrame:
     """
-    Объединяет несколько CSV файлов в один DataFrame
+    Читает CSV с профилями по явной схеме (движок pyarrow, если установлен)
     
     Args:
-        csv_files: Список путей к CSV файлам
+        file: Путь к CSV файлу
         
     Returns:
-        pd.DataFrame: Объединенный DataFrame
+        pd.DataFrame: Профили
     """
-    combined_df = pd.DataFrame()
+    return pd.read_csv(file, dtype=INPUT_SCHEMA, engine=CSV_ENGINE)
+
+def iter_csv_chunks(csv_files: List[str], chunksize: int) -> Iterator[pd.DataFrame]:
+    """
+    Читает CSV файлы по частям, не загружая их целиком в память
+
+    Движок pyarrow не поддерживает chunksize, поэтому здесь используется c.
     
+    Args:
+        csv_files: Список путей к CSV файлам
+        chunksize: Число строк в части
+        
+    Yields:
+        pd.DataFrame: Очередная часть
+    """
     for file in csv_files:
-        df = pd.read_csv(file)
-        combined_df = pd.concat([combined_df, df], ignore_index=True)
+        with pd.read_csv(file, dtype=INPUT_SCHEMA, chunksize=chunksize) as reader:
+            yield from reader
+
+def combine_csv_files(csv_files: List[str], chunksize: Optional[int] = None) -> pd.DataFrame:
+    """
+    Объединяет несколько CSV файлов в один DataFrame
+
+    Все файлы читаются по общей схеме и склеиваются одним pd.concat.
     
-    return combined_df
+    Args:
+        csv_files: Список путей к CSV файлам
+        chunksize: Читать файлы частями по chunksize строк
+        
+    Returns:
+        pd.DataFrame: Объединенный DataFrame
+    """
+    if chunksize:
+        frames = list(iter_csv_chunks(csv_files, chunksize))
+    else:
+        frames = [read_profiles_csv(file) for file in csv_files]
+
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=object) for column in INPUT_SCHEMA})
+    return pd.concat(frames, ignore_index=True)
 
 def remove_duplicates(df: pd.DataFrame, subset: str = 'profile_id') -> pd.DataFrame:
     """
@@ -33,34 +121,100 @@ def remove_duplicates(df: pd.DataFrame, subset: str = 'profile_id') -> pd.DataFr
     """
     return df.drop_duplicates(subset=subset)
 
-def filter_roles(df: pd.DataFrame, exclude_roles: List[str]) -> pd.DataFrame:
+def filter_roles(
+    df: pd.DataFrame,
+    exclude_roles: List[str],
+    include_roles: Optional[List[str]] = None
+) -> pd.DataFrame:
     """
     Фильтрует DataFrame, исключая определенные роли
+
+    Роли сравниваются целыми словами без учета регистра (см. role_matcher).
     
     Args:
         df: Исходный DataFrame
         exclude_roles: Список ролей для исключения
+        include_roles: Если задан, остаются только строки хотя бы с одной из этих ролей
         
     Returns:
         pd.DataFrame: Отфильтрованный DataFrame
     """
-    exclude_pattern = '|'.join(exclude_roles)
-    filtered_df = df[
-        ~df['sub_title'].str.contains(exclude_pattern, case=False, na=False)
-    ]
-    return filtered_df
+    return filter_titles(df, exclude=exclude_roles, include=include_roles or ())
 
-def prepare_initial_data(input_files: List[str], exclude_roles: List[str]) -> pd.DataFrame:
+def normalize_title(titles: pd.Series) -> pd.Series:
+    """
+    Нормализует заголовки для группировки одинаковых по смыслу строк
+
+    Приводит к нижнему регистру, заменяет пунктуацию (кроме "@", "&" и "+",
+    которые несут смысл) на пробелы и схлопывает пробелы.
+
+    Args:
+        titles: Столбец sub_title
+
+    Returns:
+        pd.Series: Нормализованные заголовки
+    """
+    return (
+        titles.fillna("").astype(str).str.lower()
+        .str.replace(r"[^\w\s@&+]+", " ", regex=True)
+        .str.split().str.join(" ")
+    )
+
+def normalize_skills(skills: pd.Series) -> pd.Series:
+    """
+    Нормализует список навыков: регистр, пробелы, дубликаты и порядок
+
+    Args:
+        skills: Столбец skills (навыки через запятую)
+
+    Returns:
+        pd.Series: Отсортированные уникальные навыки через запятую
+    """
+    def normalize(value) -> str:
+        if pd.isna(value):
+            return ""
+        items = {" ".join(item.split()).lower() for item in str(value).split(",")}
+        items.discard("")
+        return ",".join(sorted(items))
+
+    return skills.map(normalize)
+
+def prepare_initial_data(
+    input_files: List[str],
+    exclude_roles: List[str],
+    chunksize: Optional[int] = None
+) -> pd.DataFrame:
     """
     Основная функция для подготовки данных
+
+    При chunksize файлы обрабатываются потоково: каждая часть сразу
+    очищается от уже встреченных profile_id и отфильтровывается по ролям,
+    поэтому в памяти держится только результат и множество profile_id.
     
     Args:
         input_files: Список входных CSV файлов
         exclude_roles: Список ролей для исключения
+        chunksize: Размер части при потоковом чтении (по умолчанию config.CSV_CHUNKSIZE)
         
     Returns:
         pd.DataFrame: Обработанный DataFrame
     """
+    if chunksize is None:
+        chunksize = config.CSV_CHUNKSIZE
+
+    if chunksize:
+        seen_ids = set()
+        parts = []
+        for chunk in iter_csv_chunks(input_files, chunksize):
+            chunk = remove_duplicates(chunk)
+            chunk = chunk[~chunk['profile_id'].isin(seen_ids)]
+            seen_ids.update(chunk['profile_id'])
+            parts.append(filter_roles(chunk, exclude_roles))
+
+        if not parts:
+            return combine_csv_files([])
+        return pd.concat(parts, ignore_index=True)
+
     # Объединяем файлы
     combined_df = combine_csv_files(input_files)
     
@@ -72,18 +226,119 @@ def prepare_initial_data(input_files: List[str], exclude_roles: List[str]) -> pd
     
     return filtered_df
 
-def save_dataframe(df: pd.DataFrame, output_file: str) -> None:
+def apply_schema(df: pd.DataFrame, stage: str) -> pd.DataFrame:
+    """
+    Приводит столбцы к типам схемы шага
+
+    Флаги становятся nullable boolean (в том числе строки "True"/"False"
+    после CSV), текст - string с сохранением пропусков. Столбцы вне схемы
+    не меняются.
+    
+    Args:
+        df: DataFrame шага
+        stage: Имя шага из STAGE_SCHEMAS
+        
+    Returns:
+        pd.DataFrame: DataFrame с типами схемы
+    """
+    df = df.copy()
+    for column, dtype in STAGE_SCHEMAS[stage].items():
+        if column not in df.columns:
+            continue
+        if dtype == 'boolean' and df[column].dtype == object:
+            df[column] = df[column].map(
+                lambda value: value if isinstance(value, bool) or pd.isna(value)
+                else str(value).strip().lower() in ('true', '1')
+            )
+        df[column] = df[column].astype(dtype)
+    return df
+
+def stage_path(name: str, fmt: Optional[str] = None) -> str:
+    """
+    Путь к файлу шага в выбранном формате, например filtered_df.parquet
+    
+    Args:
+        name: Имя файла без расширения
+        fmt: parquet, arrow или csv (по умолчанию config.STAGE_FORMAT)
+        
+    Returns:
+        str: Путь к файлу
+    """
+    return f"{name}.{fmt or config.STAGE_FORMAT}"
+
+def save_dataframe(
+    df: pd.DataFrame,
+    output_file: str,
+    stage: Optional[str] = None,
+    export_csv: Optional[bool] = None
+) -> None:
     """
-    Сохраняет DataFrame в CSV файл
+    Сохраняет DataFrame в файл; формат определяется расширением
+
+    .parquet - Parquet, .arrow - Arrow IPC (читается через memory map),
+    .csv - CSV. Для типизированных форматов столбцы приводятся к схеме
+    stage. Если pyarrow не установлен, вместо Parquet/Arrow пишется CSV.
     
     Args:
         df: DataFrame для сохранения
         output_file: Путь к выходному файлу
+        stage: Имя шага из STAGE_SCHEMAS
+        export_csv: Дополнительно сохранить CSV рядом (по умолчанию config.STAGE_EXPORT_CSV)
     """
-    df.to_csv(output_file, index=False)
+    if export_csv is None:
+        export_csv = config.STAGE_EXPORT_CSV
+
+    base, ext = os.path.splitext(output_file)
+    if stage:
+        df = apply_schema(df, stage)
+
+    if ext in ('.parquet', '.arrow') and not HAS_PYARROW:
+        print(f"pyarrow не установлен, {output_file} сохраняется как CSV")
+        ext, export_csv = '.csv', False
+
+    if ext == '.parquet':
+        df.to_parquet(output_file, index=False)
+    elif ext == '.arrow':
+        df.reset_index(drop=True).to_feather(output_file)
+    else:
+        df.to_csv(base + '.csv', index=False)
+        return
+
+    if export_csv:
+        df.to_csv(base + '.csv', index=False)
+
+def load_dataframe(input_file: str, stage: Optional[str] = None) -> pd.DataFrame:
+    """
+    Загружает DataFrame, сохраненный save_dataframe
+
+    Если файла в типизированном формате нет, читается CSV с тем же именем.
+    
+    Args:
+        input_file: Путь к файлу
+        stage: Имя шага из STAGE_SCHEMAS (для CSV восстанавливает типы)
+        
+    Returns:
+        pd.DataFrame: Загруженный DataFrame
+    """
+    base, ext = os.path.splitext(input_file)
+    if ext in ('.parquet', '.arrow') and (not HAS_PYARROW or not os.path.exists(input_file)):
+        ext = '.csv'
+
+    if ext == '.parquet':
+        df = pd.read_parquet(input_file)
+    elif ext == '.arrow':
+        import pyarrow.feather as feather
+        df = feather.read_table(input_file, memory_map=True).to_pandas()
+    else:
+        text_columns = {
+            column: str for column, dtype in STAGE_SCHEMAS.get(stage, {}).items() if dtype == 'string'
+        }
+        df = pd.read_csv(base + '.csv', dtype=text_columns)
+
+    return apply_schema(df, stage) if stage else df
 
 # Константы
-DEFAULT_EXCLUDE_ROLES = [" hr ", "recruiter", "accountant", "legal", "lawyer"]
+DEFAULT_EXCLUDE_ROLES = ["hr", "recruiter", "accountant", "legal", "lawyer"]
 DEFAULT_INPUT_FILES = [
     "revolut_past_key_roles.csv",
     "revolut_current_founders.csv",
@@ -0,0 +1,212 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+from rate_limiter import TokenBucket
+from response_cache import ResponseCache
+from replay import ReplayError
+
+
+class ProApisClient:
+    """
+    Клиент ProApis LinkedIn API с пулом keep-alive соединений и общим лимитером
+
+    Все запросы идут через одну requests.Session, поэтому TCP+TLS соединения
+    переиспользуются между вызовами и потоками. Темп задается token bucket'ом
+    и подстраивается под ответы сервера: при 429 частота уменьшается вдвое и
+    все потоки ждут Retry-After, после успешных ответов она плавно
+    возвращается к заданной. Заголовки X-RateLimit-Remaining/X-RateLimit-Reset
+    тоже учитываются.
+
+    Ответы кэшируются в SQLite (ResponseCache): свежая запись возвращается
+    без обращения к сети и без расхода лимита.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        rps: Optional[float] = None,
+        pool_size: Optional[int] = None,
+        max_retries: int = 5,
+        timeout: float = 60.0,
+        cache: Optional[ResponseCache] = None,
+        bypass_cache: Optional[bool] = None,
+        base_url: Optional[str] = None
+    ):
+        """
+        Args:
+            api_key: Ключ API (по умолчанию config.PRO_API_KEY)
+            rps: Максимум запросов в секунду (по умолчанию config.PRO_API_RPS)
+            pool_size: Размер пула соединений (по умолчанию config.PRO_API_POOL_SIZE)
+            max_retries: Число повторов при 429, 5xx, ошибках соединения и таймаутах
+            timeout: Таймаут одного запроса в секундах
+            cache: Кэш ответов (по умолчанию кэш из config.PRO_API_CACHE_*)
+            bypass_cache: Не читать из кэша (по умолчанию config.PRO_API_CACHE_BYPASS)
+            base_url: Адрес API (по умолчанию config.PRO_API_BASE_URL)
+        """
+        self.base_url = (base_url or config.PRO_API_BASE_URL).rstrip('/')
+        self.max_rps = rps if rps is not None else config.PRO_API_RPS
+        self.min_rps = self.max_rps / 16
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.limiter = TokenBucket(self.max_rps)
+        self.cache = cache or ResponseCache(
+            config.PRO_API_CACHE_PATH,
+            ttl=config.PRO_API_CACHE_TTL,
+            max_bytes=config.PRO_API_CACHE_MAX_BYTES
+        )
+        self.bypass_cache = config.PRO_API_CACHE_BYPASS if bypass_cache is None else bypass_cache
+
+        pool_size = pool_size or config.PRO_API_POOL_SIZE
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "x-api-key": api_key or config.PRO_API_KEY,
+            "content-type": "application/json"
+        })
+
+        self._pause_lock = threading.Lock()
+        self._paused_until = 0.0
+
+    def _wait_for_pause(self) -> None:
+        delay = self._paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+
+    def _pause(self, seconds: float) -> None:
+        with self._pause_lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _adapt(self, response: requests.Response) -> None:
+        """
+        Подстраивает темп запросов по коду ответа и rate-limit заголовкам
+        """
+        if response.status_code == 429:
+            self.limiter.set_rate(max(self.min_rps, self.limiter.rate / 2))
+            return
+
+        remaining = response.headers.get("X-RateLimit-Remaining")
+        reset = response.headers.get("X-RateLimit-Reset")
+        if remaining is not None and reset is not None:
+            try:
+                if int(remaining) <= 0:
+                    self._pause(_reset_delay(float(reset)))
+            except ValueError:
+                pass
+
+        if self.limiter.rate < self.max_rps:
+            self.limiter.set_rate(min(self.max_rps, self.limiter.rate + self.min_rps))
+
+    def post(self, endpoint: str, payload: Dict[str, Any], bypass_cache: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Отправляет POST запрос к эндпоинту API с учетом кэша, лимитов и повторов
+
+        Args:
+            endpoint: Путь эндпоинта, например "search/hosted/people"
+            payload: Тело запроса
+            bypass_cache: Не читать из кэша (по умолчанию self.bypass_cache)
+
+        Returns:
+            Dict с JSON ответом API
+
+        Raises:
+            requests.HTTPError: Если API вернул ошибку после всех повторов
+            requests.ConnectionError, requests.Timeout: Если соединение не
+                удалось после всех повторов
+            ReplayError: В режиме воспроизведения, если ответа нет в кэше
+        """
+        if bypass_cache is None:
+            bypass_cache = self.bypass_cache
+        if not bypass_cache or config.REPLAY:
+            cached = self.cache.get(endpoint, payload)
+            if cached is not None:
+                return cached
+        if config.REPLAY:
+            raise ReplayError(f"нет сохраненного ответа {endpoint} (режим воспроизведения)")
+
+        url = f"{self.base_url}/{endpoint}"
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            self.limiter.acquire()
+
+            try:
+                response = self.session.post(url, json=payload, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                # Сервер мог закрыть простаивающее keep-alive соединение из пула
+                if attempt == self.max_retries:
+                    raise
+                delay = 2 ** attempt
+                print(f"Ошибка соединения с ProApis ({type(e).__name__}), повтор через {delay:.1f} сек...")
+                time.sleep(delay)
+                continue
+            self._adapt(response)
+
+            retryable = response.status_code == 429 or response.status_code >= 500
+            if retryable and attempt < self.max_retries:
+                retry_after = response.headers.get("Retry-After")
+                try:
+                    delay = float(retry_after) if retry_after else 2 ** attempt
+                except ValueError:
+                    delay = 2 ** attempt
+                print(f"ProApis вернул {response.status_code}, повтор через {delay:.1f} сек...")
+                self._pause(delay)
+                continue
+
+            response.raise_for_status()
+            data = response.json()
+            self.cache.put(endpoint, payload, data)
+            return data
+
+    def search_people(self, query: str, page: int = 1, per_page: int = 20) -> Dict[str, Any]:
+        """
+        Поиск людей (search/hosted/people)
+        """
+        return self.post("search/hosted/people", {"page": page, "per_page": per_page, "query": query})
+
+    def search_companies(self, query: str, page: int = 1, per_page: int = 10) -> Dict[str, Any]:
+        """
+        Поиск компаний (search/hosted/companies)
+        """
+        return self.post("search/hosted/companies", {"page": page, "per_page": per_page, "query": query})
+
+    def profile_details(self, profile_id: str) -> Dict[str, Any]:
+        """
+        Детальная информация о профиле (profile-details)
+        """
+        return self.post("profile-details", {"profile_id": profile_id})
+
+
+def _reset_delay(reset: float) -> float:
+    """
+    X-RateLimit-Reset бывает как числом секунд, так и unix-временем
+    """
+    if reset > 10 ** 9:
+        return max(0.0, reset - time.time())
+    return reset
+
+
+_clients: Dict[str, ProApisClient] = {}
+_clients_lock = threading.Lock()
+
+def get_client(api_key: Optional[str] = None) -> ProApisClient:
+    """
+    Возвращает общий клиент для ключа API (один пул соединений и один лимитер на ключ)
+
+    Args:
+        api_key: Ключ API (по умолчанию config.PRO_API_KEY)
+
+    Returns:
+        ProApisClient
+    """
+    api_key = api_key or config.PRO_API_KEY
+    with _clients_lock:
+        if api_key not in _clients:
+            _clients[api_key] = ProApisClient(api_key=api_key)
+        return _clients[api_key]
@@ -0,0 +1,547 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+from response_archive import open_archive
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_hits (
+    profile_id TEXT NOT NULL,
+    query_type TEXT NOT NULL,
+    first_name TEXT,
+    last_name TEXT,
+    sub_title TEXT,
+    location_city TEXT,
+    location_country TEXT,
+    li_url TEXT,
+    skills TEXT,
+    page INTEGER,
+    fetched_at REAL NOT NULL,
+    PRIMARY KEY (profile_id, query_type)
+);
+CREATE INDEX IF NOT EXISTS search_hits_query_type ON search_hits (query_type);
+
+CREATE TABLE IF NOT EXISTS profile_details (
+    profile_id TEXT PRIMARY KEY,
+    api_sub_title TEXT,
+    current_company TEXT,
+    current_company_id TEXT,
+    current_title TEXT,
+    start_date TEXT,
+    employment_type TEXT,
+    location TEXT,
+    raw_ref TEXT,
+    fetched_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS llm_labels (
+    profile_id TEXT PRIMARY KEY,
+    is_stealth INTEGER,
+    is_founder INTEGER,
+    stealth_reason TEXT,
+    stealth_source TEXT,
+    has_current_company INTEGER,
+    current_company_reason TEXT,
+    company_source TEXT,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stages (
+    stage TEXT PRIMARY KEY,
+    columns TEXT NOT NULL,
+    saved_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stage_rows (
+    stage TEXT NOT NULL,
+    profile_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    query_type TEXT,
+    extra TEXT,
+    PRIMARY KEY (stage, profile_id)
+);
+
+CREATE TABLE IF NOT EXISTS results (
+    run_id TEXT NOT NULL,
+    profile_id TEXT NOT NULL,
+    current_company TEXT,
+    current_company_id TEXT,
+    current_title TEXT,
+    stealth_match TEXT,
+    found_at REAL NOT NULL,
+    PRIMARY KEY (run_id, profile_id)
+);
+CREATE INDEX IF NOT EXISTS results_profile_id ON results (profile_id);
+"""
+
+SEARCH_COLUMNS = [
+    'profile_id', 'query_type', 'first_name', 'last_name', 'sub_title',
+    'location_city', 'location_country', 'li_url', 'skills'
+]
+LABEL_COLUMNS = [
+    'is_stealth', 'is_founder', 'stealth_reason',
+    'has_current_company', 'current_company_reason'
+]
+# Столбец причины -> столбец источника метки в llm_labels
+LABEL_SOURCES = {'stealth_reason': 'stealth_source', 'current_company_reason': 'company_source'}
+RESULT_COLUMNS = ['current_company', 'current_company_id', 'current_title', 'stealth_match']
+# Поля из ответа profile-details (more_requests._build_profile_row); сам ответ
+# хранится в архиве или JSON файле, а в raw_ref - ссылка на него
+DETAIL_COLUMNS = [
+    'api_sub_title', 'current_company', 'current_company_id', 'current_title',
+    'start_date', 'employment_type', 'location'
+]
+
+
+def label_sources(df: pd.DataFrame, reason_column: str, model: Optional[str] = None) -> pd.Series:
+    """
+    Кто выставил метку строки: rule, local_model, cluster (метка
+    представителя кластера title_cluster), error (заглушка "API Error")
+    или модель LLM
+
+    Args:
+        df: DataFrame шага 2/3
+        reason_column: stealth_reason или current_company_reason
+        model: Модель LLM
+
+    Returns:
+        pd.Series с источником для каждой строки df
+    """
+    reasons = df[reason_column].fillna("").astype(str)
+    sources = pd.Series(model or "llm", index=df.index, dtype=object)
+    if 'title_cluster' in df.columns:
+        # Первая строка кластера - представитель, остальные получают его метку
+        clustered = df['title_cluster'].notna()
+        sources[clustered & df['title_cluster'].duplicated()] = 'cluster'
+    sources[reasons.str.startswith("local model")] = 'local_model'
+    sources[reasons.str.startswith("rule:")] = 'rule'
+    sources[reasons.isin(["API Error", ""])] = 'error'
+    return sources
+
+
+def _value(value: Any) -> Any:
+    """
+    Приводит значение pandas/numpy к типу, который принимает sqlite3
+    """
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+class ProfileStore:
+    """
+    Единое хранилище данных о профилях в SQLite
+
+    Таблицы:
+        search_hits - строки поиска (profile_id, query_type)
+        profile_details - поля из ответов profile-details и ссылка на сам
+            ответ (raw_ref: "archive" или путь к JSON файлу), чтобы ответ
+            не хранился дважды
+        llm_labels - последние метки по профилю и их источник (модель,
+            rule, local_model, cluster или error)
+        stages, stage_rows - состав результата каждого шага main.py:
+            порядок профилей, столбцы и значения, которых нет в таблицах выше
+        results - найденные профили по запускам (run_id)
+
+    Шаги main.py сохраняют результат через save_stage и читают вход через
+    frame: строки собираются из search_hits, llm_labels и profile_details.
+    Файлы шагов остаются выгрузкой для манифеста pipeline.py и просмотра.
+    Хранилище также служит для запросов по профилям (CLI, query) и как
+    источник деталей в режиме воспроизведения (replay.load_details).
+
+    Все записи - пакетные upsert'ы одной транзакцией; соединение общее
+    для потоков и защищено блокировкой.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def _migrate(self) -> None:
+        """
+        Пересоздает таблицы старого формата: profile_details с полными
+        ответами API (те же ответы лежат в архиве или JSON файлах) и
+        llm_labels со столбцом model вместо источника метки. Таблицы
+        заполнятся заново при следующем запуске шагов.
+        """
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(profile_details)")]
+        if 'data' in columns:
+            print("profile_details старого формата (полные ответы API) пересоздается")
+            self._conn.execute("DROP TABLE profile_details")
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(llm_labels)")]
+        if 'model' in columns:
+            print("llm_labels старого формата (без источника метки) пересоздается")
+            self._conn.execute("DROP TABLE llm_labels")
+
+    def _executemany(self, sql: str, rows: List[Tuple]) -> None:
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(sql, rows)
+            self._conn.commit()
+
+    def upsert_search_hits(self, rows: Iterable[Dict[str, Any]], page: Optional[int] = None) -> None:
+        """
+        Сохраняет строки поиска (формат parsing_old_employee._profile_rows)
+
+        Args:
+            rows: Строки со столбцами SEARCH_COLUMNS
+            page: Номер страницы поиска
+        """
+        now = time.time()
+        self._executemany(
+            f"INSERT OR REPLACE INTO search_hits ({', '.join(SEARCH_COLUMNS)}, page, fetched_at) "
+            f"VALUES ({', '.join('?' * (len(SEARCH_COLUMNS) + 2))})",
+            [
+                tuple(_value(row.get(column)) for column in SEARCH_COLUMNS) + (page, now)
+                for row in rows
+                if row.get('profile_id')
+            ]
+        )
+
+    def upsert_details(self, rows: Iterable[Dict[str, Any]]) -> None:
+        """
+        Сохраняет поля из ответов profile-details
+
+        Args:
+            rows: Строки more_requests._build_profile_row со ссылкой на ответ
+                в raw_ref ("archive" или путь к JSON файлу)
+        """
+        now = time.time()
+        columns = ['profile_id', *DETAIL_COLUMNS, 'raw_ref']
+        self._executemany(
+            f"INSERT OR REPLACE INTO profile_details ({', '.join(columns)}, fetched_at) "
+            f"VALUES ({', '.join('?' * (len(columns) + 1))})",
+            [
+                (str(row['profile_id']), *(_value(row.get(column)) for column in columns[1:]), now)
+                for row in rows
+            ]
+        )
+
+    def upsert_labels(self, df: pd.DataFrame, model: Optional[str] = None) -> None:
+        """
+        Сохраняет метки из DataFrame шага 2/3 вместе с их источником
+        (label_sources)
+
+        Столбцы, которых нет в df, сохраняются из прошлых записей.
+
+        Args:
+            df: DataFrame с profile_id и столбцами из LABEL_COLUMNS
+            model: Модель LLM, выставившая метки без правил и локальной модели
+        """
+        columns = [column for column in LABEL_COLUMNS if column in df.columns]
+        if not columns or df.empty:
+            return
+        labels = df[['profile_id', *columns]].copy()
+        for reason_column, source_column in LABEL_SOURCES.items():
+            if reason_column in labels.columns:
+                labels[source_column] = label_sources(df, reason_column, model)
+                columns.append(source_column)
+        now = time.time()
+        updates = ", ".join(f"{column} = excluded.{column}" for column in [*columns, 'updated_at'])
+        self._executemany(
+            f"INSERT INTO llm_labels (profile_id, {', '.join(columns)}, updated_at) "
+            f"VALUES ({', '.join('?' * (len(columns) + 2))}) "
+            f"ON CONFLICT (profile_id) DO UPDATE SET {updates}",
+            [
+                (str(row['profile_id']), *(_value(row[column]) for column in columns), now)
+                for row in labels.to_dict('records')
+            ]
+        )
+
+    def _upsert_detail_fields(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Обновляет поля деталей, не трогая raw_ref и fetched_at существующих записей
+        """
+        now = time.time()
+        updates = ", ".join(f"{column} = excluded.{column}" for column in DETAIL_COLUMNS)
+        self._executemany(
+            f"INSERT INTO profile_details (profile_id, {', '.join(DETAIL_COLUMNS)}, fetched_at) "
+            f"VALUES ({', '.join('?' * (len(DETAIL_COLUMNS) + 2))}) "
+            f"ON CONFLICT (profile_id) DO UPDATE SET {updates}",
+            [
+                (str(row['profile_id']), *(_value(row.get(column)) for column in DETAIL_COLUMNS), now)
+                for row in rows
+            ]
+        )
+
+    def save_stage(self, stage: str, df: pd.DataFrame, model: Optional[str] = None) -> None:
+        """
+        Сохраняет результат шага main.py
+
+        Метки и поля деталей пишутся в llm_labels и profile_details, поля
+        поиска берутся из search_hits (недостающие строки добавляются), а
+        в stage_rows остаются порядок профилей и прочие столбцы.
+
+        Args:
+            stage: Имя шага (filtered, llm, companies, no_company, details)
+            df: DataFrame шага со столбцом profile_id
+            model: Модель LLM для источника меток
+        """
+        columns = list(df.columns)
+        records = df.to_dict('records')
+        with_search = 'query_type' in columns
+        own = {'profile_id', *LABEL_COLUMNS, *DETAIL_COLUMNS}
+        if with_search:
+            own.update(SEARCH_COLUMNS)
+
+        self.upsert_labels(df, model)
+        if any(column in columns for column in DETAIL_COLUMNS):
+            self._upsert_detail_fields(records)
+
+        now = time.time()
+        rows = [
+            (
+                stage, str(record['profile_id']), position,
+                _value(record.get('query_type')) if with_search else None,
+                json.dumps({
+                    column: _value(value) for column, value in record.items() if column not in own
+                }, ensure_ascii=False, default=str)
+            )
+            for position, record in enumerate(records)
+        ]
+        with self._lock:
+            if with_search:
+                self._conn.executemany(
+                    f"INSERT OR IGNORE INTO search_hits ({', '.join(SEARCH_COLUMNS)}, page, fetched_at) "
+                    f"VALUES ({', '.join('?' * (len(SEARCH_COLUMNS) + 2))})",
+                    [
+                        tuple(_value(record.get(column)) for column in SEARCH_COLUMNS) + (None, now)
+                        for record in records
+                    ]
+                )
+            self._conn.execute("DELETE FROM stage_rows WHERE stage = ?", (stage,))
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stage_rows (stage, profile_id, position, query_type, extra) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO stages (stage, columns, saved_at) VALUES (?, ?, ?)",
+                (stage, json.dumps(columns), now)
+            )
+            self._conn.commit()
+
+    def frame(self, stage: str, newer_than: Optional[float] = None) -> Optional[pd.DataFrame]:
+        """
+        Результат шага, собранный из таблиц хранилища
+
+        Булевы столбцы возвращаются числами 0/1 (типы восстанавливает
+        prepare_data.apply_schema).
+
+        Args:
+            stage: Имя шага, сохраненного save_stage
+            newer_than: Время (например mtime файла шага); если шаг сохранен
+                раньше, возвращается None
+
+        Returns:
+            pd.DataFrame со столбцами шага в сохраненном порядке или None,
+            если шаг не сохранялся или устарел
+        """
+        with self._lock:
+            saved = self._conn.execute(
+                "SELECT columns, saved_at FROM stages WHERE stage = ?", (stage,)
+            ).fetchone()
+        if saved is None or (newer_than is not None and saved[1] < newer_than):
+            return None
+        columns = json.loads(saved[0])
+        with_search = 'query_type' in columns
+
+        search_fields = [column for column in SEARCH_COLUMNS if column not in ('profile_id', 'query_type')]
+        joined = self.query(
+            f"""
+            SELECT r.profile_id, r.query_type, r.extra,
+                   {', '.join(f'h.{column} AS "h.{column}"' for column in search_fields)},
+                   {', '.join(f'l.{column} AS "l.{column}"' for column in LABEL_COLUMNS)},
+                   {', '.join(f'd.{column} AS "d.{column}"' for column in DETAIL_COLUMNS)}
+            FROM stage_rows r
+            LEFT JOIN search_hits h ON h.profile_id = r.profile_id AND h.query_type = r.query_type
+            LEFT JOIN llm_labels l ON l.profile_id = r.profile_id
+            LEFT JOIN profile_details d ON d.profile_id = r.profile_id
+            WHERE r.stage = ?
+            ORDER BY r.position
+            """,
+            [stage]
+        )
+
+        extra = pd.DataFrame([json.loads(value) if value else {} for value in joined['extra']], index=joined.index)
+        result = pd.DataFrame(index=joined.index)
+        for column in columns:
+            if column in ('profile_id', 'query_type') and (column == 'profile_id' or with_search):
+                result[column] = joined[column]
+            elif with_search and column in search_fields:
+                result[column] = joined[f"h.{column}"]
+            elif column in LABEL_COLUMNS:
+                result[column] = joined[f"l.{column}"]
+            elif column in DETAIL_COLUMNS:
+                result[column] = joined[f"d.{column}"]
+            elif column in extra.columns:
+                result[column] = extra[column]
+            else:
+                result[column] = None
+        return result
+
+    def upsert_results(self, df: pd.DataFrame, run_id: str) -> None:
+        """
+        Сохраняет найденные профили запуска (шаг 5)
+
+        Args:
+            df: Результат filter_stealth_companies
+            run_id: Идентификатор запуска
+        """
+        now = time.time()
+        self._executemany(
+            f"INSERT OR REPLACE INTO results (run_id, profile_id, {', '.join(RESULT_COLUMNS)}, found_at) "
+            f"VALUES ({', '.join('?' * (len(RESULT_COLUMNS) + 3))})",
+            [
+                (run_id, str(row['profile_id']), *(_value(row.get(column)) for column in RESULT_COLUMNS), now)
+                for row in df.to_dict('records')
+            ]
+        )
+
+    def query(self, sql: str, params: Iterable[Any] = ()) -> pd.DataFrame:
+        """
+        Выполняет произвольный SELECT и возвращает DataFrame
+
+        Args:
+            sql: SQL запрос
+            params: Параметры запроса
+
+        Returns:
+            pd.DataFrame с результатом
+        """
+        with self._lock:
+            return pd.read_sql_query(sql, self._conn, params=list(params))
+
+    def search_hits(self, query_types: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Строки поиска, при необходимости только указанных типов запросов
+        """
+        if not query_types:
+            return self.query("SELECT * FROM search_hits")
+        placeholders = ",".join("?" * len(query_types))
+        return self.query(f"SELECT * FROM search_hits WHERE query_type IN ({placeholders})", query_types)
+
+    def details(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Ответ profile-details, прочитанный по ссылке raw_ref, или None
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT raw_ref FROM profile_details WHERE profile_id = ?", (str(profile_id),)
+            ).fetchone()
+        if not row or not row[0]:
+            return None
+        if row[0] == 'archive':
+            return open_archive('details').get(str(profile_id))
+        if os.path.exists(row[0]):
+            with open(row[0], 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return None
+
+    def profile(self, profile_id: str) -> Dict[str, Any]:
+        """
+        Все, что известно о профиле: строки поиска, метки, детали и результаты
+
+        Args:
+            profile_id: ID профиля
+
+        Returns:
+            Dict с ключами search_hits, labels, detail_fields, details, results
+        """
+        profile_id = str(profile_id)
+        labels = self.query("SELECT * FROM llm_labels WHERE profile_id = ?", [profile_id])
+        fields = self.query("SELECT * FROM profile_details WHERE profile_id = ?", [profile_id])
+        return {
+            'search_hits': self.query("SELECT * FROM search_hits WHERE profile_id = ?", [profile_id]).to_dict('records'),
+            'labels': labels.to_dict('records')[0] if len(labels) else None,
+            'detail_fields': fields.to_dict('records')[0] if len(fields) else None,
+            'details': self.details(profile_id),
+            'results': self.query(
+                "SELECT * FROM results WHERE profile_id = ? ORDER BY found_at", [profile_id]
+            ).to_dict('records')
+        }
+
+    def overview(self) -> pd.DataFrame:
+        """
+        Сводка по профилям: поиск, метки LLM и число запусков, где профиль найден
+        """
+        return self.query(
+            """
+            SELECT h.profile_id,
+                   MAX(h.first_name) AS first_name,
+                   MAX(h.last_name) AS last_name,
+                   MAX(h.sub_title) AS sub_title,
+                   GROUP_CONCAT(DISTINCT h.query_type) AS query_types,
+                   l.is_stealth, l.is_founder, l.has_current_company,
+                   d.profile_id IS NOT NULL AS has_details,
+                   d.current_company AS details_company,
+                   (SELECT COUNT(*) FROM results r WHERE r.profile_id = h.profile_id) AS times_found
+            FROM search_hits h
+            LEFT JOIN llm_labels l ON l.profile_id = h.profile_id
+            LEFT JOIN profile_details d ON d.profile_id = h.profile_id
+            GROUP BY h.profile_id
+            """
+        )
+
+
+_store: Optional[ProfileStore] = None
+_store_lock = threading.Lock()
+
+def get_profile_store() -> Optional[ProfileStore]:
+    """
+    Возвращает общее хранилище профилей или None, если оно выключено
+
+    Returns:
+        ProfileStore или None
+    """
+    global _store
+    if not config.PROFILE_STORE_ENABLED:
+        return None
+    with _store_lock:
+        if _store is None:
+            _store = ProfileStore(config.PROFILE_STORE_PATH)
+    return _store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Запросы к хранилищу профилей")
+    parser.add_argument('--db', default=config.PROFILE_STORE_PATH)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    profile_parser = subparsers.add_parser('profile', help="Все данные о профиле")
+    profile_parser.add_argument('profile_id')
+    sql_parser = subparsers.add_parser('sql', help="Произвольный SELECT")
+    sql_parser.add_argument('query')
+    subparsers.add_parser('overview', help="Сводка по всем профилям")
+    args = parser.parse_args()
+
+    store = ProfileStore(args.db)
+    if args.command == 'profile':
+        print(json.dumps(store.profile(args.profile_id), ensure_ascii=False, indent=2, default=str))
+    elif args.command == 'sql':
+        print(store.query(args.query).to_string(index=False))
+    else:
+        print(store.overview().to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
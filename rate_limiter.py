@@ -0,0 +1,60 @@
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Потокобезопасный token bucket для ограничения числа запросов в секунду
+
+    Один экземпляр можно разделять между несколькими потоками и парсерами,
+    тогда все они укладываются в общий бюджет запросов.
+    """
+
+    def __init__(self, rate: float, capacity: float = None):
+        """
+        Args:
+            rate: Число токенов (запросов) в секунду
+            capacity: Максимальный запас токенов (по умолчанию равен rate, но не меньше 1)
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity) if capacity is not None else max(1.0, self.rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """
+        Меняет частоту пополнения на лету (используется для адаптивного темпа)
+
+        Args:
+            rate: Новое число токенов в секунду
+        """
+        with self._lock:
+            self._refill()
+            self.rate = float(rate)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """
+        Блокирует поток, пока в корзине не появится нужное число токенов
+
+        Args:
+            tokens: Сколько токенов списать
+
+        Returns:
+            float: Сколько секунд пришлось ждать
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return waited
+                delay = (tokens - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
@@ -0,0 +1,192 @@
+import hashlib
+import json
+import os
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+from openai.types.chat import ChatCompletion
+
+import config
+from response_archive import ResponseArchive, open_archive
+from profile_store import get_profile_store
+
+
+class ReplayError(Exception):
+    """
+    В режиме воспроизведения нет сохраненного ответа для запроса
+    """
+
+
+def load_page(json_folder: str, page: int) -> Dict[str, Any]:
+    """
+    Сохраненная страница поиска: из архива или из json_folder/page_N.json
+
+    Args:
+        json_folder: Папка парсера (например founders_json)
+        page: Номер страницы
+
+    Returns:
+        Dict с ответом API
+
+    Raises:
+        ReplayError: Если страница не сохранялась
+    """
+    archive = open_archive('pages')
+    key = f"{os.path.normpath(json_folder)}/page_{page}"
+    if key in archive:
+        return archive.get(key)
+
+    json_path = os.path.join(json_folder, f'page_{page}.json')
+    if os.path.exists(json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    raise ReplayError(f"нет сохраненной страницы {key}")
+
+
+def load_details(profile_id: str, output_dir: str = 'final_request_to_api') -> Dict[str, Any]:
+    """
+    Сохраненные детали профиля: архив, хранилище профилей или output_dir/<id>.json
+
+    Args:
+        profile_id: ID профиля
+        output_dir: Папка с JSON ответами
+
+    Returns:
+        Dict с ответом API
+
+    Raises:
+        ReplayError: Если детали профиля не сохранялись
+    """
+    archive = open_archive('details')
+    if str(profile_id) in archive:
+        return archive.get(str(profile_id))
+
+    store = get_profile_store()
+    if store is not None:
+        details = store.details(profile_id)
+        if details is not None:
+            return details
+
+    json_path = os.path.join(output_dir, f'{profile_id}.json')
+    if os.path.exists(json_path):
+        with open(json_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    raise ReplayError(f"нет сохраненных деталей профиля {profile_id}")
+
+
+def completion_key(request: Dict[str, Any]) -> str:
+    """
+    Ключ записи chat completion: sha256 аргументов запроса
+    """
+    text = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _batch_item_key(model: str, prompt_version: str, item_id: str) -> str:
+    return f"batch-item/{model}/{prompt_version}/{item_id}"
+
+
+def record_batch_items(model: str, prompt_version: str, items: Dict[str, Dict[str, Any]]) -> None:
+    """
+    Записывает результаты пакетного запроса по отдельным профилям
+
+    Промпт пакета зависит от его состава, поэтому после смены фильтров
+    записанный пакет целиком уже не находится; по профилям ответы
+    воспроизводятся при любом составе.
+
+    Args:
+        model: Модель OpenAI
+        prompt_version: Хэш шаблона промпта
+        items: Стабильный id профиля в промпте -> результат
+    """
+    if not config.LLM_RECORD or config.REPLAY:
+        return
+    archive = open_archive('completions')
+    for item_id, result in items.items():
+        archive.put(_batch_item_key(model, prompt_version, item_id), result)
+
+
+def load_batch_items(model: str, prompt_version: str, item_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Записанные результаты пакетных запросов по отдельным профилям
+
+    Returns:
+        Dict: стабильный id профиля -> результат (только найденные)
+    """
+    archive = open_archive('completions')
+    found = {}
+    for item_id in item_ids:
+        result = archive.get(_batch_item_key(model, prompt_version, item_id))
+        if result is not None:
+            found[item_id] = result
+    return found
+
+
+class _RecordedCompletions:
+    """
+    Обертка над client.chat.completions: записывает ответы и воспроизводит их
+
+    При config.REPLAY ответ берется из архива по ключу аргументов запроса
+    (без сети), иначе запрос уходит в OpenAI и при config.LLM_RECORD
+    ответ дописывается в архив.
+    """
+
+    def __init__(self, completions):
+        self._completions = completions
+
+    @property
+    def _archive(self) -> ResponseArchive:
+        return open_archive('completions')
+
+    def _replay(self, request: Dict[str, Any]) -> ChatCompletion:
+        recorded = self._archive.get(completion_key(request))
+        if recorded is None:
+            raise ReplayError(f"нет записанного ответа для запроса к {request.get('model')}")
+        return ChatCompletion.model_validate(recorded)
+
+    def _record(self, request: Dict[str, Any], response: ChatCompletion) -> None:
+        if config.LLM_RECORD:
+            self._archive.put(completion_key(request), response.model_dump(mode='json'))
+
+    def create(self, **request):
+        if config.REPLAY:
+            return self._replay(request)
+        response = self._completions.create(**request)
+        self._record(request, response)
+        return response
+
+    def __getattr__(self, name: str):
+        return getattr(self._completions, name)
+
+
+class _AsyncRecordedCompletions(_RecordedCompletions):
+
+    async def create(self, **request):
+        if config.REPLAY:
+            return self._replay(request)
+        response = await self._completions.create(**request)
+        self._record(request, response)
+        return response
+
+
+class RecordingClient:
+    """
+    Клиент OpenAI, у которого chat.completions записываются и воспроизводятся
+
+    Остальные атрибуты (files, batches, ...) передаются исходному клиенту.
+    """
+
+    def __init__(self, client, is_async: bool = False):
+        """
+        Args:
+            client: OpenAI или AsyncOpenAI
+            is_async: Клиент асинхронный
+        """
+        self._client = client
+        wrapper = _AsyncRecordedCompletions if is_async else _RecordedCompletions
+        self.chat = SimpleNamespace(completions=wrapper(client.chat.completions))
+
+    def __getattr__(self, name: str):
+        return getattr(self._client, name)
@@ -0,0 +1,271 @@
+import argparse
+import gzip
+import json
+import mmap
+import os
+import threading
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import config
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INDEX_FILE = 'index.tsv'
+
+
+class ResponseArchive:
+    """
+    Append-only архив сырых ответов API в сжатых JSONL сегментах
+
+    Каждая запись - компактная строка JSON, сжатая отдельным кадром gzip
+    или zstd и дописанная в конец текущего сегмента. В index.tsv для
+    каждого ключа хранится (сегмент, смещение, длина), поэтому запись
+    читается без распаковки сегмента целиком: байты берутся из mmap
+    сегмента. Повторная запись ключа добавляет новую версию, индекс
+    указывает на последнюю.
+
+    Ключи: profile_id для деталей профилей, "<json_folder>/page_<N>" для
+    страниц поиска, sha256 аргументов запроса для chat completions.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        compression: Optional[str] = None,
+        segment_max_bytes: Optional[int] = None
+    ):
+        """
+        Args:
+            directory: Папка архива
+            compression: gzip или zstd (по умолчанию config.ARCHIVE_COMPRESSION;
+                zstd без пакета zstandard заменяется на gzip)
+            segment_max_bytes: Размер сегмента, после которого начинается новый
+        """
+        self.directory = directory
+        self.compression = compression or config.ARCHIVE_COMPRESSION
+        if self.compression == 'zstd' and zstandard is None:
+            print("Пакет zstandard не установлен, архив пишется в gzip")
+            self.compression = 'gzip'
+        self.segment_max_bytes = segment_max_bytes or config.ARCHIVE_SEGMENT_MAX_BYTES
+
+        self._lock = threading.Lock()
+        self._index: Dict[str, Tuple[str, int, int]] = {}
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._files: Dict[str, Any] = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+        self._segment = self._current_segment()
+
+    def _load_index(self) -> None:
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.rstrip('\n').split('\t')
+                # Недописанная строка после падения пропускается
+                if len(parts) != 4:
+                    continue
+                key, segment, offset, length = parts
+                self._index[key] = (segment, int(offset), int(length))
+
+    def _segment_name(self, number: int) -> str:
+        extension = 'zst' if self.compression == 'zstd' else 'gz'
+        return f"segment-{number:05d}.jsonl.{extension}"
+
+    def _current_segment(self) -> str:
+        numbers = [
+            int(name.split('-')[1].split('.')[0])
+            for name in os.listdir(self.directory)
+            if name.startswith('segment-')
+        ]
+        return self._segment_name(max(numbers, default=0))
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == 'zstd':
+            return zstandard.ZstdCompressor(level=6).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    @staticmethod
+    def _decompress(segment: str, data: bytes) -> bytes:
+        if segment.endswith('.zst'):
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put(self, key: str, value: Any) -> None:
+        """
+        Дописывает ответ в архив
+
+        Args:
+            key: profile_id или "<json_folder>/page_<N>"
+            value: Ответ API (JSON-сериализуемый)
+        """
+        record = self._compress((json.dumps(value, ensure_ascii=False, separators=(',', ':')) + '\n').encode('utf-8'))
+
+        with self._lock:
+            segment_path = os.path.join(self.directory, self._segment)
+            if os.path.exists(segment_path) and os.path.getsize(segment_path) + len(record) > self.segment_max_bytes:
+                number = int(self._segment.split('-')[1].split('.')[0]) + 1
+                self._segment = self._segment_name(number)
+                segment_path = os.path.join(self.directory, self._segment)
+
+            with open(segment_path, 'ab') as f:
+                offset = f.tell()
+                f.write(record)
+            with open(os.path.join(self.directory, INDEX_FILE), 'a', encoding='utf-8') as f:
+                f.write(f"{key}\t{self._segment}\t{offset}\t{len(record)}\n")
+            self._index[key] = (self._segment, offset, len(record))
+
+    def _map(self, segment: str, end: int) -> mmap.mmap:
+        mapped = self._maps.get(segment)
+        # Текущий сегмент растет: отображение пересоздается, если запись за его концом
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            f = self._files.get(segment) or open(os.path.join(self.directory, segment), 'rb')
+            self._files[segment] = f
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[segment] = mapped
+        return mapped
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Читает последнюю версию ответа по ключу
+
+        Returns:
+            Ответ API или None, если ключа нет
+        """
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            segment, offset, length = location
+            data = self._map(segment, offset + length)[offset:offset + length]
+        return json.loads(self._decompress(segment, data))
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._index
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def keys(self, prefix: str = "") -> Iterator[str]:
+        """
+        Ключи архива, при необходимости только с префиксом (например "founders_json/")
+        """
+        return (key for key in list(self._index) if key.startswith(prefix))
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            for f in self._files.values():
+                f.close()
+            self._maps.clear()
+            self._files.clear()
+
+    def import_folder(self, folder: str, prefix: str = "", skip_existing: bool = True) -> int:
+        """
+        Импортирует папку с JSON файлами (например OLD/final_request_to_api)
+
+        Ключ записи - prefix + имя файла без .json, то есть profile_id для
+        деталей и "<json_folder>/page_<N>" для страниц при prefix="<json_folder>/".
+
+        Args:
+            folder: Папка с *.json
+            prefix: Префикс ключей
+            skip_existing: Не импортировать ключи, которые уже есть
+
+        Returns:
+            int: Сколько файлов импортировано
+        """
+        imported = 0
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith('.json'):
+                continue
+            key = prefix + name[:-len('.json')]
+            if skip_existing and key in self:
+                continue
+            try:
+                with open(os.path.join(folder, name), 'r', encoding='utf-8') as f:
+                    value = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"Пропущен {name}: {e}")
+                continue
+            self.put(key, value)
+            imported += 1
+        return imported
+
+
+_archives: Dict[str, ResponseArchive] = {}
+_archives_lock = threading.Lock()
+
+def open_archive(kind: str) -> ResponseArchive:
+    """
+    Возвращает общий для процесса архив config.ARCHIVE_DIR/<kind>
+
+    Все записи в одну папку должны идти через один объект, поэтому архив
+    создается один раз.
+
+    Args:
+        kind: pages, details или completions
+
+    Returns:
+        ResponseArchive
+    """
+    with _archives_lock:
+        if kind not in _archives:
+            _archives[kind] = ResponseArchive(os.path.join(config.ARCHIVE_DIR, kind))
+        return _archives[kind]
+
+def get_archive(kind: str) -> Optional[ResponseArchive]:
+    """
+    Возвращает общий архив ответов ('pages' или 'details') или None,
+    если сырые ответы сохраняются отдельными JSON файлами
+
+    Args:
+        kind: pages - страницы поиска, details - детали профилей
+
+    Returns:
+        ResponseArchive или None
+    """
+    if config.RAW_RESPONSE_FORMAT != 'archive':
+        return None
+    return open_archive(kind)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Архив сырых ответов API")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help="Импорт папки с JSON файлами")
+    import_parser.add_argument('folder', help="Например OLD/final_request_to_api или founders_json")
+    import_parser.add_argument('--kind', choices=['details', 'pages'], default='details')
+    import_parser.add_argument('--archive-dir', default=config.ARCHIVE_DIR)
+
+    get_parser = subparsers.add_parser('get', help="Вывести ответ по ключу")
+    get_parser.add_argument('key')
+    get_parser.add_argument('--kind', choices=['details', 'pages'], default='details')
+    get_parser.add_argument('--archive-dir', default=config.ARCHIVE_DIR)
+    args = parser.parse_args()
+
+    archive = ResponseArchive(os.path.join(args.archive_dir, args.kind))
+    if args.command == 'import':
+        # Страницы поиска хранятся под ключом "<json_folder>/page_<N>"
+        prefix = f"{os.path.basename(os.path.normpath(args.folder))}/" if args.kind == 'pages' else ""
+        imported = archive.import_folder(args.folder, prefix=prefix)
+        print(f"Импортировано {imported} файлов из {args.folder}, в архиве {len(archive)} ключей")
+    else:
+        value = archive.get(args.key)
+        if value is None:
+            print(f"Ключ {args.key} не найден")
+        else:
+            print(json.dumps(value, ensure_ascii=False, indent=2))
+    archive.close()
+
+
+if __name__ == "__main__":
+    main()
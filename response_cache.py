@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Dict, Optional
+
+
+class ResponseCache:
+    """
+    Кэш ответов API в одном файле SQLite с TTL по эндпоинтам и ограничением размера
+
+    Ключ - sha256 от эндпоинта и канонического JSON тела запроса
+    (query, page, per_page, profile_id ...), поэтому одинаковые запросы
+    попадают в одну запись независимо от порядка полей. Ответы хранятся
+    сжатыми (zlib) в таблице responses, а не отдельными файлами, поэтому
+    кэш не создает по файлу на ответ. При превышении max_bytes удаляются
+    записи, к которым дольше всего не обращались.
+    """
+
+    def __init__(self, path: str, ttl: Dict[str, float], max_bytes: int, default_ttl: float = 0):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+            ttl: TTL в секундах для каждого эндпоинта
+            max_bytes: Максимальный суммарный размер сжатых ответов в байтах
+            default_ttl: TTL для эндпоинтов, которых нет в ttl (0 - не кэшировать)
+        """
+        self.path = path
+        self.ttl = ttl
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._size = None
+
+    @staticmethod
+    def make_key(endpoint: str, payload: Dict[str, Any]) -> str:
+        """
+        Строит ключ кэша из эндпоинта и тела запроса
+        """
+        canonical = json.dumps({"endpoint": endpoint, "payload": payload}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        # Файл создается при первом обращении, а не при создании клиента
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    endpoint TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    size INTEGER NOT NULL,
+                    response BLOB NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def _ttl_for(self, endpoint: str) -> float:
+        return self.ttl.get(endpoint, self.default_ttl)
+
+    def get(self, endpoint: str, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Возвращает сохраненный ответ, если он есть и не устарел
+
+        Args:
+            endpoint: Эндпоинт API
+            payload: Тело запроса
+
+        Returns:
+            Dict с ответом API или None
+        """
+        ttl = self._ttl_for(endpoint)
+        if ttl <= 0:
+            self.misses += 1
+            return None
+
+        key = self.make_key(endpoint, payload)
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT created_at, response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or time.time() - row[0] > ttl:
+                self.misses += 1
+                return None
+            # Время доступа нужно для вытеснения давно неиспользуемых записей
+            conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            conn.commit()
+
+        try:
+            response = json.loads(zlib.decompress(row[1]))
+        except (zlib.error, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response
+
+    def put(self, endpoint: str, payload: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """
+        Сохраняет ответ в кэш
+
+        Args:
+            endpoint: Эндпоинт API
+            payload: Тело запроса
+            response: JSON ответ API
+        """
+        if self._ttl_for(endpoint) <= 0:
+            return
+
+        key = self.make_key(endpoint, payload)
+        data = zlib.compress(json.dumps(response, ensure_ascii=False).encode('utf-8'))
+        now = time.time()
+
+        with self._lock:
+            conn = self._connection()
+            if self._size is None:
+                self._size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            # При перезаписи ключа размер старой записи вычитается
+            old = conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, endpoint, created_at, accessed_at, size, response) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, endpoint, now, now, len(data), data)
+            )
+            conn.commit()
+            self._size += len(data) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        """
+        Удаляет самые старые по обращению записи, пока кэш не станет меньше 90% лимита
+
+        Вызывается под self._lock.
+        """
+        target = self.max_bytes * 0.9
+        size = self._size
+        removed = []
+        for key, entry_size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            if size <= target:
+                break
+            removed.append((key,))
+            size -= entry_size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", removed)
+        self._conn.commit()
+        self._size = size
@@ -0,0 +1,147 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+
+def _normalize_patterns(patterns: Iterable[str]) -> Tuple[str, ...]:
+    """
+    Убирает лишние пробелы, регистр и дубликаты; порядок не важен
+    """
+    normalized = {" ".join(str(pattern).split()).lower() for pattern in patterns}
+    normalized.discard("")
+    return tuple(sorted(normalized))
+
+
+def _trie_regex(words: Tuple[str, ...]) -> str:
+    """
+    Строит регулярное выражение по префиксному дереву слов
+
+    Вместо "a|b|c" из сотен альтернатив получается дерево вида
+    "co(?:-?founder|o)", поэтому движок re на каждой позиции проверяет
+    только ветки с совпадающим префиксом.
+
+    Args:
+        words: Нормализованные паттерны
+
+    Returns:
+        str: Регулярное выражение без границ слов
+    """
+    trie: Dict[str, dict] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node: Dict[str, dict]) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        alternation = "(?:" + "|".join(branches) + ")"
+        return alternation + "?" if is_end else alternation
+
+    return build(trie)
+
+
+@lru_cache(maxsize=64)
+def compile_patterns(patterns: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """
+    Компилирует набор паттернов в одно выражение с границами слов (с кэшем)
+
+    После паттерна допускается окончание множественного числа "s"
+    ("Recruiters", "Talent Acquisition Partners"), как при прежнем поиске
+    подстроки.
+
+    Args:
+        patterns: Результат _normalize_patterns
+
+    Returns:
+        re.Pattern без учета регистра или None для пустого набора
+    """
+    if not patterns:
+        return None
+    # Пробел внутри фразы совпадает с любой последовательностью пробелов
+    body = _trie_regex(patterns).replace(r"\ ", r"\s+")
+    return re.compile(rf"(?<!\w)(?:{body})s?(?!\w)", re.IGNORECASE)
+
+
+class RoleMatcher:
+    """
+    Сопоставление заголовков со списками ролей для включения и исключения
+
+    Роли совпадают только целыми словами (с необязательным "s" на конце):
+    "hr" находит "HR Manager" и "Head of HR", но не "three", поэтому
+    отступы вида " hr " не нужны, а "recruiter" находит и "Recruiters".
+    Спецсимволы в ролях экранируются ("c++", "r&d").
+    """
+
+    def __init__(self, exclude: Iterable[str] = (), include: Iterable[str] = ()):
+        """
+        Args:
+            exclude: Роли, при совпадении с которыми строка отбрасывается
+            include: Роли, хотя бы одна из которых должна быть в заголовке
+                (пустой список - оставлять все)
+        """
+        self.exclude = compile_patterns(_normalize_patterns(exclude))
+        self.include = compile_patterns(_normalize_patterns(include))
+
+    def mask(self, titles: pd.Series) -> pd.Series:
+        """
+        Маска строк, которые проходят фильтр
+
+        Args:
+            titles: Столбец sub_title
+
+        Returns:
+            pd.Series из bool с индексом titles
+        """
+        text = titles.fillna("").astype(str)
+        keep = pd.Series(True, index=titles.index)
+        if self.include is not None:
+            keep &= text.str.contains(self.include)
+        if self.exclude is not None:
+            keep &= ~text.str.contains(self.exclude)
+        return keep
+
+    def matches(self, titles: pd.Series, include: bool = False) -> pd.Series:
+        """
+        Первая совпавшая роль для каждой строки (NaN, если совпадений нет)
+
+        Args:
+            titles: Столбец sub_title
+            include: Искать по списку включения вместо списка исключения
+
+        Returns:
+            pd.Series с найденной ролью в нижнем регистре
+        """
+        pattern = self.include if include else self.exclude
+        if pattern is None:
+            return pd.Series(None, index=titles.index, dtype=object)
+        found = titles.fillna("").astype(str).str.extract(f"({pattern.pattern})", flags=pattern.flags)[0]
+        return found.str.lower()
+
+
+def filter_titles(
+    df: pd.DataFrame,
+    exclude: Iterable[str] = (),
+    include: Iterable[str] = (),
+    column: str = 'sub_title'
+) -> pd.DataFrame:
+    """
+    Оставляет строки, заголовок которых проходит RoleMatcher
+
+    Args:
+        df: Исходный DataFrame
+        exclude: Роли для исключения
+        include: Роли для включения (пустой список - без ограничения)
+        column: Столбец с заголовком
+
+    Returns:
+        pd.DataFrame: Отфильтрованный DataFrame
+    """
+    return df[RoleMatcher(exclude, include).mask(df[column])]
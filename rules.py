@@ -0,0 +1,248 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+import config
+
+# Столбцы результата RuleEngine.evaluate: значение правила (True/False/None) и имя сработавшего правила
+RULE_COLUMNS = [
+    'rule_is_stealth', 'stealth_rule',
+    'rule_is_founder', 'founder_rule',
+    'rule_has_current_company', 'company_rule'
+]
+
+# Явные признаки основателя из промпта llm_classifier
+FOUNDER_EXPLICIT = ["founder", "co-founder", "cofounder", "founding"]
+# Слова, при которых вопрос об основателе решает только LLM
+FOUNDER_SIGNALS = ["0 to 1", "my startup", "built from scratch", "entrepreneur"]
+FORMER_FOUNDER = r"\b(?:ex|former|formerly)[\s-]+(?:co-?)?founder"
+
+# Слова, которые не являются названием компании после "@"/"at"
+# ("Looking at New Opportunities" - поиск работы, а не компания)
+GENERIC_COMPANY_WORDS = [
+    "stealth", "startup", "start-up", "something", "new venture", "venture",
+    "project", "tbd", "tba", "confidential", "undisclosed", "the future", "scale",
+    "opportunities", "opportunity", "new challenges", "new challenge", "next chapter"
+]
+
+# "@ Company" или "at Company" в сегменте заголовка, который не начинается с ex-/former/previously.
+# Пробелы после разделителя проверяются внутри lookahead: иначе \s* откатывается
+# к нулевой длине и проверка приходится на пробел, а не на "Former"
+COMPANY_PATTERN = (
+    r"(?:^|[|,;•·/])"
+    r"(?!\s*(?i:ex|former|formerly|previously|prev|past)\b)"
+    r"[^|,;•·/]*?"
+    r"(?:@\s*|\b[Aa][Tt]\s+)"
+    r"(?P<company>[A-Z0-9][\w&.'’+-]*(?:[ \t]+[A-Z0-9][\w&.'’+-]*)*)"
+)
+
+
+def keyword_pattern(keywords: Iterable[str]) -> re.Pattern:
+    """
+    Компилирует список ключевых слов в одно регулярное выражение
+
+    Слова экранируются и ограничиваются по границам слов, поэтому
+    "cto" не совпадает с "director", а "0→1" работает как есть.
+
+    Args:
+        keywords: Ключевые слова
+
+    Returns:
+        re.Pattern без учета регистра
+    """
+    # Длинные фразы первыми, чтобы "stealth mode" не перекрывалось "stealth"
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    alternation = "|".join(re.escape(keyword) for keyword in ordered)
+    return re.compile(rf"(?<!\w)(?:{alternation})(?!\w)", re.IGNORECASE)
+
+
+class RuleEngine:
+    """
+    Детерминированные правила по sub_title, которые решают очевидные случаи без LLM
+
+    Для каждого признака правило возвращает True, False или None (не решено,
+    нужен LLM), а также имя сработавшего правила:
+
+    is_stealth:
+        stealth_direct - прямой признак ("stealth", "undisclosed", ...) -> True
+        company_no_keywords - есть текущая компания и нет ни одного
+            слова из STEALTH_KEYWORDS -> False
+    is_founder:
+        founder_explicit - "founder", "co-founder", "founding" -> True
+        no_founder_signals - нет ни одного слова из FOUNDER_ROLES и
+            похожих признаков -> False
+    has_current_company:
+        company_at - "@ Company" / "at Company" с конкретным названием -> True
+        empty_title - пустой заголовок -> False
+        stealth_without_company - прямой stealth-признак и нет "@"/"at" -> False
+    """
+
+    def __init__(
+        self,
+        stealth_keywords: List[str],
+        direct_stealth_keywords: List[str],
+        founder_roles: List[str]
+    ):
+        """
+        Args:
+            stealth_keywords: Все stealth-слова (config.STEALTH_KEYWORDS)
+            direct_stealth_keywords: Прямые stealth-признаки (config.STEALTH_DIRECT_KEYWORDS)
+            founder_roles: Роли основателя (config.FOUNDER_ROLES)
+        """
+        self.stealth_any = keyword_pattern(stealth_keywords)
+        self.stealth_direct = keyword_pattern(direct_stealth_keywords)
+        self.founder_explicit = keyword_pattern(FOUNDER_EXPLICIT)
+        self.founder_any = keyword_pattern(list(founder_roles) + FOUNDER_EXPLICIT + FOUNDER_SIGNALS)
+        self.former_founder = re.compile(FORMER_FOUNDER, re.IGNORECASE)
+        self.company = re.compile(COMPANY_PATTERN)
+        self.generic_company = keyword_pattern(GENERIC_COMPANY_WORDS)
+        self.preposition = re.compile(r"@|\bat\b", re.IGNORECASE)
+
+    def evaluate(self, titles: pd.Series) -> pd.DataFrame:
+        """
+        Применяет правила к столбцу заголовков
+
+        Args:
+            titles: Столбец sub_title
+
+        Returns:
+            pd.DataFrame с индексом titles и столбцами RULE_COLUMNS
+        """
+        text = titles.fillna("").astype(str)
+        result = pd.DataFrame(index=titles.index, columns=RULE_COLUMNS, dtype=object)
+
+        empty = text.str.strip() == ""
+        direct_stealth = text.str.contains(self.stealth_direct)
+        any_stealth = text.str.contains(self.stealth_any)
+        has_preposition = text.str.contains(self.preposition)
+
+        company_name = text.str.extract(self.company)['company']
+        has_company = company_name.notna() & ~company_name.fillna("").str.contains(self.generic_company)
+
+        founder_explicit = text.str.contains(self.founder_explicit) & ~text.str.contains(self.former_founder)
+        founder_any = text.str.contains(self.founder_any)
+
+        # Порядок присваиваний задает приоритет: более поздние правила перекрывают ранние
+        self._set(result, 'rule_has_current_company', 'company_rule', empty, False, 'empty_title')
+        self._set(result, 'rule_has_current_company', 'company_rule',
+                  direct_stealth & ~has_preposition, False, 'stealth_without_company')
+        self._set(result, 'rule_has_current_company', 'company_rule', has_company, True, 'company_at')
+
+        self._set(result, 'rule_is_stealth', 'stealth_rule',
+                  has_company & ~any_stealth, False, 'company_no_keywords')
+        self._set(result, 'rule_is_stealth', 'stealth_rule', direct_stealth, True, 'stealth_direct')
+
+        self._set(result, 'rule_is_founder', 'founder_rule', ~founder_any, False, 'no_founder_signals')
+        self._set(result, 'rule_is_founder', 'founder_rule', founder_explicit, True, 'founder_explicit')
+
+        return result
+
+    @staticmethod
+    def _set(result: pd.DataFrame, value_column: str, rule_column: str, mask: pd.Series, value: bool, rule: str) -> None:
+        result.loc[mask, value_column] = value
+        result.loc[mask, rule_column] = rule
+
+
+_engine: Optional[RuleEngine] = None
+
+def get_rule_engine() -> RuleEngine:
+    """
+    Возвращает RuleEngine с ключевыми словами из config (компилируется один раз)
+    """
+    global _engine
+    if _engine is None:
+        _engine = RuleEngine(config.STEALTH_KEYWORDS, config.STEALTH_DIRECT_KEYWORDS, config.FOUNDER_ROLES)
+    return _engine
+
+
+def stealth_results(rules: pd.DataFrame, profile_ids: pd.Series) -> Dict[str, Dict[str, Any]]:
+    """
+    Результаты для llm_classifier по строкам, где правила решили и stealth, и founder
+
+    Args:
+        rules: Результат RuleEngine.evaluate
+        profile_ids: Столбец profile_id с тем же индексом
+
+    Returns:
+        Dict: profile_id -> результат в формате llm_classifier
+    """
+    decided = rules['rule_is_stealth'].notna() & rules['rule_is_founder'].notna()
+    return {
+        str(profile_ids[idx]): {
+            "is_stealth": bool(row['rule_is_stealth']),
+            "is_founder": bool(row['rule_is_founder']),
+            "reason": f"rule: {row['stealth_rule']}, {row['founder_rule']}"
+        }
+        for idx, row in rules[decided].iterrows()
+    }
+
+
+def company_results(rules: pd.DataFrame, profile_ids: pd.Series) -> Dict[str, Dict[str, Any]]:
+    """
+    Результаты для company_name_classifier по строкам, решенным правилами
+
+    Args:
+        rules: Результат RuleEngine.evaluate
+        profile_ids: Столбец profile_id с тем же индексом
+
+    Returns:
+        Dict: profile_id -> результат в формате company_name_classifier
+    """
+    decided = rules['rule_has_current_company'].notna()
+    return {
+        str(profile_ids[idx]): {
+            "has_current_company": bool(row['rule_has_current_company']),
+            "reason": f"rule: {row['company_rule']}"
+        }
+        for idx, row in rules[decided].iterrows()
+    }
+
+
+def fused_results(rules: pd.DataFrame, profile_ids: pd.Series) -> Dict[str, Dict[str, Any]]:
+    """
+    Результаты для fused_classifier по строкам, где правила решили все три признака
+
+    Args:
+        rules: Результат RuleEngine.evaluate
+        profile_ids: Столбец profile_id с тем же индексом
+
+    Returns:
+        Dict: profile_id -> результат в формате fused_classifier
+    """
+    stealth = stealth_results(rules, profile_ids)
+    company = company_results(rules, profile_ids)
+    return {
+        profile_id: {
+            "is_stealth": result['is_stealth'],
+            "is_founder": result['is_founder'],
+            "has_current_company": company[profile_id]['has_current_company'],
+            "stealth_reason": result['reason'],
+            "company_reason": company[profile_id]['reason']
+        }
+        for profile_id, result in stealth.items()
+        if profile_id in company
+    }
+
+
+def rule_report(rules: pd.DataFrame, decided: int, stage: str) -> str:
+    """
+    Отчет о том, какую долю строк закрыло каждое правило
+
+    Args:
+        rules: Результат RuleEngine.evaluate
+        decided: Сколько строк решено без LLM на этом шаге
+        stage: Название шага для отчета
+
+    Returns:
+        str: Многострочный отчет
+    """
+    total = len(rules)
+    if total == 0:
+        return f"Правила ({stage}): нет строк"
+
+    lines = [f"Правила ({stage}): без LLM решено {decided} из {total} ({decided / total:.1%})"]
+    for column in ('stealth_rule', 'founder_rule', 'company_rule'):
+        for rule, count in rules[column].value_counts().items():
+            lines.append(f"  {column} = {rule}: {count} ({count / total:.1%})")
+    return "\n".join(lines)
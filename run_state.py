@@ -0,0 +1,223 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+import config
+from llm_cache import normalize_input
+
+
+# Столбцы с причиной решения LLM: "API Error" или пустое значение означает,
+# что профиль не классифицирован (заглушка ошибки) и сохранять его нельзя
+REASON_COLUMNS = ('stealth_reason', 'current_company_reason')
+FAILED_REASONS = ("API Error", "")
+
+
+def is_failed_row(record: Dict[str, Any]) -> bool:
+    """
+    Проверяет, что строка результата - заглушка ошибки LLM
+    """
+    return any(
+        column in record and (record[column] is None or record[column] in FAILED_REASONS)
+        for column in REASON_COLUMNS
+    )
+
+
+def content_hashes(df: pd.DataFrame, version: str = "") -> pd.Series:
+    """
+    Хэш содержимого профиля по нормализованным sub_title и skills
+
+    Args:
+        df: DataFrame со столбцами sub_title и skills
+        version: Версия шага (модель, промпты, правила): при ее смене
+            меняются хэши всех профилей
+
+    Returns:
+        pd.Series с хэшами и индексом df
+    """
+    skills = df['skills'] if 'skills' in df.columns else pd.Series("", index=df.index)
+    return pd.Series(
+        [
+            hashlib.sha256(
+                f"{version}\0{normalize_input(title)}\0{normalize_input(skill)}".encode('utf-8')
+            ).hexdigest()[:16]
+            for title, skill in zip(df['sub_title'], skills)
+        ],
+        index=df.index
+    )
+
+
+class RunState:
+    """
+    Состояние прошлых запусков в SQLite: profile_id, хэш содержимого и
+    результат каждого шага
+
+    Результаты пишутся при каждом запуске, а в инкрементальном режиме
+    профили с тем же хэшем берутся отсюда вместо повторных запросов к LLM
+    и ProApis.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу базы SQLite
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS stage_results (
+                profile_id TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                row TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (profile_id, stage)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def lookup(self, stage: str, profile_ids: List[str]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """
+        Сохраненные результаты шага
+
+        Args:
+            stage: Имя шага
+            profile_ids: ID профилей
+
+        Returns:
+            Dict: profile_id -> (хэш содержимого, строка результата)
+        """
+        found = {}
+        unique_ids = list(dict.fromkeys(profile_ids))
+        with self._lock:
+            # SQLite ограничивает число параметров в запросе, поэтому читаем частями
+            for start in range(0, len(unique_ids), 500):
+                chunk = unique_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT profile_id, content_hash, row FROM stage_results "
+                    f"WHERE stage = ? AND profile_id IN ({placeholders})",
+                    [stage, *chunk]
+                ).fetchall()
+                found.update((profile_id, (digest, json.loads(row))) for profile_id, digest, row in rows)
+        return found
+
+    def record(self, stage: str, result: pd.DataFrame, hashes: Dict[str, str]) -> None:
+        """
+        Сохраняет результаты шага одной транзакцией
+
+        Строки-заглушки ошибок LLM (is_failed_row) не сохраняются, чтобы
+        следующий инкрементальный запуск обработал эти профили заново.
+
+        Args:
+            stage: Имя шага
+            result: Строки результата со столбцом profile_id
+            hashes: profile_id -> хэш содержимого входного профиля
+        """
+        now = time.time()
+        records = json.loads(result.to_json(orient='records', force_ascii=False)) if len(result) else []
+        rows = [
+            (str(record['profile_id']), stage, hashes[str(record['profile_id'])],
+             json.dumps(record, ensure_ascii=False), now)
+            for record in records
+            if str(record['profile_id']) in hashes and not is_failed_row(record)
+        ]
+        if not rows:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stage_results (profile_id, stage, content_hash, row, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+            self._conn.commit()
+
+
+_state: Optional[RunState] = None
+
+def get_run_state() -> RunState:
+    """
+    Возвращает общее состояние запусков (config.RUN_STATE_PATH)
+    """
+    global _state
+    if _state is None:
+        _state = RunState(config.RUN_STATE_PATH)
+    return _state
+
+
+def run_incremental(
+    df: pd.DataFrame,
+    stage: str,
+    process: Callable[[pd.DataFrame], pd.DataFrame],
+    incremental: Optional[bool] = None,
+    state: Optional[RunState] = None,
+    version: str = ""
+) -> pd.DataFrame:
+    """
+    Выполняет шаг только для новых и изменившихся профилей
+
+    В инкрементальном режиме профили, у которых хэш sub_title/skills и
+    версии шага совпадает с прошлым запуском, не передаются в process: их строки
+    берутся из RunState. Результаты process сохраняются в RunState всегда,
+    чтобы следующий инкрементальный запуск мог ими воспользоваться.
+    Профили без строки в результате (ошибки ProApis) и со строкой-заглушкой
+    ошибки LLM (причина "API Error" или пустая) не сохраняются и будут
+    обработаны повторно.
+
+    Args:
+        df: Входной DataFrame шага (со столбцами profile_id, sub_title, skills)
+        stage: Имя шага в RunState
+        process: Функция шага: входной DataFrame -> результат со столбцом profile_id
+        incremental: Использовать прошлые результаты (по умолчанию config.INCREMENTAL)
+        state: Хранилище (по умолчанию get_run_state())
+        version: Версия шага (хэш модели, промптов и параметров): после ее
+            смены все профили обрабатываются заново
+
+    Returns:
+        pd.DataFrame: Результат для всех профилей df в порядке df
+    """
+    if incremental is None:
+        incremental = config.INCREMENTAL
+    if state is None:
+        state = get_run_state()
+
+    profile_ids = df['profile_id'].astype(str)
+    hashes = content_hashes(df, version)
+    hash_of = dict(zip(profile_ids, hashes))
+
+    reused: List[Dict[str, Any]] = []
+    todo = pd.Series(True, index=df.index)
+    if incremental:
+        stored = state.lookup(stage, list(profile_ids))
+        for idx, profile_id in profile_ids.items():
+            previous = stored.get(profile_id)
+            if previous is not None and previous[0] == hash_of[profile_id]:
+                todo[idx] = False
+                reused.append(previous[1])
+        print(f"Инкрементальный режим ({stage}): {int(todo.sum())} новых или измененных профилей, "
+              f"{len(reused)} взяты из прошлых запусков")
+
+    result = process(df[todo].copy()) if todo.any() or not incremental else df.iloc[0:0]
+    state.record(stage, result, hash_of)
+
+    if not reused:
+        return result
+
+    previous_df = pd.DataFrame(reused)
+    previous_df['profile_id'] = previous_df['profile_id'].astype(str)
+    combined = pd.concat([result, previous_df], ignore_index=True)
+
+    # Порядок строк как во входном df
+    order = {profile_id: position for position, profile_id in enumerate(profile_ids)}
+    position = combined['profile_id'].astype(str).map(order)
+    combined = combined.iloc[position.argsort(kind='stable')].reset_index(drop=True)
+    combined.attrs = result.attrs
+    return combined
@@ -0,0 +1,253 @@
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import pandas as pd
+
+import config
+from parsing_old_employee import (
+    parse_revolut_by_past_roles,
+    parse_revolut_founders,
+    parse_revolut_stealth_titles
+)
+from prepare_data import DEFAULT_EXCLUDE_ROLES
+from role_matcher import RoleMatcher
+from profile_store import get_profile_store
+from llm_file import classify_profile
+from more_requests import (
+    _fetch_and_save,
+    _build_profile_row,
+    _raw_ref,
+    filter_stealth_companies,
+    get_stealth_company_ids
+)
+
+# Маркер конца потока в очереди
+_DONE = object()
+
+# Парсеры, чьи CSV входят в DEFAULT_INPUT_FILES
+STREAM_PARSERS = [
+    parse_revolut_by_past_roles,
+    parse_revolut_founders,
+    parse_revolut_stealth_titles
+]
+
+
+class _Stats:
+    """
+    Потокобезопасные счетчики по шагам потокового пайплайна
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, int] = {}
+
+    def add(self, name: str, value: int = 1) -> None:
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + value
+
+    def report(self) -> str:
+        with self._lock:
+            return ", ".join(f"{name}: {count}" for name, count in sorted(self.counts.items()))
+
+
+def _run_workers(
+    name: str,
+    count: int,
+    source: queue.Queue,
+    handle: Callable[[Any], None],
+    downstream: Optional[queue.Queue],
+    downstream_workers: int
+) -> List[threading.Thread]:
+    """
+    Запускает count потоков, обрабатывающих элементы source через handle
+
+    Когда все потоки получили маркер конца, в downstream кладется по
+    маркеру на каждый поток следующего шага.
+    """
+    remaining = [count]
+    lock = threading.Lock()
+
+    def worker():
+        while True:
+            item = source.get()
+            if item is _DONE:
+                break
+            try:
+                handle(item)
+            except Exception as e:
+                print(f"[{name}] ошибка для профиля {item.get('profile_id')}: {e}")
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last and downstream is not None:
+            for _ in range(downstream_workers):
+                downstream.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"{name}-{idx}", daemon=True) for idx in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def run_streaming(
+    model: Optional[str] = None,
+    output_file: str = 'founders_in_stealth_companies_stream.csv',
+    details_dir: str = 'final_request_to_api',
+    queue_size: Optional[int] = None,
+    llm_workers: Optional[int] = None,
+    detail_workers: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Потоковый режим: профили проходят все шаги по мере получения
+
+    Шаги соединены ограниченными очередями (queue_size), поэтому быстрый
+    поиск не обгоняет медленные LLM и детали профилей больше, чем на размер
+    очереди:
+
+        поиск (парсеры) -> дедупликация и фильтр ролей
+            -> LLM (текущая компания, затем stealth/founder)
+            -> детали профиля -> фильтр stealth компаний -> output_file
+
+    Текущая компания проверяется первой, и профили с компанией дальше не
+    идут, поэтому stealth классификация запрашивается только для
+    кандидатов. Классификация идет тем же путем, что в шагах 2/3
+    (llm_file.classify_profile: правила, кэш LLM, локальная модель, LLM),
+    а ID stealth компаний загружаются как в шаге 5
+    (more_requests.get_stealth_company_ids). Найденные профили
+    дописываются в output_file сразу.
+
+    Args:
+        model: Модель OpenAI (по умолчанию config.gpt_4o)
+        output_file: CSV для найденных профилей
+        details_dir: Папка для JSON ответов с деталями профилей
+        queue_size: Размер каждой очереди (по умолчанию config.STREAM_QUEUE_SIZE)
+        llm_workers: Потоков LLM (по умолчанию config.LLM_CONCURRENCY)
+        detail_workers: Потоков деталей профилей (по умолчанию config.DETAIL_CONCURRENCY)
+
+    Returns:
+        pd.DataFrame: Найденные профили (как в filter_stealth_companies)
+    """
+    model = model or config.gpt_4o
+    queue_size = queue_size or config.STREAM_QUEUE_SIZE
+    llm_workers = llm_workers or config.LLM_CONCURRENCY
+    detail_workers = detail_workers or config.DETAIL_CONCURRENCY
+
+    stats = _Stats()
+    started = time.time()
+
+    raw_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    llm_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    detail_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+
+    matcher = RoleMatcher(exclude=DEFAULT_EXCLUDE_ROLES)
+    stealth_company_ids = get_stealth_company_ids()
+
+    # 0. Поиск: парсеры пишут CSV как обычно и передают строки каждой страницы в очередь
+    def on_rows(rows: List[Dict[str, Any]]) -> None:
+        for row in rows:
+            raw_queue.put(row)
+        stats.add('найдено в поиске', len(rows))
+
+    def search():
+        threads = [threading.Thread(target=parser, kwargs={'on_rows': on_rows}, daemon=True) for parser in STREAM_PARSERS]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        raw_queue.put(_DONE)
+
+    # 1. Дедупликация и фильтр ролей (один поток, владеет множеством seen)
+    seen = set()
+
+    def dedupe(row: Dict[str, Any]) -> None:
+        profile_id = str(row['profile_id'])
+        if not profile_id or profile_id in seen:
+            return
+        seen.add(profile_id)
+        if not matcher.mask(pd.Series([row['sub_title']])).iloc[0]:
+            stats.add('исключено по роли')
+            return
+        stats.add('уникальных профилей')
+        llm_queue.put(row)
+
+    # 2-3. Классификация: сначала текущая компания, stealth/founder - только без компании.
+    # Каждый профиль проходит тот же путь, что в шагах 2/3: правила, кэш LLM,
+    # локальная модель, LLM
+    def classify(row: Dict[str, Any]) -> None:
+        sub_title, skills = row['sub_title'], row['skills']
+
+        if config.PIPELINE_MODE == 'fused':
+            fused = classify_profile('fused', sub_title, skills, model)
+            has_company = fused['has_current_company']
+            row.update({
+                'is_stealth': fused['is_stealth'],
+                'is_founder': fused['is_founder'],
+                'stealth_reason': fused['stealth_reason'],
+                'current_company_reason': fused['company_reason']
+            })
+        else:
+            company = classify_profile('company', sub_title, skills, model)
+            has_company = company['has_current_company']
+            row['current_company_reason'] = company['reason']
+
+            if not has_company:
+                stealth = classify_profile('stealth', sub_title, skills, model)
+                row.update({
+                    'is_stealth': stealth['is_stealth'],
+                    'is_founder': stealth['is_founder'],
+                    'stealth_reason': stealth['reason']
+                })
+
+        row['has_current_company'] = has_company
+        stats.add('классифицировано')
+        if not has_company:
+            stats.add('без текущей компании')
+            detail_queue.put(row)
+
+    # 4-5. Детали профиля и фильтр stealth компаний, найденные пишутся сразу
+    found: List[pd.DataFrame] = []
+    output_lock = threading.Lock()
+    if os.path.exists(output_file):
+        os.remove(output_file)
+
+    def details(row: Dict[str, Any]) -> None:
+        json_data = _fetch_and_save(row['profile_id'], details_dir)
+        profile_row = _build_profile_row(pd.Series(row), json_data)
+        store = get_profile_store()
+        if store is not None:
+            store.upsert_details([{**profile_row, 'raw_ref': _raw_ref(row['profile_id'], details_dir)}])
+        stats.add('получено деталей')
+        match = filter_stealth_companies(pd.DataFrame([profile_row]), stealth_company_ids)
+        if match.empty:
+            return
+
+        stats.add('найдено в stealth')
+        with output_lock:
+            write_header = not os.path.exists(output_file)
+            match.to_csv(output_file, mode='a', header=write_header, index=False)
+            found.append(match)
+        print(f"[{time.time() - started:.0f} с] Stealth: {profile_row['first_name']} "
+              f"{profile_row['last_name']} - {profile_row['current_company']} ({profile_row['li_url']})")
+
+    search_thread = threading.Thread(target=search, name="search", daemon=True)
+    search_thread.start()
+    threads = [search_thread]
+    threads += _run_workers("dedupe", 1, raw_queue, dedupe, llm_queue, llm_workers)
+    threads += _run_workers("llm", llm_workers, llm_queue, classify, detail_queue, detail_workers)
+    threads += _run_workers("details", detail_workers, detail_queue, details, None, 0)
+
+    while any(thread.is_alive() for thread in threads):
+        for thread in threads:
+            thread.join(timeout=30)
+            if thread.is_alive():
+                break
+        print(f"[{time.time() - started:.0f} с] {stats.report()}")
+
+    print(f"\nПотоковый режим завершен за {time.time() - started:.0f} с: {stats.report()}")
+    if not found:
+        return pd.DataFrame()
+    return pd.concat(found, ignore_index=True)
+
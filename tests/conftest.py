@@ -0,0 +1,7 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# llm_file создает клиент OpenAI при импорте; тесты в сеть не ходят
+os.environ.setdefault("OPENAI_API_KEY", "test")
@@ -0,0 +1,52 @@
+import pandas as pd
+
+import config
+import llm_file
+from distill import load_training_data
+from llm_cache import LLMCache
+
+
+def test_training_data_skips_rule_and_local_labels(tmp_path):
+    path = tmp_path / "profiles_with_llm.csv"
+    pd.DataFrame([
+        {'profile_id': '1', 'sub_title': 'Founder @ Stealth', 'skills': '', 'is_stealth': True,
+         'is_founder': True, 'stealth_reason': 'Stealth in title'},
+        {'profile_id': '2', 'sub_title': 'Founder | Former PM at Google', 'skills': '', 'is_stealth': False,
+         'is_founder': True, 'stealth_reason': 'rule: company_no_keywords, founder_explicit'},
+        {'profile_id': '3', 'sub_title': 'CTO', 'skills': '', 'is_stealth': False,
+         'is_founder': False, 'stealth_reason': 'local model (p_stealth=0.01, p_founder=0.02)'},
+        {'profile_id': '4', 'sub_title': 'CEO', 'skills': '', 'is_stealth': False,
+         'is_founder': False, 'stealth_reason': 'API Error'},
+    ]).to_csv(path, index=False)
+
+    docs, labels = load_training_data([str(path)])
+
+    assert len(docs) == 1
+    assert labels.tolist() == [[1.0, 1.0]]
+
+
+def test_cached_llm_answer_wins_over_local_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', True)
+    monkeypatch.setattr(llm_file, '_llm_cache', LLMCache(str(tmp_path / "llm_cache.sqlite")))
+    profiles = [
+        {'profile_id': 'g0', 'sub_title': 'Founder @ Stealth', 'skills': ''},
+        {'profile_id': 'g1', 'sub_title': 'CTO', 'skills': ''},
+    ]
+    cached = {"is_stealth": True, "is_founder": True, "reason": "gpt"}
+    llm_file.get_llm_cache().put_many('m', 'v1', [(LLMCache.make_input_key(['Founder @ Stealth', '']), cached)])
+
+    local_calls = []
+
+    def local(pending):
+        local_calls.append([profile['profile_id'] for profile in pending])
+        return {profile['profile_id']: {"is_stealth": False, "is_founder": False, "reason": "local model"}
+                for profile in pending}
+
+    results = llm_file._classify_with_cache(
+        profiles, 'm', 'v1', ['sub_title', 'skills'], llm_file.STEALTH_DEFAULT,
+        classify=lambda pending: {}, before_api=local
+    )
+
+    assert results['g0'] == cached
+    assert local_calls == [['g1']]
+    assert llm_file.get_llm_cache().get_many('m', 'v1', [LLMCache.make_input_key(['CTO', ''])]) == {}
@@ -0,0 +1,94 @@
+import json
+import re
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+from openai.types.chat import ChatCompletion
+
+import config
+import llm_file
+import response_archive
+from llm_cache import LLMCache
+from replay import RecordingClient, ReplayError
+
+
+def test_missing_results_are_marked_as_api_error(monkeypatch):
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', False)
+    monkeypatch.setattr(llm_file, '_classify_with_batch_api', lambda profiles, *args: {
+        profiles[0]['profile_id']: {"has_current_company": True, "reason": "Works at Monzo"}
+    })
+    df = pd.DataFrame({
+        'profile_id': ['1', '2'],
+        'sub_title': ['Engineer at Monzo', 'Building something new'],
+        'skills': ['', '']
+    })
+
+    llm_file.process_company_names(df, 'gpt-4o', mode='batch_api', use_rules=False)
+
+    assert df['has_current_company'].tolist() == [True, False]
+    assert df['current_company_reason'].tolist() == ["Works at Monzo", "API Error"]
+
+
+def _batch_completion(request):
+    item_ids = re.findall(r'"profile_id": "(\w+)"', request['messages'][1]['content'])
+    content = json.dumps({'results': [
+        {'profile_id': item_id, 'is_stealth': True, 'is_founder': True, 'reason': 'Stealth in title'}
+        for item_id in item_ids
+    ]})
+    return ChatCompletion.model_validate({
+        'id': 'chatcmpl-test', 'object': 'chat.completion', 'created': 0, 'model': request['model'],
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': content}}]
+    })
+
+
+def test_batch_replay_survives_regrouping(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'ARCHIVE_DIR', str(tmp_path / "raw_archive"))
+    monkeypatch.setattr(config, 'LLM_RECORD', True)
+    monkeypatch.setattr(response_archive, '_archives', {})
+    calls = []
+    completions = SimpleNamespace(create=lambda **request: calls.append(request) or _batch_completion(request))
+    monkeypatch.setattr(llm_file, 'client', RecordingClient(SimpleNamespace(chat=SimpleNamespace(completions=completions))))
+    profiles = [
+        {'profile_id': 'g0', 'sub_title': 'Founder @ Stealth', 'skills': 'Python'},
+        {'profile_id': 'g1', 'sub_title': 'Recruiter at Monzo', 'skills': ''},
+        {'profile_id': 'g2', 'sub_title': 'Building something new', 'skills': 'AI'}
+    ]
+    llm_file.llm_classifier_batch(profiles, 'gpt-4o')
+
+    # Другой фильтр убрал рекрутера: группы перенумерованы, пакет другой
+    monkeypatch.setattr(config, 'REPLAY', True)
+    replayed = llm_file.llm_classifier_batch([
+        {**profiles[2], 'profile_id': 'g0'},
+        {**profiles[0], 'profile_id': 'g1'}
+    ], 'gpt-4o')
+
+    assert len(calls) == 1
+    assert sorted(replayed) == ['g0', 'g1']
+    assert replayed['g0']['reason'] == 'Stealth in title'
+
+    with pytest.raises(ReplayError):
+        llm_file.llm_classifier_batch([{'profile_id': 'g0', 'sub_title': 'CTO', 'skills': ''}], 'gpt-4o')
+
+
+def test_classify_profile_uses_rules_then_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, 'LLM_CACHE_ENABLED', True)
+    monkeypatch.setattr(config, 'LOCAL_MODEL_PATH', None)
+    monkeypatch.setattr(llm_file, '_llm_cache', LLMCache(str(tmp_path / "llm_cache.sqlite")))
+
+    def no_api(*args, **kwargs):
+        raise AssertionError("LLM не должен вызываться")
+
+    monkeypatch.setattr(llm_file, 'company_name_classifier', no_api)
+    monkeypatch.setattr(llm_file, 'llm_classifier', no_api)
+
+    company = llm_file.classify_profile('company', 'Engineer @ Monzo', '', 'gpt-4o', use_rules=True)
+    assert company['has_current_company'] is True
+    assert company['reason'].startswith('rule:')
+
+    cached = {'is_stealth': True, 'is_founder': True, 'reason': 'Stealth in title'}
+    llm_file.get_llm_cache().put(
+        'gpt-4o', llm_file.STEALTH_PROMPT_VERSION, LLMCache.make_input_key(['Building something', 'AI']), cached
+    )
+    assert llm_file.classify_profile('stealth', 'Building something', 'AI', 'gpt-4o', use_rules=True) == cached
@@ -0,0 +1,87 @@
+import json
+
+import pytest
+
+import openai_batch
+from openai_batch import LocalBatchClient, build_batch_request, run_batch, split_batch_requests
+
+
+def _requests(count):
+    return [
+        build_batch_request(f"stealth-{idx}", {"model": "m", "messages": [{"role": "user", "content": str(idx)}]})
+        for idx in range(count)
+    ]
+
+
+@pytest.fixture
+def responses_path(tmp_path):
+    path = tmp_path / "responses.jsonl"
+    with open(path, 'w', encoding='utf-8') as f:
+        for idx in range(10):
+            f.write(json.dumps({"custom_id": f"stealth-{idx}", "content": {"is_stealth": idx % 2 == 0}}) + "\n")
+    return str(path)
+
+
+def test_run_batch_returns_results_by_custom_id(tmp_path, responses_path):
+    client = LocalBatchClient(responses_path)
+    results = run_batch(_requests(4), "stealth", client, jobs_dir=str(tmp_path / "jobs"), poll_interval=0)
+
+    assert results == {f"stealth-{idx}": {"is_stealth": idx % 2 == 0} for idx in range(4)}
+
+
+def test_run_batch_resumes_downloaded_job(tmp_path, responses_path):
+    jobs_dir = str(tmp_path / "jobs")
+    run_batch(_requests(3), "stealth", LocalBatchClient(responses_path), jobs_dir=jobs_dir, poll_interval=0)
+
+    client = LocalBatchClient(responses_path)
+    results = run_batch(_requests(3), "stealth", client, jobs_dir=jobs_dir, poll_interval=0)
+
+    assert len(results) == 3
+    assert client._batches == {}
+
+
+def test_run_batch_resubmits_failed_batch(tmp_path, responses_path):
+    client = LocalBatchClient(responses_path, fail_batches=1)
+    results = run_batch(_requests(3), "stealth", client, jobs_dir=str(tmp_path / "jobs"), poll_interval=0)
+
+    assert len(results) == 3
+    assert len(client._batches) == 2
+
+
+def test_run_batch_after_failure_in_previous_run(tmp_path, responses_path):
+    jobs_dir = str(tmp_path / "jobs")
+    run_batch(_requests(3), "stealth", LocalBatchClient(responses_path, fail_batches=1),
+              jobs_dir=jobs_dir, poll_interval=0, max_retries=0)
+
+    results = run_batch(_requests(3), "stealth", LocalBatchClient(responses_path), jobs_dir=jobs_dir, poll_interval=0)
+
+    assert len(results) == 3
+
+
+def test_run_batch_retries_only_error_file_ids(tmp_path, responses_path):
+    batch_requests = _requests(12)
+    client = LocalBatchClient(responses_path)
+    results = run_batch(batch_requests, "stealth", client, jobs_dir=str(tmp_path / "jobs"),
+                        poll_interval=0, max_retries=1)
+
+    assert set(results) == {f"stealth-{idx}" for idx in range(10)}
+    retry_input = client._files[client._batches["batch-2"]["input_file_id"]]
+    assert [json.loads(line)['custom_id'] for line in retry_input.splitlines()] == ["stealth-10", "stealth-11"]
+
+
+def test_split_batch_requests_respects_limits():
+    batch_requests = _requests(7)
+    assert [len(chunk) for chunk in split_batch_requests(batch_requests, max_requests=3)] == [3, 3, 1]
+
+    line_bytes = len((json.dumps(batch_requests[0], ensure_ascii=False) + "\n").encode('utf-8'))
+    chunks = split_batch_requests(batch_requests, max_bytes=line_bytes * 2)
+    assert [len(chunk) for chunk in chunks] == [2, 2, 2, 1]
+
+
+def test_run_batch_splits_large_input(tmp_path, responses_path, monkeypatch):
+    monkeypatch.setattr(openai_batch, 'MAX_BATCH_REQUESTS', 4)
+    client = LocalBatchClient(responses_path)
+    results = run_batch(_requests(10), "stealth", client, jobs_dir=str(tmp_path / "jobs"), poll_interval=0)
+
+    assert len(results) == 10
+    assert len(client._batches) == 3
@@ -0,0 +1,24 @@
+import parsing_old_employee
+
+
+def test_retried_page_is_written_in_order(monkeypatch):
+    attempts = {}
+
+    def request_page(query, page, json_folder):
+        attempts[page] = attempts.get(page, 0) + 1
+        if page == 3 and attempts[page] == 1:
+            raise ConnectionError("reset by peer")
+        if page == 5:
+            raise ConnectionError("reset by peer")
+        return {'page': page}
+
+    monkeypatch.setattr(parsing_old_employee, '_request_page', request_page)
+    written = []
+
+    failed = parsing_old_employee._fetch_pages_concurrently(
+        'query', 'founders_json', range(2, 7), 4, 'founder',
+        lambda page, response: written.append(page)
+    )
+
+    assert written == [2, 3, 4, 6]
+    assert list(failed) == [5]
@@ -0,0 +1,44 @@
+from pipeline import Pipeline, Stage
+
+
+def _pipeline(tmp_path, calls):
+    source = tmp_path / "source.txt"
+    prepared = tmp_path / "prepared.txt"
+
+    def search():
+        calls.append('search')
+        source.write_text("profiles")
+
+    def prepare():
+        calls.append('prepare')
+        prepared.write_text(source.read_text().upper())
+
+    return Pipeline([
+        Stage('search', search, inputs=[], outputs=[str(source)]),
+        Stage('prepare', prepare, inputs=[str(source)], outputs=[str(prepared)]),
+    ], manifest_file=str(tmp_path / "manifest.json"))
+
+
+def test_unchanged_stages_are_skipped(tmp_path):
+    calls = []
+    _pipeline(tmp_path, calls).run()
+    _pipeline(tmp_path, calls).run()
+
+    assert calls == ['search', 'prepare']
+
+
+def test_always_runs_listed_stages(tmp_path):
+    calls = []
+    _pipeline(tmp_path, calls).run()
+    _pipeline(tmp_path, calls).run(always=['search'])
+
+    # Поиск вернул те же данные, поэтому prepare по-прежнему пропускается
+    assert calls == ['search', 'prepare', 'search']
+
+
+def test_always_respects_only(tmp_path):
+    calls = []
+    _pipeline(tmp_path, calls).run()
+    _pipeline(tmp_path, calls).run(only='prepare', always=['search'])
+
+    assert calls == ['search', 'prepare', 'prepare']
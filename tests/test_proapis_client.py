@@ -0,0 +1,50 @@
+import pytest
+import requests
+
+import proapis_client
+from proapis_client import ProApisClient
+from response_cache import ResponseCache
+
+
+class _Response:
+    status_code = 200
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"profile_id": "1"}
+
+
+def _client(tmp_path, monkeypatch, failures, max_retries=3):
+    monkeypatch.setattr(proapis_client.time, 'sleep', lambda seconds: None)
+    client = ProApisClient(
+        api_key="test", rps=1000, max_retries=max_retries, base_url="http://proapis.test",
+        cache=ResponseCache(str(tmp_path / "cache.sqlite"), ttl={}, max_bytes=10 ** 6)
+    )
+    calls = []
+
+    def post(url, json, timeout):
+        calls.append(url)
+        if len(calls) <= len(failures):
+            raise failures[len(calls) - 1]
+        return _Response()
+
+    monkeypatch.setattr(client.session, 'post', post)
+    return client, calls
+
+
+def test_connection_errors_are_retried(tmp_path, monkeypatch):
+    client, calls = _client(tmp_path, monkeypatch, [requests.ConnectionError("reset"), requests.Timeout("slow")])
+
+    assert client.profile_details("1") == {"profile_id": "1"}
+    assert len(calls) == 3
+
+
+def test_connection_error_is_raised_after_retries(tmp_path, monkeypatch):
+    client, calls = _client(tmp_path, monkeypatch, [requests.ConnectionError("reset")] * 3, max_retries=2)
+
+    with pytest.raises(requests.ConnectionError):
+        client.profile_details("1")
+    assert len(calls) == 3
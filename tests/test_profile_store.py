@@ -0,0 +1,92 @@
+import json
+import sqlite3
+import time
+
+import pandas as pd
+import pytest
+
+import response_archive
+from prepare_data import apply_schema
+from profile_store import ProfileStore
+from response_archive import open_archive
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(response_archive, '_archives', {})
+    return ProfileStore(str(tmp_path / "profiles.sqlite"))
+
+
+def test_details_are_read_through_reference(store, tmp_path):
+    open_archive('details').put('42', {"profile_id": "42"})
+    json_path = tmp_path / "7.json"
+    json_path.write_text(json.dumps({"profile_id": "7"}))
+
+    store.upsert_details([
+        {'profile_id': '42', 'current_company': 'Stealth Startup', 'raw_ref': 'archive'},
+        {'profile_id': '7', 'current_company': None, 'raw_ref': str(json_path)},
+    ])
+
+    assert store.details('42') == {"profile_id": "42"}
+    assert store.details('7') == {"profile_id": "7"}
+    assert store.details('9') is None
+    assert store.profile('42')['detail_fields']['current_company'] == 'Stealth Startup'
+
+
+def test_full_responses_are_not_stored(store):
+    store.upsert_details([{'profile_id': '1', 'current_company': 'Monzo', 'raw_ref': 'archive'}])
+
+    columns = list(store.query("SELECT * FROM profile_details").columns)
+    assert 'data' not in columns
+
+
+def test_old_details_table_is_recreated(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE profile_details (profile_id TEXT PRIMARY KEY, data TEXT NOT NULL, fetched_at REAL NOT NULL)")
+    conn.commit()
+    conn.close()
+
+    store = ProfileStore(path)
+    store.upsert_details([{'profile_id': '1', 'raw_ref': 'archive'}])
+
+    assert list(store.query("SELECT profile_id FROM profile_details")['profile_id']) == ['1']
+
+
+def test_stage_frame_is_rebuilt_from_store(store):
+    store.upsert_search_hits([{'profile_id': '1', 'query_type': 'founder', 'first_name': 'Ann', 'sub_title': 'Founder @ Stealth'}])
+    df = pd.DataFrame({
+        'profile_id': ['2', '1'],
+        'query_type': ['founder', 'founder'],
+        'first_name': ['Bob', 'Ann'],
+        'sub_title': ['CTO', 'Founder @ Stealth'],
+        'title_cluster': [None, 'c3'],
+        'is_stealth': [False, True],
+        'stealth_reason': ['No signal', 'rule: stealth_keyword, founder_explicit']
+    })
+
+    store.save_stage('llm', df, model='gpt-4o')
+    frame = apply_schema(store.frame('llm'), 'llm')
+
+    assert list(frame.columns) == list(df.columns)
+    assert frame['profile_id'].tolist() == ['2', '1']
+    assert frame['first_name'].tolist() == ['Bob', 'Ann']
+    assert frame['title_cluster'].tolist()[1] == 'c3'
+    assert frame['is_stealth'].tolist() == [False, True]
+    assert store.frame('llm', newer_than=time.time() + 60) is None
+    assert store.frame('details') is None
+
+
+def test_label_source_is_recorded(store):
+    df = pd.DataFrame({
+        'profile_id': ['1', '2', '3', '4', '5'],
+        'title_cluster': ['c1', 'c1', None, None, None],
+        'stealth_reason': ['Stealth in title', 'Stealth in title', 'rule: stealth_keyword, founder_explicit',
+                           'local model (p_stealth=0.01, p_founder=0.02)', 'API Error']
+    })
+
+    store.upsert_labels(df, model='gpt-4o')
+
+    sources = store.query("SELECT profile_id, stealth_source FROM llm_labels ORDER BY profile_id")
+    assert sources['stealth_source'].tolist() == ['gpt-4o', 'cluster', 'rule', 'local_model', 'error']
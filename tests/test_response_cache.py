@@ -0,0 +1,43 @@
+import os
+import time
+
+from response_cache import ResponseCache
+
+
+def _cache(tmp_path, **kwargs):
+    return ResponseCache(str(tmp_path / "cache.sqlite"), ttl={"profile-details": 60}, **kwargs)
+
+
+def test_responses_share_one_file(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 ** 6)
+    for profile_id in range(20):
+        cache.put("profile-details", {"profile_id": profile_id}, {"profile_id": profile_id})
+
+    assert cache.get("profile-details", {"profile_id": 3}) == {"profile_id": 3}
+    assert cache.get("search/hosted/people", {"page": 1}) is None
+    assert set(os.listdir(tmp_path)) <= {"cache.sqlite", "cache.sqlite-wal", "cache.sqlite-shm"}
+
+
+def test_expired_entries_are_misses(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, max_bytes=10 ** 6)
+    cache.put("profile-details", {"profile_id": 1}, {"profile_id": 1})
+
+    now = time.time()
+    monkeypatch.setattr('response_cache.time.time', lambda: now + 120)
+
+    assert cache.get("profile-details", {"profile_id": 1}) is None
+
+
+def test_overwrite_and_eviction_keep_size_accurate(tmp_path):
+    cache = _cache(tmp_path, max_bytes=10 ** 6)
+    cache.put("profile-details", {"profile_id": 1}, {"text": "a" * 100})
+    cache.put("profile-details", {"profile_id": 1}, {"text": "a" * 100})
+    single = cache._size
+
+    cache.max_bytes = single * 2
+    cache.put("profile-details", {"profile_id": 2}, {"text": "b" * 100})
+    cache.put("profile-details", {"profile_id": 3}, {"text": "c" * 100})
+
+    assert cache.get("profile-details", {"profile_id": 1}) is None
+    assert cache.get("profile-details", {"profile_id": 3}) == {"text": "c" * 100}
+    assert cache._size <= cache.max_bytes
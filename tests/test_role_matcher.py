@@ -0,0 +1,49 @@
+import pandas as pd
+
+from prepare_data import DEFAULT_EXCLUDE_ROLES
+from role_matcher import RoleMatcher
+
+# Прежний фильтр filter_roles: подстрока без учета регистра
+BASELINE_EXCLUDE_ROLES = [" hr ", "recruiter", "accountant", "legal", "lawyer"]
+
+SAMPLE_TITLES = [
+    "Founder @ Stealth",
+    "Senior Recruiter at Revolut",
+    "Recruiters Lead | Tech Hiring",
+    "Chartered Accountants Network",
+    "Legal Counsel",
+    "Lawyers for Startups",
+    "Head of HR Operations",
+    "Product Manager at Monzo",
+    "Co-founder & CTO",
+    "Building something new",
+    "Threat Researcher",
+]
+
+# Намеренные отличия: "hr" в начале строки прежний фильтр с отступами не находил,
+# а подстрока "legal" находила и "paralegal"
+INTENDED_DIFFERENCES = {
+    "HR Business Partner": (True, False),
+    "Paralegal at Clifford Chance": (False, True),
+}
+
+
+def test_matcher_agrees_with_baseline_substring_filter():
+    titles = pd.Series(SAMPLE_TITLES + list(INTENDED_DIFFERENCES))
+    baseline = ~titles.str.contains('|'.join(BASELINE_EXCLUDE_ROLES), case=False, na=False)
+
+    mask = RoleMatcher(exclude=DEFAULT_EXCLUDE_ROLES).mask(titles)
+
+    differences = {
+        title: (bool(old), bool(new))
+        for title, old, new in zip(titles, baseline, mask)
+        if old != new
+    }
+    assert differences == INTENDED_DIFFERENCES
+
+
+def test_plural_roles_are_matched():
+    matcher = RoleMatcher(exclude=["talent acquisition partner", "recruiter"])
+    titles = pd.Series(["Talent Acquisition Partners", "Recruiters", "Recruitment Lead"])
+
+    assert matcher.mask(titles).tolist() == [False, False, True]
@@ -0,0 +1,64 @@
+import pandas as pd
+import pytest
+
+from rules import RuleEngine, get_rule_engine
+
+
+@pytest.fixture
+def engine() -> RuleEngine:
+    return get_rule_engine()
+
+
+def _company(engine, title):
+    return engine.evaluate(pd.Series([title])).loc[0, 'rule_has_current_company']
+
+
+@pytest.mark.parametrize("title", [
+    # Прошлая компания в сегменте с ex-/former/previously
+    "Founder | Former PM at Google",
+    "Founder | ex-PM @ Google",
+    "Engineer, previously at Google",
+    "Founder |    former PM @Google",
+    # Поиск работы
+    "Looking at New Opportunities",
+    # FALSE примеры из промпта company_name_classifier
+    "Building something new | ex-Google",
+    "Something new coming soon",
+    "Building something new | ex-Revolut, Lyft, YC S20",
+    "Building something new | Z-Fellow | ex-Yahoo, ex-Revolut",
+    "Something New in Crypto (Ex.Revolut, Goldman Sachs)",
+    "Founder & CEO of Stealth Startup",
+    "Building the future of fintech",
+    "Entrepreneur in Residence",
+])
+def test_no_current_company_is_not_settled_as_company(engine, title):
+    assert _company(engine, title) is not True
+
+
+@pytest.mark.parametrize("title, company", [
+    # TRUE примеры из промпта company_name_classifier
+    ("Senior Product Manager @ KOMI | ex-Spotify & Revolut", "KOMI"),
+    ("Chief of Staff @ Simple App | ex-Revolut", "Simple App"),
+    ("Engineering Lead at Monzo Bank", "Monzo Bank"),
+    ("Product Manager @ N26 | Previously Revolut", "N26"),
+    # Текущая компания после сегмента с прошлой
+    ("Ex-Revolut | PM at Monzo", "Monzo"),
+    ("Founder | Former PM at Google | CTO @ Acme", "Acme"),
+])
+def test_current_company(engine, title, company):
+    assert _company(engine, title) is True
+    assert engine.company.search(title).group('company') == company
+
+
+def test_stealth_and_founder_rules(engine):
+    rules = engine.evaluate(pd.Series([
+        "Founder @ Stealth Startup",
+        "Ex-founder | PM at Monzo",
+        "",
+    ]))
+
+    assert rules.loc[0, 'rule_is_stealth'] is True
+    assert rules.loc[0, 'rule_is_founder'] is True
+    assert rules.loc[1, 'rule_is_founder'] is not True
+    assert rules.loc[1, 'rule_has_current_company'] is True
+    assert rules.loc[2, 'rule_has_current_company'] is False
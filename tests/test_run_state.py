@@ -0,0 +1,59 @@
+import pandas as pd
+
+from run_state import RunState, run_incremental
+
+
+def _profiles(titles):
+    return pd.DataFrame({
+        'profile_id': [str(idx) for idx in range(len(titles))],
+        'sub_title': titles,
+        'skills': [""] * len(titles)
+    })
+
+
+def _labelled(calls):
+    def process(df):
+        calls.append(list(df['profile_id']))
+        return df.assign(is_stealth=df['sub_title'].str.contains('Stealth'))
+    return process
+
+
+def test_incremental_skips_unchanged_profiles(tmp_path):
+    state = RunState(str(tmp_path / "run_state.sqlite"))
+    calls = []
+    run_incremental(_profiles(["Founder @ Stealth", "CTO @ Monzo"]), 'llm', _labelled(calls),
+                    incremental=True, state=state, version="v1")
+
+    result = run_incremental(_profiles(["Founder @ Stealth", "CTO @ Wise"]), 'llm', _labelled(calls),
+                             incremental=True, state=state, version="v1")
+
+    assert calls == [['0', '1'], ['1']]
+    assert list(result['profile_id']) == ['0', '1']
+    assert list(result['is_stealth']) == [True, False]
+
+
+def test_incremental_reprocesses_after_version_change(tmp_path):
+    state = RunState(str(tmp_path / "run_state.sqlite"))
+    calls = []
+    df = _profiles(["Founder @ Stealth", "CTO @ Monzo"])
+    run_incremental(df, 'llm', _labelled(calls), incremental=True, state=state, version="v1")
+
+    run_incremental(df, 'llm', _labelled(calls), incremental=True, state=state, version="v2")
+
+    assert calls == [['0', '1'], ['0', '1']]
+
+
+def test_incremental_reprocesses_failed_llm_rows(tmp_path):
+    state = RunState(str(tmp_path / "run_state.sqlite"))
+    calls = []
+
+    def failing(df):
+        calls.append(list(df['profile_id']))
+        return df.assign(is_stealth=False, stealth_reason=["API Error", "Stealth in title"])
+
+    df = _profiles(["CTO @ Monzo", "Founder @ Stealth"])
+    run_incremental(df, 'llm', failing, incremental=True, state=state, version="v1")
+
+    run_incremental(df, 'llm', _labelled(calls), incremental=True, state=state, version="v1")
+
+    assert calls == [['0', '1'], ['0']]
@@ -0,0 +1,200 @@
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import config
+from prepare_data import normalize_title
+from rules import get_rule_engine
+
+# Простое число Мерсенна 2^31 - 1: (a * x + b) помещается в uint64 без переполнения
+_PRIME = np.uint64((1 << 31) - 1)
+
+
+def shingles(title: str, size: int = 2) -> List[str]:
+    """
+    Разбивает нормализованный заголовок на словесные n-граммы
+
+    Для заголовков короче size слов возвращается сам заголовок.
+
+    Args:
+        title: Нормализованный заголовок
+        size: Размер n-граммы в словах
+
+    Returns:
+        List[str]: Шинглы
+    """
+    words = title.split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """
+    Подбирает число полос и строк в полосе для порога сходства
+
+    Порог срабатывания LSH примерно (1 / bands) ** (1 / rows); выбирается
+    пара, у которой он ближе всего к threshold.
+
+    Args:
+        threshold: Порог сходства Жаккара
+        num_perm: Длина сигнатуры MinHash
+
+    Returns:
+        Tuple: (bands, rows)
+    """
+    best = (num_perm, 1)
+    best_error = float("inf")
+    for rows in range(1, num_perm + 1):
+        bands = num_perm // rows
+        if bands == 0:
+            break
+        error = abs((1 / bands) ** (1 / rows) - threshold)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """
+    MinHash сигнатуры на NumPy со случайными линейными хэш-функциями
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        """
+        Args:
+            num_perm: Число хэш-функций (длина сигнатуры)
+            seed: Seed генератора коэффициентов
+        """
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: List[str]) -> np.ndarray:
+        """
+        Считает MinHash сигнатуру множества шинглов
+
+        Args:
+            items: Шинглы
+
+        Returns:
+            np.ndarray формы (num_perm,)
+        """
+        hashes = np.array([zlib.crc32(item.encode('utf-8')) for item in items], dtype=np.uint64) % _PRIME
+        return ((np.outer(hashes, self.a) + self.b) % _PRIME).min(axis=0)
+
+
+class _UnionFind:
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, first: int, second: int) -> None:
+        first, second = self.find(first), self.find(second)
+        if first != second:
+            self.parent[max(first, second)] = min(first, second)
+
+
+def cluster_unique_titles(
+    titles: List[str],
+    threshold: float,
+    num_perm: int = 128,
+    shingle_size: int = 2
+) -> List[int]:
+    """
+    Кластеризует уникальные нормализованные заголовки через MinHash/LSH
+
+    Кандидаты ищутся по совпадению полос сигнатуры, поэтому сложность
+    близка к линейной; каждая пара кандидатов дополнительно проверяется
+    по оценке сходства Жаккара из сигнатур.
+
+    Args:
+        titles: Уникальные нормализованные заголовки
+        threshold: Порог сходства Жаккара
+        num_perm: Длина сигнатуры MinHash
+        shingle_size: Размер шингла в словах
+
+    Returns:
+        List[int]: Номер кластера для каждого заголовка
+    """
+    if not titles:
+        return []
+
+    hasher = MinHasher(num_perm)
+    signatures = np.vstack([hasher.signature(shingles(title, shingle_size)) for title in titles])
+    bands, rows = lsh_params(threshold, num_perm)
+
+    union_find = _UnionFind(len(titles))
+    for band in range(bands):
+        band_values = signatures[:, band * rows:(band + 1) * rows]
+        buckets: Dict[bytes, int] = {}
+        for idx in range(len(titles)):
+            key = band_values[idx].tobytes()
+            first = buckets.setdefault(key, idx)
+            if first != idx and union_find.find(first) != union_find.find(idx):
+                if (signatures[first] == signatures[idx]).mean() >= threshold:
+                    union_find.union(first, idx)
+
+    return [union_find.find(idx) for idx in range(len(titles))]
+
+
+def add_title_clusters(
+    df: pd.DataFrame,
+    threshold: Optional[float] = None,
+    num_perm: Optional[int] = None
+) -> pd.DataFrame:
+    """
+    Добавляет столбец title_cluster с кластерами близких заголовков
+
+    Строки одного кластера LLM шаги классифицируют одним запросом по
+    представителю. Кластеры, члены которых расходятся по сигналам правил
+    rules.py (stealth, founder, текущая компания), считаются ненадежными и
+    расформировываются: их строки классифицируются обычным путем.
+    Для строк вне кластеров title_cluster пустой.
+
+    Args:
+        df: DataFrame с профилями
+        threshold: Порог сходства Жаккара (по умолчанию config.CLUSTER_THRESHOLD)
+        num_perm: Длина сигнатуры MinHash (по умолчанию config.CLUSTER_NUM_PERM)
+
+    Returns:
+        pd.DataFrame: df со столбцом title_cluster
+    """
+    if threshold is None:
+        threshold = config.CLUSTER_THRESHOLD
+    if num_perm is None:
+        num_perm = config.CLUSTER_NUM_PERM
+
+    normalized = normalize_title(df['sub_title'])
+    unique_titles = [title for title in normalized.unique() if title]
+    cluster_of = dict(zip(unique_titles, cluster_unique_titles(unique_titles, threshold, num_perm)))
+
+    clusters = normalized.map(cluster_of)
+    in_cluster = clusters.notna() & (normalized.groupby(clusters).transform('nunique') > 1)
+
+    # Проверка уверенности: все члены кластера должны одинаково срабатывать на правила
+    rules = get_rule_engine().evaluate(df['sub_title'])
+    signals = (
+        rules['rule_is_stealth'].astype(str) + "|"
+        + rules['rule_is_founder'].astype(str) + "|"
+        + rules['rule_has_current_company'].astype(str)
+    )
+    disagree = signals.groupby(clusters).transform('nunique') > 1
+    escalated = in_cluster & disagree
+    accepted = in_cluster & ~disagree
+
+    df['title_cluster'] = np.where(accepted, "c" + clusters.astype('Int64').astype(str), None)
+
+    accepted_clusters = clusters[accepted].nunique()
+    print(f"Кластеризация заголовков (порог {threshold}): {int(accepted.sum())} строк в "
+          f"{accepted_clusters} кластерах, {int(escalated.sum())} строк из кластеров "
+          f"с расхождением правил отправлены на отдельную классификацию")
+    return df